@@ -0,0 +1,76 @@
+import time
+import numpy as np
+
+from VTKInterface.Interfaces.Render_Interface import RenderInterface
+from VTKInterface.Utility.Actor_Utility import ActorUtility
+
+# Measures the per-frame overhead of setting the camera (without rendering)
+
+
+def create_random_cam_to_world_mats(num_mats):
+    cam_to_world_mats = []
+    for index in range(num_mats):
+        # Random rotation (QR decomposition of a random matrix) and translation
+        rotation, _ = np.linalg.qr(np.random.randn(3, 3))
+        if np.linalg.det(rotation) < 0:
+            rotation[:, 0] *= -1
+        cam_to_world_mat = np.identity(4, dtype=float)
+        cam_to_world_mat[0:3, 0:3] = rotation
+        cam_to_world_mat[0:3, 3] = np.random.uniform(-10, 10, size=3)
+        cam_to_world_mats.append(cam_to_world_mat)
+    return cam_to_world_mats
+
+
+def set_cam_baseline(render_interface, cam_to_world_mat, calibration_np_mat, width, height, max_clipping_range):
+    # Applies the intrinsics and the model view transformation for every frame (without caching)
+    render_interface.set_active_cam_intrinsics(calibration_np_mat, width, height, max_clipping_range)
+    render_interface.set_active_cam_model_view_transformation(cam_to_world_mat)
+    render_interface.vtk_renderer.ResetCameraClippingRange()
+
+
+def benchmark(set_cam_func, cam_to_world_mats, calibration_np_mat, width, height):
+    start_time = time.time()
+    for cam_to_world_mat in cam_to_world_mats:
+        set_cam_func(cam_to_world_mat, calibration_np_mat, width, height, max_clipping_range=1000.0)
+    return (time.time() - start_time) / len(cam_to_world_mats)
+
+
+if __name__ == '__main__':
+
+    width = 320
+    height = 240
+    num_frames = 10000
+    calibration_np_mat = np.array(
+        [[300.0, 0.0, width / 2.0],
+         [0.0, 300.0, height / 2.0],
+         [0.0, 0.0, 1.0]])
+
+    render_interface = RenderInterface(
+        off_screen_rendering=True,
+        width=width,
+        height=height)
+    render_interface.add_actor(ActorUtility.create_vtk_example_mesh_actor())
+
+    cam_to_world_mats = create_random_cam_to_world_mats(num_frames)
+
+    baseline_seconds = benchmark(
+        lambda *args, **kwargs: set_cam_baseline(render_interface, *args, **kwargs),
+        cam_to_world_mats, calibration_np_mat, width, height)
+    fast_seconds = benchmark(
+        render_interface.set_active_cam_from_opengl_cam_to_world_mat,
+        cam_to_world_mats, calibration_np_mat, width, height)
+
+    # Both variants must result in the same camera
+    set_cam_baseline(
+        render_interface, cam_to_world_mats[0], calibration_np_mat, width, height, max_clipping_range=1000.0)
+    baseline_mat = render_interface.get_active_camera().GetModelViewTransformMatrix()
+    baseline_mat = [baseline_mat.GetElement(r, c) for r in range(4) for c in range(4)]
+    render_interface.set_active_cam_from_opengl_cam_to_world_mat(
+        cam_to_world_mats[0], calibration_np_mat, width, height, max_clipping_range=1000.0)
+    fast_mat = render_interface.get_active_camera().GetModelViewTransformMatrix()
+    fast_mat = [fast_mat.GetElement(r, c) for r in range(4) for c in range(4)]
+    assert np.allclose(baseline_mat, fast_mat)
+
+    print('Per-frame camera update (baseline): {:.1f} us'.format(baseline_seconds * 1e6))
+    print('Per-frame camera update (fast):   {:.1f} us'.format(fast_seconds * 1e6))
+    print('Speedup: {:.1f}x'.format(baseline_seconds / fast_seconds))
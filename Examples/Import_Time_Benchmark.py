@@ -0,0 +1,50 @@
+import sys
+import json
+import subprocess
+
+# Measures the time required to import the interfaces in a fresh interpreter (as in a worker process)
+# and reports, if slow modules (matplotlib, the monolithic vtk module) are imported unnecessarily.
+# The script returns a non-zero exit code if such a module is imported or if an import exceeds max_import_time.
+
+MODULES = [
+    'VTKInterface.Interfaces.Render_Interface',
+    'VTKInterface.Interfaces.Intersection_Interface',
+    'VTKInterface.Utility.Data_Utility']
+
+UNWANTED_MODULES = ['matplotlib', 'vtk', 'vtkmodules.all']
+
+MEASURE_SCRIPT = '''
+import sys
+import json
+import time
+start_time = time.time()
+import {module}
+import_time = time.time() - start_time
+print(json.dumps({{'import_time': import_time, 'unwanted_modules': [
+    name for name in {unwanted_modules} if name in sys.modules]}}))
+'''
+
+
+def measure_import(module, num_runs=3):
+    import_times = []
+    unwanted_modules = []
+    for _ in range(num_runs):
+        output = subprocess.check_output(
+            [sys.executable, '-c', MEASURE_SCRIPT.format(module=module, unwanted_modules=UNWANTED_MODULES)])
+        result = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+        import_times.append(result['import_time'])
+        unwanted_modules = result['unwanted_modules']
+    # The minimum is the least affected by other processes (the first run also warms up the file cache)
+    return min(import_times), unwanted_modules
+
+
+if __name__ == '__main__':
+
+    max_import_time = 2.0
+    success = True
+    for module in MODULES:
+        import_time, unwanted_modules = measure_import(module)
+        print('{:<50s} {:6.3f} s  unwanted modules: {}'.format(module, import_time, unwanted_modules))
+        if import_time > max_import_time or len(unwanted_modules) > 0:
+            success = False
+    sys.exit(0 if success else 1)
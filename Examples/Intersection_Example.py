@@ -17,6 +17,15 @@ if __name__ == '__main__':
     points_intersection = mesh_intersector.compute_single_ray_mesh_intersections_sorted(ray)
     print('points_intersection', points_intersection)
 
+    # Batched version (array in / array out)
+    ray_origins = np.zeros((1000, 3), dtype=float)
+    ray_directions = np.random.uniform(-1.0, 1.0, size=(1000, 3))
+    hit_mask, hit_points, hit_distances, hit_cell_ids = \
+        mesh_intersector.compute_first_rays_mesh_intersections_batched(
+            ray_origins, ray_directions, num_processes=4)
+    mesh_intersector.close_process_pool()
+    print('number of rays hitting the mesh', np.count_nonzero(hit_mask))
+
     renderer_interface = RenderInterface(
         off_screen_rendering=False,
         width=1920,
@@ -28,7 +37,7 @@ if __name__ == '__main__':
             pos_vec, radius=0.5, color=[1.0, 0.0, 0.0]))
 
     renderer_interface.add_actor(
-        ActorUtility.create_vtk_mesh_actor_from_poly_data(mesh_intersector.mesh))
+        ActorUtility.create_vtk_mesh_actor_from_poly_data(mesh_intersector.get_transformed_mesh()))
 
     for p in points_intersection:
         renderer_interface.add_actor(
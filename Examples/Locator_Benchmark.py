@@ -0,0 +1,89 @@
+import time
+import multiprocessing
+import numpy as np
+from vtkmodules.vtkFiltersSources import vtkSphereSource
+
+from VTKInterface.Interfaces.Intersection_Interface import IntersectionInterface
+
+# Reports build time, memory and ray throughput of each locator type for meshes of different sizes.
+# Each measurement runs in its own process, so that the memory of previous locators does not interfere.
+
+
+def get_resident_memory_bytes():
+    # Linux only
+    with open('/proc/self/statm') as statm_file:
+        num_resident_pages = int(statm_file.read().split()[1])
+    return num_resident_pages * 4096
+
+
+def create_sphere_mesh(resolution):
+    sphere_source = vtkSphereSource()
+    sphere_source.SetRadius(1.0)
+    sphere_source.SetThetaResolution(resolution)
+    sphere_source.SetPhiResolution(resolution)
+    sphere_source.Update()
+    return sphere_source.GetOutput()
+
+
+def create_rays(num_rays, seed=0):
+    random_state = np.random.RandomState(seed)
+    ray_origins = random_state.uniform(-2.0, 2.0, size=(num_rays, 3))
+    ray_directions = random_state.normal(size=(num_rays, 3))
+    return ray_origins, ray_directions
+
+
+def run_benchmark(resolution, locator_type, num_rays):
+    mesh = create_sphere_mesh(resolution)
+    ray_origins, ray_directions = create_rays(num_rays)
+
+    memory_before_build = get_resident_memory_bytes()
+    start_time = time.time()
+    intersection_interface = IntersectionInterface(mesh, locator_type)
+    build_time = time.time() - start_time
+    locator_memory = get_resident_memory_bytes() - memory_before_build
+
+    start_time = time.time()
+    hit_mask, _, distances, _ = intersection_interface.compute_first_rays_mesh_intersections_batched(
+        ray_origins, ray_directions)
+    query_time = time.time() - start_time
+
+    return {'num_cells': mesh.GetNumberOfCells(),
+            'build_time': build_time,
+            'locator_memory': locator_memory,
+            'rays_per_second': num_rays / query_time,
+            'ray_statistics': intersection_interface.get_ray_statistics(),
+            'hit_mask': hit_mask,
+            'distances': distances}
+
+
+if __name__ == '__main__':
+
+    resolutions = [50, 200, 800]
+    num_rays = 100000
+    locator_types = list(IntersectionInterface.LOCATOR_TYPES.keys())
+
+    with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+        for resolution in resolutions:
+            reference_result = None
+            for locator_type in locator_types:
+                result = pool.apply(run_benchmark, (resolution, locator_type, num_rays))
+
+                # All locators must return the same first intersections
+                if reference_result is None:
+                    reference_result = result
+                    num_mismatches = 0
+                else:
+                    num_mismatches = int(np.count_nonzero(result['hit_mask'] != reference_result['hit_mask']))
+                    both_hit = result['hit_mask'] & reference_result['hit_mask']
+                    num_mismatches += int(np.count_nonzero(
+                        ~np.isclose(result['distances'][both_hit], reference_result['distances'][both_hit])))
+
+                print('cells: {:>9d}  locator: {:<20s}  build: {:8.3f} s  memory: {:8.1f} MB  '
+                      'rays/s: {:10.0f}  culled: {:d}  mismatches: {:d}'.format(
+                        result['num_cells'],
+                        locator_type,
+                        result['build_time'],
+                        result['locator_memory'] / 1024.0 ** 2,
+                        result['rays_per_second'],
+                        result['ray_statistics']['rays_culled'],
+                        num_mismatches))
@@ -0,0 +1,57 @@
+import os
+import numpy as np
+
+from Utility.Logging_Extension import logger
+from Utility.File_Handler.Colmap_File_Handler import ColmapFileHandler
+from VTKInterface.Interfaces.Intersection_Interface import IntersectionInterface
+from VTKInterface.Interfaces.Render_Interface import RenderInterface
+
+# Computes depth maps by casting rays through the pixels (no OpenGL context required)
+# and compares them with the depth buffer of the renderer
+
+if __name__ == '__main__':
+
+    parent_dp = os.path.dirname(os.path.realpath(__file__))
+    poly_ifp = os.path.join(parent_dp, 'Data', 'virtual', 'mesh.obj')
+    colmap_model_idp = os.path.join(parent_dp, 'Data', 'virtual', 'colmap_model')
+
+    cameras, points3D = ColmapFileHandler.parse_colmap_model_folder(
+        colmap_model_idp,
+        image_dp="")
+    cam = cameras[0]
+    calibration_np_mat = cam.get_calibration_mat()
+    cam_to_world_mat_computer_vision = cam.get_4x4_cam_to_world_mat()
+
+    mesh_intersector = IntersectionInterface.init_from_file(poly_ifp)
+
+    # Cheap preview with a quarter of the resolution
+    preview_depth_map, _ = mesh_intersector.compute_computer_vision_depth_map_from_cam(
+        cam, subsampling=4)
+    logger.vinfo('preview_depth_map.shape', preview_depth_map.shape)
+
+    # The process pool of the full resolution depth map is closed before returning
+    ray_cast_depth_map, hit_point_map = mesh_intersector.compute_computer_vision_depth_map_from_cam(
+        cam, num_processes=os.cpu_count())
+
+    render_interface = RenderInterface(
+        off_screen_rendering=True,
+        width=cam.width,
+        height=cam.height)
+    render_interface.load_vtk_mesh_or_point_cloud(poly_ifp)
+    render_interface.set_active_cam_from_computer_vision_cam_to_world_mat(
+        cam_to_world_mat_computer_vision,
+        calibration_np_mat,
+        cam.width,
+        cam.height,
+        max_clipping_range=1000.0)
+    principal_pt = [calibration_np_mat[0][2], calibration_np_mat[1][2]]
+    render_interface.set_principal_point(principal_pt, cam.width, cam.height)
+    render_interface.render()
+    rendered_depth_map = render_interface.get_computer_vision_depth_buffer_as_numpy_arr()
+
+    # The depth values differ at silhouettes (rasterization vs. ray casting)
+    both_valid = (ray_cast_depth_map > 0) & (rendered_depth_map > 0)
+    abs_differences = np.abs(ray_cast_depth_map[both_valid] - rendered_depth_map[both_valid])
+    logger.vinfo('median absolute depth difference', np.median(abs_differences))
+    logger.vinfo('fraction of pixels with matching validity',
+                 np.mean((ray_cast_depth_map > 0) == (rendered_depth_map > 0)))
@@ -3,6 +3,7 @@ from Utility.File_Handler.Colmap_File_Handler import ColmapFileHandler
 from VTKInterface.Interfaces.Render_Interface import RenderInterface
 
 import os
+import numpy as np
 
 parent_dp = os.path.dirname(os.path.realpath(__file__))
 poly_ifp = os.path.join(parent_dp, 'Data', 'virtual', 'mesh.obj')
@@ -26,18 +27,22 @@ render_interface = RenderInterface(
 render_interface.load_vtk_mesh_or_point_cloud(
     poly_ifp, texture_ifp)
 
+# All camera axes are combined in a single actor
+cam_to_world_mats_computer_vision = np.array([cam.get_4x4_cam_to_world_mat() for cam in cameras])
+render_interface.add_coordinate_axes_batched(
+    cam_to_world_mats_computer_vision,
+    length=0.5,
+    line_width=2.5,
+    add_center=False)
+render_interface.add_camera_frustums_from_cameras(
+    cameras, depth=0.5, colors=[255, 255, 0], add_image_planes=True)
+
 for cam in cameras:
     print(cam.file_name)
 
     cam_to_world_mat_computer_vision = cam.get_4x4_cam_to_world_mat()
     print("cam_to_world_mat_computer_vision\n", cam_to_world_mat_computer_vision)
 
-    render_interface.add_coordinate_axes_custom(
-        cam_to_world_mat_computer_vision,
-        length=0.5,
-        line_width=2.5,
-        add_center=False)
-
     calibration_np_mat = cam.get_calibration_mat()
 
     render_interface.set_active_cam_from_computer_vision_cam_to_world_mat(
@@ -1,11 +1,10 @@
-import vtk
-from numpy import random
+import numpy as np
 from VTKInterface.Interfaces.Render_Interface import RenderInterface
 from VTKInterface.Utility.Actor_Utility import ActorUtility
 
 num_points = 1000
-colors = [[255, 0, 0] for k in range(num_points)]
-coords = [20 * (random.rand(3) - 0.5) for k in range(num_points)]
+colors = np.broadcast_to(np.array([255, 0, 0], dtype=np.uint8), (num_points, 3))
+coords = 20 * (np.random.rand(num_points, 3) - 0.5)
 point_cloud_actor = ActorUtility.create_vtk_point_cloud_actor(coords, colors)
 
 render_interface = RenderInterface(
@@ -14,6 +13,12 @@ render_interface = RenderInterface(
     height=240,
     background_color=(1.0, 1.0, 1.0))
 render_interface.add_actor(point_cloud_actor)
+
+# Level of detail rendering for large point clouds (renders at most 1000 points while moving the camera)
+num_lod_points = 1000000
+lod_coords = 20 * (np.random.rand(num_lod_points, 3) - 0.5) + np.array([30.0, 0.0, 0.0])
+lod_colors = np.broadcast_to(np.array([0, 0, 255], dtype=np.uint8), (num_lod_points, 3))
+render_interface.add_point_cloud_lod(lod_coords, lod_colors, interactive_point_budget=1000)
 render_interface.look_with_camera_on_scene()
 render_interface.render_and_start()
 
@@ -0,0 +1,14 @@
+import sys
+import json
+
+from VTKInterface.Interfaces.Render_Interface import RenderInterface
+
+# Reports the render backend, the maximum window size and the achieved frame rates of this machine
+# (e.g. to size render jobs). Usage: python Render_Capability_Probe.py [auto|default|egl|osmesa]
+
+if __name__ == '__main__':
+
+    render_backend = sys.argv[1] if len(sys.argv) > 1 else 'auto'
+    print('available render backends', RenderInterface.get_available_render_backends())
+    capabilities = RenderInterface.probe_render_capabilities(render_backend=render_backend)
+    print(json.dumps(capabilities, indent=4))
@@ -0,0 +1,32 @@
+import os
+
+from Utility.Logging_Extension import logger
+from Utility.File_Handler.Colmap_File_Handler import ColmapFileHandler
+from Utility.OS_Extension import mkdir_safely
+from VTKInterface.Interfaces.Batch_Render_Interface import BatchRenderInterface
+
+if __name__ == '__main__':
+
+    parent_dp = os.path.dirname(os.path.realpath(__file__))
+    poly_ifp = os.path.join(parent_dp, 'Data', 'sceaux', 'meshed-poisson.ply')
+    colmap_model_idp = os.path.join(parent_dp, 'Data', 'sceaux', 'colmap_model')
+
+    depth_odp = os.path.join(parent_dp, 'Data', 'sceaux', 'depth_maps')
+    mkdir_safely(depth_odp)
+
+    cameras, points3D = ColmapFileHandler.parse_colmap_model_folder(
+        colmap_model_idp,
+        image_dp="")
+
+    batch_render_interface = BatchRenderInterface(
+        poly_ifp,
+        depth_odp,
+        num_processes=os.cpu_count(),
+        write_depth=True,
+        write_rgba=True,
+        max_clipping_range=1000.0)
+    summary = batch_render_interface.render_cameras(cameras)
+
+    logger.vinfo('num_rendered', summary['num_rendered'])
+    logger.vinfo('frames_per_second', summary['frames_per_second'])
+    logger.vinfo('failed_frames', summary['failed_frames'])
@@ -1,8 +1,13 @@
 import os
+import numpy as np
 
 from Utility.File_Handler.Colmap_File_Handler import ColmapFileHandler
 from Utility.OS_Extension import mkdir_safely
+from Utility.Types.Point import Point
 from VTKInterface.Interfaces.Render_Interface import RenderInterface
+from VTKInterface.Utility.Depth_Fusion_Utility import VoxelDepthFusion
+from VTKInterface.Utility.Depth_Buffer_Container_Utility import DepthBufferContainer
+from VTKInterface.Utility.Depth_Buffer_Utility import DepthBufferUtility
 
 parent_dp = os.path.dirname(os.path.realpath(__file__))
 poly_ifp = os.path.join(parent_dp, 'Data', 'sceaux', 'meshed-poisson.ply')
@@ -10,6 +15,13 @@ colmap_model_idp = os.path.join(parent_dp, 'Data', 'sceaux', 'colmap_model')
 
 depth_odp = os.path.join(parent_dp, 'Data', 'sceaux', 'depth_maps')
 mkdir_safely(depth_odp)
+fused_model_odp = os.path.join(parent_dp, 'Data', 'sceaux', 'fused_model')
+
+# Instead of one file per camera, all depth buffers can be stored in a single container
+use_container = False
+depth_buffer_container = None
+if use_container:
+    depth_buffer_container = DepthBufferContainer(os.path.join(depth_odp, 'depth_maps.dbc'), mode='a')
 
 cameras, points3D = ColmapFileHandler.parse_colmap_model_folder(
     colmap_model_idp,
@@ -19,8 +31,9 @@ cam = cameras[0]
 width = cam.width
 height = cam.height
 
+# Reading the depth buffer requires off screen rendering
 render_interface = RenderInterface(
-    off_screen_rendering=False,
+    off_screen_rendering=True,
     width=width,
     height=height,
     background_color=(0, 127, 127))
@@ -28,6 +41,11 @@ render_interface = RenderInterface(
 render_interface.load_vtk_mesh_or_point_cloud(
     poly_ifp)
 
+# Fuses the depth buffers of all cameras into a point cloud with a single point per voxel
+depth_fusion = VoxelDepthFusion(voxel_size=0.05)
+# The depth buffer is read once per frame into the same array (see get_computer_vision_depth_buffer_as_numpy_arr())
+depth_buffer = None
+
 for cam in cameras:
     z_buffer_ofp = os.path.join(depth_odp, cam.file_name + '.PNG')
     depth_buffer_ofp = os.path.join(depth_odp, cam.file_name + '.npy')
@@ -36,12 +54,6 @@ for cam in cameras:
     cam_to_world_mat_computer_vision = cam.get_4x4_cam_to_world_mat()
     print("cam_to_world_mat_computer_vision\n", cam_to_world_mat_computer_vision)
 
-    render_interface.add_coordinate_axes_custom(
-        cam_to_world_mat_computer_vision,
-        length=0.5,
-        line_width=2.5,
-        add_center=False)
-
     calibration_np_mat = cam.get_calibration_mat()
 
     render_interface.set_active_cam_from_computer_vision_cam_to_world_mat(
@@ -52,10 +64,25 @@ for cam in cameras:
         max_clipping_range=1000.0)
 
     render_interface.render()
-    render_interface.write_depth_buffer_to_disc(depth_buffer_ofp)
+    if depth_buffer is None or depth_buffer.shape != (cam.height, cam.width):
+        depth_buffer = np.empty((cam.height, cam.width), dtype=np.float32)
+    render_interface.get_computer_vision_depth_buffer_as_numpy_arr(out=depth_buffer)
+    if depth_buffer_container is not None:
+        depth_buffer_container.append(cam.file_name, depth_buffer)
+    else:
+        DepthBufferUtility.write_depth_buffer_to_npy(depth_buffer, depth_buffer_ofp)
+    depth_fusion.add_depth_buffer(
+        depth_buffer,
+        cam_to_world_mat_computer_vision,
+        calibration_np_mat)
     # render_interface.write_z_buffer_to_disc(z_buffer_ofp)
 
+fused_coords, _ = depth_fusion.get_points()
+ColmapFileHandler.write_colmap_model(
+    odp=fused_model_odp,
+    cameras=cameras,
+    points=Point.get_points_from_coords(fused_coords))
 
-
-render_interface.render_and_start()
+if depth_buffer_container is not None:
+    depth_buffer_container.close()
 
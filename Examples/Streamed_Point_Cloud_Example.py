@@ -0,0 +1,40 @@
+import os
+import tempfile
+import numpy as np
+from VTKInterface.Interfaces.Render_Interface import RenderInterface
+
+
+def write_binary_ply(ply_ofp, coords, colors):
+    vertex_dtype = np.dtype([('x', '<f4'), ('y', '<f4'), ('z', '<f4'),
+                             ('red', 'u1'), ('green', 'u1'), ('blue', 'u1')])
+    vertices = np.empty(len(coords), dtype=vertex_dtype)
+    for index, name in enumerate(['x', 'y', 'z']):
+        vertices[name] = coords[:, index]
+    for index, name in enumerate(['red', 'green', 'blue']):
+        vertices[name] = colors[:, index]
+    header = ('ply\nformat binary_little_endian 1.0\nelement vertex ' + str(len(coords)) + '\n' +
+              'property float x\nproperty float y\nproperty float z\n' +
+              'property uchar red\nproperty uchar green\nproperty uchar blue\nend_header\n')
+    with open(ply_ofp, 'wb') as ply_file:
+        ply_file.write(header.encode('ascii'))
+        vertices.tofile(ply_file)
+
+
+num_points = 5000000
+coords = 20 * (np.random.rand(num_points, 3) - 0.5)
+colors = (np.random.rand(num_points, 3) * 255).astype(np.uint8)
+ply_ofp = os.path.join(tempfile.mkdtemp(), 'point_cloud.ply')
+write_binary_ply(ply_ofp, coords, colors)
+
+render_interface = RenderInterface(
+    off_screen_rendering=False,
+    width=320,
+    height=240,
+    background_color=(1.0, 1.0, 1.0))
+# Reads the file in chunks of 1000000 points, keeps a single point per voxel and
+# stops reading, if the kept points exceed 256 MB
+actors, statistics = render_interface.add_point_cloud_streamed(
+    ply_ofp, chunk_size=1000000, voxel_size=0.1, memory_budget_bytes=256 * 1024 * 1024)
+print(statistics)
+render_interface.look_with_camera_on_scene()
+render_interface.render_and_start()
@@ -54,7 +54,7 @@ render_interface.render()
 render_interface.write_z_buffer_to_disc(z_buffer_ofp)
 render_interface.write_z_buffer_visualization_to_disc(z_buffer_viz_ofp)
 
-world_coords_valid = render_interface.get_z_buffer_as_world_coords(n_th_result_point=1)
+world_coords_valid, pixel_mask = render_interface.get_z_buffer_as_world_coords(stride=1)
 points_world_coord = Point.get_points_from_coords(world_coords_valid)
 ColmapFileHandler.write_colmap_model(
     odp=colmap_result_model_odp,
@@ -0,0 +1,283 @@
+import os
+import time
+import numpy as np
+from multiprocessing import util as multiprocessing_util
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from Utility.Logging_Extension import logger
+from VTKInterface.Interfaces.Render_Interface import RenderInterface
+from VTKInterface.Utility.Depth_Buffer_Container_Utility import DepthBufferContainer
+
+
+# Each worker process owns an off screen render interface with the mesh loaded once
+_worker_render_interface = None
+_worker_render_config = None
+
+
+_worker_depth_buffer_container = None
+
+
+def _init_batch_render_worker(render_config):
+    global _worker_render_interface
+    global _worker_render_config
+    global _worker_depth_buffer_container
+    _worker_render_config = render_config
+    if render_config['write_depth'] and render_config['depth_format'] == 'container':
+        # Appending to the same file from several processes is not safe, i.e. each worker owns a container
+        container_fp = os.path.join(
+            render_config['odp'], 'depth_maps_' + str(os.getpid()) + BatchRenderInterface.CONTAINER_EXTENSION)
+        _worker_depth_buffer_container = DepthBufferContainer(container_fp, mode='a')
+        # Worker processes do not run atexit handlers, but the exit finalizers of multiprocessing,
+        # i.e. the container is flushed and closed when the executor shuts the worker down
+        multiprocessing_util.Finalize(None, _worker_depth_buffer_container.close, exitpriority=10)
+    _worker_render_interface = RenderInterface(
+        off_screen_rendering=True,
+        background_color=render_config['background_color'],
+        render_backend=render_config['render_backend'])
+    _worker_render_interface.load_vtk_mesh_or_point_cloud(
+        render_config['poly_ifp'], render_config['texture_ifp'])
+
+
+def _render_camera_worker(camera_tuple):
+    file_name, cam_to_world_mat_computer_vision, calibration_np_mat, width, height = camera_tuple
+    try:
+        _render_camera(
+            _worker_render_interface,
+            _worker_render_config,
+            file_name,
+            cam_to_world_mat_computer_vision,
+            calibration_np_mat,
+            width,
+            height)
+        return file_name, None
+    except Exception as e:
+        # A failing frame must not abort the remaining frames of the worker
+        return file_name, repr(e)
+
+
+def _render_camera(render_interface,
+                   render_config,
+                   file_name,
+                   cam_to_world_mat_computer_vision,
+                   calibration_np_mat,
+                   width,
+                   height):
+
+    if (render_interface.render_width, render_interface.render_height) != (width, height):
+        render_interface.set_render_size(width, height)
+
+    render_interface.set_active_cam_from_computer_vision_cam_to_world_mat(
+        cam_to_world_mat_computer_vision,
+        calibration_np_mat,
+        width,
+        height,
+        max_clipping_range=render_config['max_clipping_range'])
+    if render_config['use_principal_point']:
+        principal_pt = [calibration_np_mat[0][2], calibration_np_mat[1][2]]
+        render_interface.set_principal_point(principal_pt, width, height)
+    render_interface.render()
+
+    # The files are written to a temporary path first, so that an interrupted
+    # worker never leaves a truncated frame behind
+    depth_format = render_config['depth_format']
+    if render_config['write_depth'] and depth_format == 'container':
+        # Incomplete records are discarded by the container
+        render_interface.append_depth_buffer_to_container(_worker_depth_buffer_container, file_name)
+    elif render_config['write_depth']:
+        depth_ofp = BatchRenderInterface.get_depth_buffer_ofp(render_config['odp'], file_name, depth_format)
+        depth_tmp_ofp = os.path.splitext(depth_ofp)[0] + '.tmp' + os.path.splitext(depth_ofp)[1]
+        if depth_format == 'npy':
+            render_interface.write_depth_buffer_to_disc(depth_tmp_ofp, dtype=np.float32)
+        elif depth_format == 'npy_float16':
+            render_interface.write_depth_buffer_to_disc(depth_tmp_ofp, dtype=np.float16)
+        else:
+            render_interface.write_depth_buffer_to_png(depth_tmp_ofp)
+        os.replace(depth_tmp_ofp, depth_ofp)
+
+    if render_config['write_rgba']:
+        rgba_ofp = BatchRenderInterface.get_rgba_buffer_ofp(render_config['odp'], file_name)
+        rgba_tmp_ofp = os.path.splitext(rgba_ofp)[0] + '.tmp.png'
+        render_interface.write_rgba_buffer_to_disc(rgba_tmp_ofp)
+        os.replace(rgba_tmp_ofp, rgba_ofp)
+
+
+class BatchRenderInterface(object):
+
+    """ Usage:
+        batch_render_interface = BatchRenderInterface(poly_ifp, odp, num_processes=8)
+        summary = batch_render_interface.render_cameras(cameras)
+
+        The cameras must provide get_4x4_cam_to_world_mat(), get_calibration_mat(),
+        width, height and file_name (e.g. the cameras of ColmapFileHandler).
+        depth_format:
+            'npy' (float32), 'npy_float16', 'png16' (quantized, see DepthBufferUtility) or
+            'container' (one DepthBufferContainer per worker process instead of one file per frame)
+        Since the workers are processes, the calling script requires an
+        "if __name__ == '__main__':" guard.
+    """
+
+    DEPTH_FILE_EXTENSIONS = {'npy': '.npy', 'npy_float16': '.npy', 'png16': '_depth.png'}
+    CONTAINER_EXTENSION = '.dbc'
+
+    def __init__(self,
+                 poly_ifp,
+                 odp,
+                 texture_ifp=None,
+                 num_processes=None,
+                 write_depth=True,
+                 depth_format='npy',
+                 write_rgba=False,
+                 max_clipping_range=1000.0,
+                 use_principal_point=False,
+                 background_color=(0, 0, 0),
+                 skip_existing=True,
+                 max_pool_restarts=3,
+                 progress_interval=100,
+                 render_backend='auto'):
+
+        if num_processes is None:
+            num_processes = os.cpu_count()
+
+        self.num_processes = num_processes
+        self.skip_existing = skip_existing
+        self.max_pool_restarts = max_pool_restarts
+        self.progress_interval = progress_interval
+        assert depth_format in self.DEPTH_FILE_EXTENSIONS or depth_format == 'container'
+        # Names of the frames stored in the depth buffer containers of the output directory
+        self.container_file_names = set()
+        self.render_config = {
+            'poly_ifp': poly_ifp,
+            'texture_ifp': texture_ifp,
+            'odp': odp,
+            'write_depth': write_depth,
+            'depth_format': depth_format,
+            'write_rgba': write_rgba,
+            'max_clipping_range': max_clipping_range,
+            'use_principal_point': use_principal_point,
+            'background_color': background_color,
+            'render_backend': render_backend}
+
+    @staticmethod
+    def get_depth_buffer_ofp(odp, file_name, depth_format='npy'):
+        return os.path.join(odp, file_name + BatchRenderInterface.DEPTH_FILE_EXTENSIONS[depth_format])
+
+    @staticmethod
+    def get_rgba_buffer_ofp(odp, file_name):
+        return os.path.join(odp, file_name + '.png')
+
+    def _update_container_file_names(self):
+        odp = self.render_config['odp']
+        self.container_file_names = set()
+        if not os.path.isdir(odp):
+            return
+        for container_fn in os.listdir(odp):
+            if container_fn.endswith(self.CONTAINER_EXTENSION):
+                with DepthBufferContainer(os.path.join(odp, container_fn), mode='r') as depth_buffer_container:
+                    self.container_file_names.update(depth_buffer_container.get_names())
+
+    def _is_depth_buffer_written(self, file_name):
+        depth_format = self.render_config['depth_format']
+        if depth_format == 'container':
+            return file_name in self.container_file_names
+        return os.path.isfile(self.get_depth_buffer_ofp(self.render_config['odp'], file_name, depth_format))
+
+    def _is_camera_rendered(self, file_name):
+        odp = self.render_config['odp']
+        if self.render_config['write_depth'] and not self._is_depth_buffer_written(file_name):
+            return False
+        if self.render_config['write_rgba'] and not os.path.isfile(self.get_rgba_buffer_ofp(odp, file_name)):
+            return False
+        return True
+
+    def render_cameras(self, cameras):
+        """
+        Returns a summary with the number of rendered/skipped frames, the failed frames
+        (file name -> error) and the throughput in frames per second
+        """
+
+        camera_tuples = [(cam.file_name,
+                          cam.get_4x4_cam_to_world_mat(),
+                          cam.get_calibration_mat(),
+                          cam.width,
+                          cam.height) for cam in cameras]
+        return self.render_camera_tuples(camera_tuples)
+
+    def render_camera_tuples(self, camera_tuples):
+        """
+        camera_tuples contains (file_name, cam_to_world_mat_computer_vision, calibration_np_mat, width, height)
+        """
+
+        for camera_tuple in camera_tuples:
+            ofp_dp = os.path.dirname(os.path.join(self.render_config['odp'], camera_tuple[0]))
+            if not os.path.isdir(ofp_dp):
+                os.makedirs(ofp_dp)
+
+        self._update_container_file_names()
+        if self.skip_existing:
+            remaining_tuples = [camera_tuple for camera_tuple in camera_tuples
+                                if not self._is_camera_rendered(camera_tuple[0])]
+        else:
+            remaining_tuples = list(camera_tuples)
+        num_skipped = len(camera_tuples) - len(remaining_tuples)
+        if num_skipped > 0:
+            logger.info('Skipping ' + str(num_skipped) + ' already rendered frames')
+
+        num_total = len(remaining_tuples)
+        num_rendered = 0
+        failed_frames = {}
+        start_time = time.time()
+        num_pool_restarts = 0
+
+        while len(remaining_tuples) > 0:
+            finished_file_names = set()
+            try:
+                with ProcessPoolExecutor(
+                        max_workers=self.num_processes,
+                        initializer=_init_batch_render_worker,
+                        initargs=(self.render_config,)) as executor:
+                    futures = [executor.submit(_render_camera_worker, camera_tuple)
+                               for camera_tuple in remaining_tuples]
+                    for future in as_completed(futures):
+                        file_name, error = future.result()
+                        finished_file_names.add(file_name)
+                        if error is None:
+                            num_rendered += 1
+                        else:
+                            failed_frames[file_name] = error
+                            logger.info('Rendering ' + file_name + ' failed: ' + error)
+                        num_finished = num_rendered + len(failed_frames)
+                        if num_finished % self.progress_interval == 0 or num_finished == num_total:
+                            self._log_progress(num_finished, num_total, start_time)
+            except BrokenProcessPool:
+                # A worker died (e.g. a crash of the render context). The frames that
+                # are already finished are on disc, only the remaining ones are re-rendered
+                num_pool_restarts += 1
+                logger.info('Worker process terminated unexpectedly '
+                            '(restart ' + str(num_pool_restarts) + ' of ' + str(self.max_pool_restarts) + ')')
+                if num_pool_restarts > self.max_pool_restarts:
+                    for camera_tuple in remaining_tuples:
+                        if camera_tuple[0] not in finished_file_names:
+                            failed_frames[camera_tuple[0]] = 'BrokenProcessPool'
+                    break
+
+            # Frames finished by the workers after the pool broke are on disc as well
+            self._update_container_file_names()
+            remaining_tuples = [camera_tuple for camera_tuple in remaining_tuples
+                                if camera_tuple[0] not in finished_file_names
+                                and not (self.skip_existing and self._is_camera_rendered(camera_tuple[0]))]
+
+        elapsed_time = time.time() - start_time
+        return {'num_rendered': num_rendered,
+                'num_skipped': num_skipped,
+                'failed_frames': failed_frames,
+                'elapsed_time': elapsed_time,
+                'frames_per_second': num_rendered / elapsed_time if elapsed_time > 0 else 0.0}
+
+    @staticmethod
+    def _log_progress(num_finished, num_total, start_time):
+        elapsed_time = time.time() - start_time
+        frames_per_second = num_finished / elapsed_time if elapsed_time > 0 else 0.0
+        logger.info('Rendered ' + str(num_finished) + ' of ' + str(num_total) + ' frames '
+                    '(' + '{:.2f}'.format(frames_per_second) + ' frames/s)')
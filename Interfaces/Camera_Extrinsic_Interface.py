@@ -1,5 +1,5 @@
-import vtk
 import numpy as np
+from vtkmodules.vtkRenderingCore import vtkRenderWindow, vtkRenderer
 
 from VTKInterface.Interfaces.Base_Interface import BaseInterface
 from VTKInterface.Utility.Conversion_Utility import convert_numpy_array_to_vtk_transform
@@ -11,9 +11,9 @@ class CameraExtrinsicInterface(BaseInterface):
     def __init__(self, vtk_renderer=None, vtk_render_window=None):
 
         self.init_instance_variable(
-            "vtk_renderer", vtk_renderer, vtk.vtkRenderer())
+            "vtk_renderer", vtk_renderer, vtkRenderer())
         self.init_instance_variable(
-            "vtk_render_window", vtk_render_window, vtk.vtkRenderWindow())
+            "vtk_render_window", vtk_render_window, vtkRenderWindow())
 
     def print_active_camera_pose(self):
         active_vtk_camera = self.vtk_renderer.GetActiveCamera()
@@ -28,6 +28,16 @@ class CameraExtrinsicInterface(BaseInterface):
         vtk_transform = convert_numpy_array_to_vtk_transform(np_mat)
         active_vtk_camera.ApplyTransform(vtk_transform)
 
+    def set_active_cam_pose_from_opengl_cam_to_world_mat(self, cam_to_world_opengl_np_mat):
+        # Equivalent to set_active_cam_model_view_transformation(), but sets position,
+        # focal point and view up directly instead of resetting and transforming the camera.
+        # The OpenGL camera looks along the negative z axis, the y axis points upwards
+        active_vtk_camera = self.vtk_renderer.GetActiveCamera()
+        camera_center = cam_to_world_opengl_np_mat[0:3, 3]
+        active_vtk_camera.SetPosition(camera_center)
+        active_vtk_camera.SetFocalPoint(camera_center - cam_to_world_opengl_np_mat[0:3, 2])
+        active_vtk_camera.SetViewUp(cam_to_world_opengl_np_mat[0:3, 1])
+
     def set_active_cam_model_view_transformation_to_identity(self):
         active_vtk_camera = self.vtk_renderer.GetActiveCamera()
 
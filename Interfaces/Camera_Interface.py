@@ -1,7 +1,6 @@
 import sys
-import vtk
+from vtkmodules.vtkRenderingCore import vtkRenderWindow, vtkRenderer
 
-from Utility.Logging_Extension import logger
 from Utility.Math.Conversion.Conversion_Collection import convert_computer_vision_to_opengl_camera
 
 from VTKInterface.Interfaces.Camera_Extrinsic_Interface import CameraExtrinsicInterface
@@ -13,9 +12,11 @@ class CameraInterface(CameraExtrinsicInterface, CameraIntrinsicInterface):
     def __init__(self, vtk_renderer=None, vtk_render_window=None):
 
         self.init_instance_variable(
-            "vtk_renderer", vtk_renderer, vtk.vtkRenderer())
+            "vtk_renderer", vtk_renderer, vtkRenderer())
         self.init_instance_variable(
-            "vtk_render_window", vtk_render_window, vtk.vtkRenderWindow())
+            "vtk_render_window", vtk_render_window, vtkRenderWindow())
+
+        self.active_cam_intrinsics_key = None
 
     def get_active_camera(self):
         return self.vtk_renderer.GetActiveCamera()
@@ -29,6 +30,7 @@ class CameraInterface(CameraExtrinsicInterface, CameraIntrinsicInterface):
                                                 computer_vision_cam,
                                                 max_clipping_range=sys.float_info.max):
         self.set_active_cam_from_computer_vision_cam_to_world_mat(
+            computer_vision_cam.get_4x4_cam_to_world_mat(),
             computer_vision_cam.get_calibration_mat(),
             computer_vision_cam.width,
             computer_vision_cam.height,
@@ -66,33 +68,23 @@ class CameraInterface(CameraExtrinsicInterface, CameraIntrinsicInterface):
                                                     width,
                                                     height,
                                                     max_clipping_range=sys.float_info.max):
-        logger.info('set_active_cam_from_opengl_cam_to_world_mat: ...')
-
-        # https://github.com/Kitware/VTK/blob/master/Rendering/Core/vtkCamera.h
-        # https://github.com/Kitware/VTK/blob/master/Rendering/Core/vtkCamera.cxx
 
-        # =============================================================
-        # ModelViewTransform = ViewTransform * ModelTransform
-        # ViewTransform depends only on Position, FocalPoint and ViewUp
-        # =============================================================
-
-        self.set_active_cam_intrinsics(
+        # The intrinsics are only applied if the calibration (or the size) changed and
+        # the pose is computed directly from the matrix
+        self.set_active_cam_intrinsics_if_changed(
             calibration_np_mat, width, height, max_clipping_range)
 
-        self.set_active_cam_model_view_transformation(
+        self.set_active_cam_pose_from_opengl_cam_to_world_mat(
             cam_to_world_opengl_np_mat)
 
         # IMPORTANT OTHERWISE THE VISUALIZATION IS BUGGY
         self.vtk_renderer.ResetCameraClippingRange()
-        # # Always call the render function of the window, not the renderer itself
-        # self.vtk_render_window.Render()
-
-        logger.info('set_active_cam_from_opengl_cam_to_world_mat: Done')
 
     def set_active_cam_from_opengl_cam_legacy(self,
                                               opengl_cam,
                                               max_clipping_range=100.0):
 
+        # Deprecated, use set_active_cam_from_opengl_cam() instead
         # The virtual camera MUST be initialized with an OpenGl cam_to_world_mat
         self.set_active_cam_model_view_transformation_from_opengl_cam(
             opengl_cam)
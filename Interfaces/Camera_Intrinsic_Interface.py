@@ -1,5 +1,5 @@
-import vtk
 import sys
+from vtkmodules.vtkRenderingCore import vtkRenderWindow, vtkRenderer
 
 from Utility.Logging_Extension import logger
 from Utility.Types.Camera import Camera
@@ -11,9 +11,12 @@ class CameraIntrinsicInterface(BaseInterface):
     def __init__(self, vtk_renderer=None, vtk_render_window=None):
 
         self.init_instance_variable(
-            "vtk_renderer", vtk_renderer, vtk.vtkRenderer())
+            "vtk_renderer", vtk_renderer, vtkRenderer())
         self.init_instance_variable(
-            "vtk_render_window", vtk_render_window, vtk.vtkRenderWindow())
+            "vtk_render_window", vtk_render_window, vtkRenderWindow())
+
+        # Parameters of the last set_active_cam_intrinsics_if_changed() call
+        self.active_cam_intrinsics_key = None
 
     def set_principal_point(self, principal_pt, width, height):
         vtk_camera = self.vtk_renderer.GetActiveCamera()
@@ -24,6 +27,7 @@ class CameraIntrinsicInterface(BaseInterface):
         vtk_camera.SetWindowCenter(wcx, wcy)
 
     def set_active_cam_intrinsics(self, calibration_np_mat, width, height, max_clipping_range=sys.float_info.max):
+        self.active_cam_intrinsics_key = None
         active_vtk_camera = self.vtk_renderer.GetActiveCamera()
         focal_length = calibration_np_mat[0][0]
         if not calibration_np_mat[0][0] == calibration_np_mat[1][1]:
@@ -34,10 +38,28 @@ class CameraIntrinsicInterface(BaseInterface):
         active_vtk_camera.SetViewAngle(view_angle)
         active_vtk_camera.SetClippingRange(0.0, max_clipping_range)
 
+    def set_active_cam_intrinsics_if_changed(self,
+                                             calibration_np_mat,
+                                             width,
+                                             height,
+                                             max_clipping_range=sys.float_info.max):
+        # Avoids recomputing the view angle for consecutive cameras with the same calibration
+        active_cam_intrinsics_key = (
+            self.vtk_renderer.GetActiveCamera(),
+            calibration_np_mat[0][0],
+            calibration_np_mat[1][1],
+            width,
+            height,
+            max_clipping_range)
+        if active_cam_intrinsics_key != self.active_cam_intrinsics_key:
+            self.set_active_cam_intrinsics(calibration_np_mat, width, height, max_clipping_range)
+            self.active_cam_intrinsics_key = active_cam_intrinsics_key
+
     def set_active_cam_intrinsics_from_virtual_cam(self,
                                                    virtual_cam,
                                                    max_clipping_range=100.0):
         active_vtk_camera = self.vtk_renderer.GetActiveCamera()
+        self.active_cam_intrinsics_key = None
         view_angle = virtual_cam.get_view_angle()
         active_vtk_camera.SetViewAngle(view_angle)
         active_vtk_camera.SetClippingRange(0.0, max_clipping_range)
@@ -1,7 +1,13 @@
 import numpy as np
-import vtk
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonDataModel import vtkPolyData
+from vtkmodules.vtkInteractionWidgets import vtkOrientationMarkerWidget
+from vtkmodules.vtkRenderingAnnotation import vtkAxesActor
+from vtkmodules.vtkRenderingCore import vtkActor, vtkPolyDataMapper, vtkRenderer
 
 from VTKInterface.Utility.Actor_Utility import ActorUtility
+from VTKInterface.Utility.Data_Utility import DataUtility
 from VTKInterface.Utility.Conversion_Utility import convert_numpy_array_to_vtk_transform
 from VTKInterface.Interfaces.Base_Interface import BaseInterface
 
@@ -15,16 +21,30 @@ class CoordinateAxesInterface(BaseInterface):
                  vtk_render_window_interactor=None):
 
         self.init_instance_variable(
-            "vtk_renderer", vtk_renderer, vtk.vtkRenderer())
+            "vtk_renderer", vtk_renderer, vtkRenderer())
         self.init_instance_variable(
-            "vtk_axes_actor", vtk_axes_actor, vtk.vtkAxesActor())
-        self.init_instance_variable(
-            "vtk_orientation_marker_widget", vtk_orientation_marker_widget, vtk.vtkOrientationMarkerWidget())
-        self.init_instance_variable(
-            "vtk_render_window_interactor", vtk_render_window_interactor, vtk.vtkRenderWindowInteractor())
+            "vtk_axes_actor", vtk_axes_actor, vtkAxesActor())
+        # The widget and the interactor are only created for on screen rendering (see RenderInterface)
+        self.vtk_orientation_marker_widget = vtk_orientation_marker_widget
+        self.vtk_render_window_interactor = vtk_render_window_interactor
+        # (vtk object, observer tag) of the observers belonging to actors of the scene (see remove_scene_observers())
+        self.scene_observers = []
+
+    def add_scene_observer(self, vtk_object, event, callback):
+        self.scene_observers.append((vtk_object, vtk_object.AddObserver(event, callback)))
+
+    def remove_scene_observers(self):
+        """ Removes the observers (and thus the references to the actors of their callbacks) """
+        for vtk_object, observer_tag in self.scene_observers:
+            vtk_object.RemoveObserver(observer_tag)
+        self.scene_observers = []
 
     def show_global_coordinate_axes_widget(self):
 
+        assert self.vtk_render_window_interactor is not None, 'The widget requires on screen rendering'
+        if self.vtk_orientation_marker_widget is None:
+            self.vtk_orientation_marker_widget = vtkOrientationMarkerWidget()
+
         self.vtk_orientation_marker_widget.SetOutlineColor(0.9300, 0.5700, 0.1300)
         self.vtk_orientation_marker_widget.SetOrientationMarker(self.vtk_axes_actor)
         self.vtk_orientation_marker_widget.SetInteractor(self.vtk_render_window_interactor)
@@ -37,7 +57,7 @@ class CoordinateAxesInterface(BaseInterface):
         # https://www.vtk.org/Wiki/VTK/Examples/Python/GeometricObjects/Display/Axes
         vtk_transform = convert_numpy_array_to_vtk_transform(transformation_mat)
 
-        axes_actor = vtk.vtkAxesActor()
+        axes_actor = vtkAxesActor()
         axes_actor.SetUserTransform(vtk_transform)
 
         if no_labels:
@@ -67,6 +87,55 @@ class CoordinateAxesInterface(BaseInterface):
 
         self.vtk_renderer.AddActor(axes_actor)
 
+    def add_points(self, coords, colors=None, radii=1.0, resolution='auto'):
+        """
+        Renders spheres at the (N, 3) coords with a single (glyph) actor
+            colors: (N, 3) uint8 array (white if None)
+            radii: scalar or (N,) array
+            resolution: sphere resolution or 'auto', i.e. the resolution is adapted before
+                        each render call to the screen space size of the closest sphere
+        Returns the created actor
+        """
+        coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+        if colors is None:
+            colors = np.full((len(coords), 3), 255, dtype=np.uint8)
+        radii_arr = np.asarray(radii, dtype=float)
+        if radii_arr.ndim == 0:
+            max_radius = float(radii_arr)
+            points_actor = ActorUtility.create_vtk_sphere_glyph_actor(
+                coords, colors, radius=max_radius, resolution=8 if resolution == 'auto' else resolution)
+        else:
+            max_radius = float(radii_arr.max()) if len(radii_arr) > 0 else 0.0
+            points_actor = ActorUtility.create_vtk_sphere_glyph_actor(
+                coords, colors, resolution=8 if resolution == 'auto' else resolution, radii=radii_arr)
+        self.vtk_renderer.AddActor(points_actor)
+
+        if resolution == 'auto' and len(coords) > 0:
+            bounds_min = coords.min(axis=0) - max_radius
+            bounds_max = coords.max(axis=0) + max_radius
+
+            def _update_resolution(vtk_renderer, event):
+                radius_in_pixels = self.compute_max_radius_in_pixels(max_radius, bounds_min, bounds_max)
+                ActorUtility.set_sphere_glyph_resolution(
+                    points_actor, ActorUtility.compute_sphere_resolution(radius_in_pixels))
+
+            self.add_scene_observer(self.vtk_renderer, 'StartEvent', _update_resolution)
+
+        return points_actor
+
+    def compute_max_radius_in_pixels(self, radius, bounds_min, bounds_max):
+        """ Upper bound of the screen space radius of a sphere within the given bounds """
+        vtk_camera = self.vtk_renderer.GetActiveCamera()
+        viewport_height = max(self.vtk_renderer.GetSize()[1], 1)
+        if vtk_camera.GetParallelProjection():
+            return radius / vtk_camera.GetParallelScale() * viewport_height / 2.0
+        # Distance between the camera and the closest point of the bounding box
+        cam_position = np.asarray(vtk_camera.GetPosition())
+        closest_point = np.clip(cam_position, bounds_min, bounds_max)
+        distance = max(np.linalg.norm(closest_point - cam_position), vtk_camera.GetClippingRange()[0], radius)
+        tan_half_view_angle = np.tan(np.deg2rad(vtk_camera.GetViewAngle()) / 2.0)
+        return radius / (distance * tan_half_view_angle) * viewport_height / 2.0
+
     def vtk_add_point(self, p, color, radius=1.0):
         self.vtk_renderer.AddActor(
             ActorUtility.create_vtk_point_actor(p, color, radius)
@@ -85,7 +154,7 @@ class CoordinateAxesInterface(BaseInterface):
                                    add_center=False,
                                    add_endpoints=False):
 
-        nc = vtk.vtkNamedColors()
+        nc = vtkNamedColors()
         green = nc.GetColor3ub('Lime')
         red = nc.GetColor3ub('red')
         blue = nc.GetColor3ub('blue')
@@ -115,3 +184,163 @@ class CoordinateAxesInterface(BaseInterface):
             self.vtk_add_point(y_dir_world, radius=point_radius, color=green)
             self.vtk_add_point(z_dir_world, radius=point_radius, color=blue)
 
+    def add_coordinate_axes_batched(self,
+                                    cam_to_world_mats_computer_vision,
+                                    length=2,
+                                    line_width=1,
+                                    point_radius=0.05,
+                                    add_center=False,
+                                    add_endpoints=False):
+        """
+        Batched version of add_coordinate_axes_custom() for (N, 4, 4) cam_to_world matrices.
+        All axes are combined in a single actor (and the optional centers/endpoints in a
+        second actor), which allows to show the poses of large reconstructions interactively.
+        Returns the list of the created actors.
+        """
+
+        cam_to_world_mats = np.asarray(cam_to_world_mats_computer_vision, dtype=float).reshape(-1, 4, 4)
+        num_cams = len(cam_to_world_mats)
+
+        # Same colors than add_coordinate_axes_custom() (red, lime and blue)
+        axis_colors = np.array([[255, 0, 0], [0, 255, 0], [0, 0, 255]], dtype=np.uint8)
+        black = np.array([0, 0, 0], dtype=np.uint8)
+
+        # (N, 3) origins and (N, 3, 3) endpoints of the x, y and z axis
+        #   cam_to_world_mat.dot([length, 0, 0, 1]) = length * rotation[:, 0] + translation
+        origins_world = cam_to_world_mats[:, 0:3, 3]
+        axis_endpoints_world = origins_world[:, np.newaxis, :] + \
+            length * np.transpose(cam_to_world_mats[:, 0:3, 0:3], (0, 2, 1))
+
+        axes_actor = ActorUtility.create_vtk_line_segments_actor(
+            np.repeat(origins_world, 3, axis=0),
+            axis_endpoints_world.reshape(-1, 3),
+            np.tile(axis_colors, (num_cams, 1)),
+            line_width=line_width)
+        self.vtk_renderer.AddActor(axes_actor)
+        actors = [axes_actor]
+
+        point_coords = []
+        point_colors = []
+        if add_center:
+            point_coords.append(origins_world)
+            point_colors.append(np.tile(black, (num_cams, 1)))
+        if add_endpoints:
+            point_coords.append(axis_endpoints_world.reshape(-1, 3))
+            point_colors.append(np.tile(axis_colors, (num_cams, 1)))
+        if len(point_coords) > 0:
+            points_actor = self.add_points(
+                np.concatenate(point_coords), np.concatenate(point_colors), radii=point_radius)
+            actors.append(points_actor)
+
+        return actors
+
+    @staticmethod
+    def compute_camera_frustum_corners(cam_to_world_mats_computer_vision,
+                                       calibration_mats,
+                                       widths,
+                                       heights,
+                                       depth=1.0):
+        """
+        Returns the (N, 3) camera centers and the (N, 4, 3) corners of the image planes at the given depth
+        (in the order upper left, upper right, lower right, lower left) in world coordinates
+        """
+        cam_to_world_mats = np.asarray(cam_to_world_mats_computer_vision, dtype=float).reshape(-1, 4, 4)
+        num_cams = len(cam_to_world_mats)
+        calibration_mats = np.broadcast_to(np.asarray(calibration_mats, dtype=float), (num_cams, 3, 3))
+        widths = np.broadcast_to(np.asarray(widths, dtype=float), (num_cams,))
+        heights = np.broadcast_to(np.asarray(heights, dtype=float), (num_cams,))
+
+        # (N, 4) image coordinates of the corners
+        corner_x = np.stack([np.zeros(num_cams), widths, widths, np.zeros(num_cams)], axis=1)
+        corner_y = np.stack([np.zeros(num_cams), np.zeros(num_cams), heights, heights], axis=1)
+        f_x = calibration_mats[:, 0, 0, np.newaxis]
+        f_y = calibration_mats[:, 1, 1, np.newaxis]
+        c_x = calibration_mats[:, 0, 2, np.newaxis]
+        c_y = calibration_mats[:, 1, 2, np.newaxis]
+        corners_cam = np.stack([
+            (corner_x - c_x) / f_x * depth,
+            (corner_y - c_y) / f_y * depth,
+            np.full((num_cams, 4), depth)], axis=2)
+
+        rotations = cam_to_world_mats[:, 0:3, 0:3]
+        centers_world = cam_to_world_mats[:, 0:3, 3]
+        corners_world = np.einsum('nij,nkj->nki', rotations, corners_cam) + centers_world[:, np.newaxis, :]
+        return centers_world, corners_world
+
+    def add_camera_frustums(self,
+                            cam_to_world_mats_computer_vision,
+                            calibration_mats,
+                            widths,
+                            heights,
+                            depth=1.0,
+                            colors=None,
+                            line_width=1,
+                            add_image_planes=False,
+                            image_plane_opacity=0.3):
+        """
+        Renders the frustums of N cameras with a single actor
+            cam_to_world_mats_computer_vision: (N, 4, 4) array
+            calibration_mats: (N, 3, 3) array or a single (3, 3) matrix
+            widths, heights: (N,) arrays or scalars
+            colors: (N, 3) uint8 array or a single color (one color per camera)
+        Each frustum consists of 8 lines (4 from the center to the image plane corners and the border of
+        the image plane) and optionally of a (semi transparent) image plane quad.
+        Returns the created actor
+        """
+        centers_world, corners_world = self.compute_camera_frustum_corners(
+            cam_to_world_mats_computer_vision, calibration_mats, widths, heights, depth)
+        num_cams = len(centers_world)
+        if colors is None:
+            colors = [0, 0, 0]
+        colors = np.broadcast_to(np.asarray(colors, dtype=np.uint8), (num_cams, 3))
+
+        # Points of camera i: 5 * i (center), 5 * i + 1, ..., 5 * i + 4 (corners)
+        coords = np.concatenate([centers_world[:, np.newaxis, :], corners_world], axis=1).reshape(-1, 3)
+        point_offsets = 5 * np.arange(num_cams, dtype=numpy_support.ID_TYPE_CODE)[:, np.newaxis]
+
+        frustum_line_indices = np.array(
+            [[0, 1], [0, 2], [0, 3], [0, 4], [1, 2], [2, 3], [3, 4], [4, 1]], dtype=numpy_support.ID_TYPE_CODE)
+        line_connectivity = (frustum_line_indices.reshape(1, -1) + point_offsets).reshape(-1)
+        line_offsets = np.arange(0, len(line_connectivity) + 1, 2, dtype=numpy_support.ID_TYPE_CODE)
+
+        frustums_poly_data = vtkPolyData()
+        frustums_poly_data.SetPoints(DataUtility.create_vtk_points_from_numpy(coords))
+        frustums_poly_data.SetLines(DataUtility.create_vtk_cell_array_from_numpy(line_offsets, line_connectivity))
+
+        # The cell data contains the colors of the lines followed by the colors of the polygons
+        cell_colors = [np.repeat(np.concatenate([colors, np.full((num_cams, 1), 255, dtype=np.uint8)], axis=1),
+                                 len(frustum_line_indices), axis=0)]
+        if add_image_planes:
+            quad_connectivity = (np.arange(1, 5, dtype=numpy_support.ID_TYPE_CODE).reshape(1, -1) +
+                                 point_offsets).reshape(-1)
+            quad_offsets = np.arange(0, len(quad_connectivity) + 1, 4, dtype=numpy_support.ID_TYPE_CODE)
+            frustums_poly_data.SetPolys(DataUtility.create_vtk_cell_array_from_numpy(quad_offsets, quad_connectivity))
+            image_plane_alpha = np.full((num_cams, 1), int(round(255 * image_plane_opacity)), dtype=np.uint8)
+            cell_colors.append(np.concatenate([colors, image_plane_alpha], axis=1))
+        frustums_poly_data.GetCellData().SetScalars(
+            DataUtility.create_vtk_color_array_from_numpy(np.concatenate(cell_colors)))
+
+        mapper = vtkPolyDataMapper()
+        mapper.SetInputData(frustums_poly_data)
+        mapper.SetScalarModeToUseCellData()
+        mapper.SetScalarVisibility(1)
+
+        frustums_actor = vtkActor()
+        frustums_actor.SetMapper(mapper)
+        frustums_actor.GetProperty().SetLineWidth(line_width)
+        self.vtk_renderer.AddActor(frustums_actor)
+        return frustums_actor
+
+    def add_camera_frustums_from_cameras(self, cameras, depth=1.0, colors=None, **kwargs):
+        """
+        cameras: list of cameras providing get_4x4_cam_to_world_mat(), get_calibration_mat(), width and height
+        (e.g. the cameras of ColmapFileHandler.parse_colmap_model_folder()), see add_camera_frustums()
+        """
+        return self.add_camera_frustums(
+            np.array([cam.get_4x4_cam_to_world_mat() for cam in cameras]),
+            np.array([cam.get_calibration_mat() for cam in cameras]),
+            np.array([cam.width for cam in cameras]),
+            np.array([cam.height for cam in cameras]),
+            depth=depth,
+            colors=colors,
+            **kwargs)
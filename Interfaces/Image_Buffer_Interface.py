@@ -1,10 +1,11 @@
 
 import numpy as np
 from Utility.Logging_Extension import logger
-from matplotlib import pyplot as plt
 
-import vtk
-from vtk.util import numpy_support
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkCommonCore import VTK_UNSIGNED_CHAR, vtkFloatArray
+from vtkmodules.vtkIOImage import vtkPNGWriter
+from vtkmodules.vtkRenderingCore import vtkRenderWindow, vtkRenderer, vtkWindowToImageFilter
 
 from VTKInterface.Interfaces.Base_Interface import BaseInterface
 from VTKInterface.Utility.Data_Utility import DataUtility
@@ -15,13 +16,16 @@ class ImageBufferInterface(BaseInterface):
     def __init__(self, vtk_renderer=None, vtk_render_window=None, width=None, height=None):
 
         self.init_instance_variable(
-            "vtk_renderer", vtk_renderer, vtk.vtkRenderer())
+            "vtk_renderer", vtk_renderer, vtkRenderer())
         self.init_instance_variable(
-            "vtk_render_window", vtk_render_window, vtk.vtkRenderWindow())
+            "vtk_render_window", vtk_render_window, vtkRenderWindow())
 
         self.width = width
         self.height = height
 
+        # shape -> preallocated uint8 buffer (see get_rgba_buffer_as_uint8_numpy_arr())
+        self.uint8_buffer_pool = {}
+
     def get_rgba_buffer_as_numpy_arr(self):
 
         if not self.vtk_render_window.GetOffScreenRendering():
@@ -31,7 +35,7 @@ class ImageBufferInterface(BaseInterface):
         # https://stackoverflow.com/questions/14553523/vtk-render-window-image-to-numpy-array
 
         # http://berkgeveci.github.io/page7/
-        rgba_data = vtk.vtkFloatArray()
+        rgba_data = vtkFloatArray()
         # GetZbufferData (int x, int y, int x2, int y2, vtkFloatArray *z)
 
         blend_value = 0
@@ -42,7 +46,78 @@ class ImageBufferInterface(BaseInterface):
         rgba_data_numpy = np.flipud(rgba_data_numpy)
         return rgba_data_numpy
 
+    def get_rgba_buffer_as_uint8_numpy_arr(self, out=None, with_alpha=True, flip='view'):
+        """
+        Returns the color buffer as (H, W, 4) uint8 array (or (H, W, 3) if with_alpha is False)
+        out: C-contiguous uint8 array with shape (H, W, 4) or (H, W, 3). If out is None, a
+            pooled buffer is used, which is overwritten by the next call with the same shape.
+        flip:
+            'view' returns a flipped view of the buffer (i.e. no copy), which starts at the upper left
+            'in_place' flips the rows of the buffer itself
+            None returns the buffer in OpenGL order, which starts at the lower left
+        """
+
+        if not self.vtk_render_window.GetOffScreenRendering():
+            error_str = 'THIS ONLY WORKS IN OFF SCREEN MODE ' \
+                        '(use off_screen_rendering=True in render_interface constructor)'
+            assert False, error_str
+
+        num_components = 4 if with_alpha else 3
+        buffer_shape = (self.render_height, self.render_width, num_components)
+        if out is None:
+            if buffer_shape not in self.uint8_buffer_pool:
+                self.uint8_buffer_pool[buffer_shape] = np.empty(buffer_shape, dtype=np.uint8)
+            out = self.uint8_buffer_pool[buffer_shape]
+        assert out.shape == buffer_shape and out.dtype == np.uint8 and out.flags.c_contiguous
+
+        # Since the size of the wrapping vtk array matches the size of the requested pixel data,
+        # vtk writes the pixel data directly into the numpy buffer
+        vtk_buffer = numpy_support.numpy_to_vtk(
+            out.reshape((-1, num_components)), deep=False, array_type=VTK_UNSIGNED_CHAR)
+        front_buffer = 0
+        if with_alpha:
+            self.vtk_render_window.GetRGBACharPixelData(
+                0, 0, self.render_width - 1, self.render_height - 1, front_buffer, vtk_buffer)
+        else:
+            self.vtk_render_window.GetPixelData(
+                0, 0, self.render_width - 1, self.render_height - 1, front_buffer, vtk_buffer)
+
+        if flip == 'view':
+            return out[::-1]
+        elif flip == 'in_place':
+            self.flip_rows_in_place(out)
+            return out
+        else:
+            assert flip is None
+            return out
+
+    @staticmethod
+    def flip_rows_in_place(buffer):
+        # Swaps the (non-overlapping) upper and lower halves in two vectorized copies,
+        # which requires half of the buffer as temporary memory (the middle row of odd heights remains)
+        height = buffer.shape[0]
+        half_height = height // 2
+        upper_half = buffer[:half_height].copy()
+        buffer[:half_height] = buffer[height - half_height:][::-1]
+        buffer[height - half_height:] = upper_half[::-1]
+
+    def write_rgba_buffer_to_disc(self, png_ofp):
+
+        window_to_image_filter = vtkWindowToImageFilter()
+        image_writer = vtkPNGWriter()
+
+        window_to_image_filter.SetInput(self.vtk_render_window)
+        window_to_image_filter.SetInputBufferTypeToRGBA()
+        # Required for off screen rendering
+        window_to_image_filter.ReadFrontBufferOff()
+
+        image_writer.SetFileName(png_ofp)
+        image_writer.SetInputConnection(window_to_image_filter.GetOutputPort())
+        image_writer.Write()
+
     def show_rgba_buffer(self):
+        # matplotlib is only imported if required, since importing it is slow
+        from matplotlib import pyplot as plt
         color_image = self.get_rgba_buffer_as_numpy_arr()
         plt.imshow(color_image)
         plt.show()
@@ -1,30 +1,150 @@
+import multiprocessing
 import numpy as np
-import vtk
+from vtkmodules.vtkCommonCore import reference
+from vtkmodules.vtkCommonDataModel import vtkCellLocator, vtkGenericCell, vtkStaticCellLocator
+from vtkmodules.vtkFiltersFlowPaths import vtkModifiedBSPTree
+from vtkmodules.vtkFiltersGeneral import vtkOBBTree, vtkTransformPolyDataFilter
 
 from VTKInterface.Utility.Data_Utility import DataUtility
+from VTKInterface.Utility.Conversion_Utility import convert_numpy_array_to_vtk_transform
+
+
+# Each worker process of the process pool owns its own intersection interface
+_worker_intersection_interface = None
+
+
+def _init_intersection_worker(poly_data_str, locator_type, locator_cache_dp, bvh_arrays_and_hash):
+    global _worker_intersection_interface
+    mesh = DataUtility.create_poly_data_from_string(poly_data_str)
+    locator = None
+    if bvh_arrays_and_hash is not None:
+        # Reuse the hierarchy built by the parent process
+        from VTKInterface.Utility.BVH_Utility import BoundingVolumeHierarchy
+        locator = BoundingVolumeHierarchy(*bvh_arrays_and_hash)
+    _worker_intersection_interface = IntersectionInterface(mesh, locator_type, locator_cache_dp, locator)
+
+
+def _compute_first_rays_mesh_intersections_worker(ray_origins_and_directions):
+    ray_origins, ray_directions = ray_origins_and_directions
+    # The statistics of the worker are returned per chunk and accumulated by the parent process
+    _worker_intersection_interface.reset_ray_statistics()
+    chunk_result = _worker_intersection_interface.compute_first_rays_mesh_intersections_chunk(
+        ray_origins, ray_directions)
+    return chunk_result, _worker_intersection_interface.get_ray_statistics()
 
 
 class IntersectionInterface(object):
 
-    def __init__(self, mesh):
+    # All locators support the same queries (IntersectWithLine()) and return the same results,
+    # but differ in build time, memory consumption and query time (see Locator_Benchmark.py)
+    #   https://vtk.org/doc/nightly/html/classvtkAbstractCellLocator.html
+    # In contrast to the vtk locators, the bounding volume hierarchy ('bvh') can be stored on disc
+    # (see locator_cache_dp) and processes the rays of a batch in a vectorized manner
+    LOCATOR_TYPES = {
+        'obb_tree': vtkOBBTree,
+        'static_cell_locator': vtkStaticCellLocator,
+        'cell_locator': vtkCellLocator,
+        'modified_bsp_tree': vtkModifiedBSPTree,
+        # The hierarchy is imported only if it is used (see create_locator())
+        'bvh': None}
 
+    def __init__(self, mesh, locator_type='obb_tree', locator_cache_dp=None, locator=None):
+        """ locator: optional locator of the given type, which has already been built for the mesh """
+
+        # The mesh and the locator remain in mesh coordinates. The model transformation maps
+        # mesh coordinates to world coordinates, queries and results are transformed accordingly.
+        # Thus, changing the transformation does not require to rebuild the locator.
         self.mesh = mesh
-        self.obb_tree = vtk.vtkOBBTree()
-        self.obb_tree.SetDataSet(self.mesh)
-        self.obb_tree.BuildLocator()
+        self.locator_type = locator_type
+        self.locator_cache_dp = locator_cache_dp
+        if locator is None:
+            locator = self.create_locator(self.mesh, locator_type, locator_cache_dp)
+        self.locator = locator
 
-        self.bb_corners = self.get_bounding_box_corner_points()
+        self.mesh_bb_corners = self.get_mesh_bounding_box_corner_points()
+        self.mesh_bounds = self.get_padded_bounds(self.mesh.GetBounds())
+        self.set_model_transformation(np.identity(4, dtype=float))
+        self.reset_ray_statistics()
+
+        self.process_pool = None
+        self.process_pool_size = None
 
     @classmethod
-    def init_from_file(cls, ifp):
+    def init_from_file(cls, ifp, locator_type='obb_tree', cache_locator=True):
+        """ If cache_locator is True, the bounding volume hierarchy is stored next to the mesh (ifp + '.bvh') """
         poly_data = DataUtility.create_poly_data_from_file(
             ifp)
-        return IntersectionInterface(poly_data)
+        locator_cache_dp = None
+        if cache_locator and locator_type == 'bvh':
+            locator_cache_dp = ifp + '.bvh'
+        return IntersectionInterface(poly_data, locator_type, locator_cache_dp)
+
+    @staticmethod
+    def create_locator(mesh, locator_type, locator_cache_dp=None):
+        if locator_type not in IntersectionInterface.LOCATOR_TYPES:
+            raise ValueError('Unknown locator type: ' + str(locator_type))
+        if locator_type == 'bvh':
+            from VTKInterface.Utility.BVH_Utility import BoundingVolumeHierarchy
+            return BoundingVolumeHierarchy.create_from_poly_data(mesh, locator_cache_dp)
+        locator = IntersectionInterface.LOCATOR_TYPES[locator_type]()
+        locator.SetDataSet(mesh)
+        locator.BuildLocator()
+        return locator
+
+    @property
+    def obb_tree(self):
+        # For backward compatibility (the locator used to be always a vtkOBBTree)
+        return self.locator
+
+    def set_model_transformation(self, model_transformation_mat):
+        """ 4x4 matrix (e.g. a similarity transformation) mapping mesh coordinates to world coordinates """
+        self.model_transformation_mat = np.asarray(model_transformation_mat, dtype=float)
+        self.inverse_model_transformation_mat = np.linalg.inv(self.model_transformation_mat)
+        self.has_model_transformation = not np.array_equal(
+            self.model_transformation_mat, np.identity(4, dtype=float))
+        self.bb_corners = self.get_bounding_box_corner_points()
+
+    def get_model_transformation(self):
+        return self.model_transformation_mat
+
+    def transform_points_to_mesh_coords(self, points):
+        if not self.has_model_transformation:
+            return points
+        return points.dot(self.inverse_model_transformation_mat[0:3, 0:3].T) + \
+            self.inverse_model_transformation_mat[0:3, 3]
+
+    def transform_directions_to_mesh_coords(self, directions):
+        if not self.has_model_transformation:
+            return directions
+        return directions.dot(self.inverse_model_transformation_mat[0:3, 0:3].T)
+
+    def transform_points_to_world_coords(self, points):
+        if not self.has_model_transformation:
+            return points
+        return points.dot(self.model_transformation_mat[0:3, 0:3].T) + self.model_transformation_mat[0:3, 3]
+
+    def get_transformed_mesh(self):
+        """ Returns a copy of the mesh in world coordinates (e.g. for visualization) """
+        if not self.has_model_transformation:
+            return self.mesh
+        transform = convert_numpy_array_to_vtk_transform(self.model_transformation_mat)
+        transform_filter = vtkTransformPolyDataFilter()
+        transform_filter.SetInputData(self.mesh)
+        transform_filter.SetTransform(transform)
+        transform_filter.Update()
+        return transform_filter.GetOutput()
 
     def get_bounds(self):
-        return self.mesh.GetBounds()
+        """ Axis aligned bounds in world coordinates """
+        x_min, y_min, z_min = self.bb_corners.min(axis=0)
+        x_max, y_max, z_max = self.bb_corners.max(axis=0)
+        return x_min, x_max, y_min, y_max, z_min, z_max
 
     def get_bounding_box_corner_points(self):
+        """ Corners of the (transformed) bounding box of the mesh in world coordinates """
+        return self.transform_points_to_world_coords(self.mesh_bb_corners)
+
+    def get_mesh_bounding_box_corner_points(self):
         bounds = self.mesh.GetBounds()
         x_min, x_max, y_min, y_max, z_min, z_max = bounds
         return np.asarray(
@@ -38,11 +158,61 @@ class IntersectionInterface(object):
              (x_max, y_max, z_max)], dtype=float)
 
     def compute_max_distance_upper_bound(self, query_point):
-        if self.bb_corners is None:
-            self.bb_corners = self.get_bounding_box_corner_points()
-        distances = [np.linalg.norm(bb_corner - query_point) for bb_corner in self.bb_corners]
-        max_distance = max(distances)
-        return max_distance
+        return self.compute_max_distance_upper_bounds(
+            np.asarray(query_point, dtype=float).reshape(1, 3))[0]
+
+    def compute_max_distance_upper_bounds(self, query_points, bb_corners=None):
+        if bb_corners is None:
+            bb_corners = self.bb_corners
+        # (N, 1, 3) - (1, 8, 3) -> (N, 8)
+        distances = np.linalg.norm(
+            query_points[:, np.newaxis, :] - bb_corners[np.newaxis, :, :], axis=2)
+        return distances.max(axis=1)
+
+    @staticmethod
+    def get_padded_bounds(bounds, relative_padding=1e-6):
+        """ Enlarges the bounds slightly, so that grazing intersections are not culled by rounding errors """
+        bounds = np.asarray(bounds, dtype=float).reshape(3, 2)
+        padding = relative_padding * max(np.linalg.norm(bounds[:, 1] - bounds[:, 0]), 1.0)
+        return np.stack([bounds[:, 0] - padding, bounds[:, 1] + padding], axis=1).reshape(6)
+
+    @staticmethod
+    def compute_rays_bounding_box_intervals(ray_origins, ray_directions, bounds):
+        """
+        Vectorized slab test of (N, 3) rays against the axis aligned box given by
+        bounds = (x_min, x_max, y_min, y_max, z_min, z_max).
+        Returns a mask (N,) of the rays intersecting the box and the ray parameters (N,)
+        where the rays enter and exit the box. The entry parameter is clamped to 0,
+        i.e. rays starting inside the box enter at their origin.
+        """
+        bounds = np.asarray(bounds, dtype=float).reshape(3, 2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inverse_directions = 1.0 / ray_directions
+            t_lower = (bounds[:, 0] - ray_origins) * inverse_directions
+            t_upper = (bounds[:, 1] - ray_origins) * inverse_directions
+        # Directions parallel to a slab produce +-inf (or nan for origins on the slab boundary).
+        # fmin/fmax ignore nan values, i.e. such slabs do not constrain the interval
+        t_enter = np.fmax(np.fmax.reduce(np.fmin(t_lower, t_upper), axis=1), 0.0)
+        t_exit = np.fmin.reduce(np.fmax(t_lower, t_upper), axis=1)
+        hit_mask = t_enter <= t_exit
+        return hit_mask, t_enter, t_exit
+
+    def reset_ray_statistics(self):
+        self.ray_statistics = {'rays_total': 0, 'rays_culled': 0, 'rays_queried': 0, 'rays_hit': 0}
+
+    def get_ray_statistics(self):
+        """
+        Counters of the batched queries since the last reset_ray_statistics():
+            rays_total:   number of rays
+            rays_culled:  rays missing the bounding box (no locator query necessary)
+            rays_queried: rays clipped to the bounding box and passed to the locator
+            rays_hit:     rays intersecting the mesh
+        """
+        return dict(self.ray_statistics)
+
+    def _add_ray_statistics(self, ray_statistics):
+        for key, value in ray_statistics.items():
+            self.ray_statistics[key] += value
 
     def compute_rays_mesh_intersections(self, rays):
 
@@ -63,51 +233,290 @@ class IntersectionInterface(object):
         #         closest_point = point
         return closest_point
 
-    def compute_single_line_mesh_intersection(self, line_first_point, line_second_point):
-
-        intersection_vtk_points = vtk.vtkPoints()
+    # Parametric step (along the line) behind an intersection, before the next intersection is searched.
+    # Intersections closer than this step (e.g. of the triangles sharing the hit edge or vertex) are merged
+    SINGLE_LINE_INTERSECTION_STEP = 1e-6
 
-        #perform ray-casting (intersect a line with the mesh)
-        code = self.obb_tree.IntersectWithLine(
-            line_first_point,
-            line_second_point,
-            intersection_vtk_points,
-            None)
+    def compute_single_line_mesh_intersection(self, line_first_point, line_second_point):
+        """ Returns all intersection points sorted along the line (as list of tuples) """
 
-        # Interpret the 'code'.
-        #   If code == 0 is returned then no intersections points were found so return an empty list
-        #   If code == -1 then 'pointRaySource' lies outside the surface
+        line_first_point, line_second_point = self.transform_points_to_mesh_coords(
+            np.asarray([line_first_point, line_second_point], dtype=float))
+        direction = line_second_point - line_first_point
 
-        points_vtk_intersection_data = intersection_vtk_points.GetData()
-        number_points_intersection = points_vtk_intersection_data.GetNumberOfTuples()
-        points_intersection_list = [points_vtk_intersection_data.GetTuple3(idx) for idx in range(
-            number_points_intersection)]
+        # The IntersectWithLine() signature returning all intersections is not supported by all
+        # locators (and its results differ between the locators and vtk versions). Thus, the first
+        # intersection (supported by all locators) is computed repeatedly, starting behind the previous one
+        intersection_points = []
+        t_start = 0.0
+        while t_start < 1.0:
+            segment_first_point = line_first_point + t_start * direction
+            hit_query_indices, hit_parametric_coords, _ = self._intersect_first_segments(
+                segment_first_point.reshape(1, 3), line_second_point.reshape(1, 3))
+            if len(hit_query_indices) == 0:
+                break
+            t_hit = t_start + float(hit_parametric_coords[0]) * (1.0 - t_start)
+            intersection_points.append(line_first_point + t_hit * direction)
+            t_start = t_hit + self.SINGLE_LINE_INTERSECTION_STEP
 
-        return points_intersection_list
+        if len(intersection_points) == 0:
+            return []
+        intersection_points = self.transform_points_to_world_coords(np.asarray(intersection_points, dtype=float))
+        return [tuple(point) for point in intersection_points.tolist()]
 
     def compute_single_ray_mesh_intersections_sorted(self, ray):
 
-        intersection_max_distance = self.compute_max_distance_upper_bound(ray.pos_vec)
-        line_second_point = ray.pos_vec + intersection_max_distance * ray.dir_vec
+        # Restrict the query to the part of the ray inside the (world) bounding box
+        pos_vec = np.asarray(ray.pos_vec, dtype=float).reshape(1, 3)
+        dir_vec = np.asarray(ray.dir_vec, dtype=float).reshape(1, 3)
+        hit_mask, t_enter, t_exit = self.compute_rays_bounding_box_intervals(
+            pos_vec, dir_vec, self.get_padded_bounds(self.get_bounds()))
+        if not hit_mask[0]:
+            return []
+        line_first_point = pos_vec[0] + t_enter[0] * dir_vec[0]
+        line_second_point = pos_vec[0] + t_exit[0] * dir_vec[0]
 
-        return self.compute_single_line_mesh_intersection(ray.pos_vec, line_second_point)
+        return self.compute_single_line_mesh_intersection(line_first_point, line_second_point)
 
     def scale_mesh(self, scale):
+        # Only the model transformation changes, the mesh and the locator remain untouched
+        # (use get_transformed_mesh() to obtain the scaled mesh)
+        scale_mat = np.diag([scale, scale, scale, 1.0])
+        self.set_model_transformation(scale_mat.dot(self.model_transformation_mat))
 
-        transform = vtk.vtkTransform()
-        transform_filter = vtk.vtkTransformPolyDataFilter()
-        # assuming uniform scale
-        transform.Scale(scale, scale, scale)
-        transform_filter.SetInputData(self.mesh)
-        transform_filter.SetTransform(transform)
-        # update to apply the transformation
-        transform_filter.Update()
+    def compute_first_rays_mesh_intersections_batched(self,
+                                                      ray_origins,
+                                                      ray_directions,
+                                                      chunk_size=100000,
+                                                      num_processes=None):
+        """
+        Array-in/array-out counterpart of compute_rays_mesh_intersections()
+        ray_origins and ray_directions are (N, 3) arrays
+        Returns a hit mask (N,), the first intersection points (N, 3), the distances (N,)
+        and the cell ids (N,). Rays without intersection have nan points/distances and cell id -1
+        If num_processes > 1, the chunks are distributed to a process pool (see close_process_pool())
+        """
+
+        ray_origins = np.asarray(ray_origins, dtype=float).reshape(-1, 3)
+        ray_directions = np.asarray(ray_directions, dtype=float).reshape(-1, 3)
+        assert ray_origins.shape == ray_directions.shape
+
+        # The chunks are processed in mesh coordinates, i.e. the workers are independent of the model transformation
+        mesh_ray_origins = self.transform_points_to_mesh_coords(ray_origins)
+        mesh_ray_directions = self.transform_directions_to_mesh_coords(ray_directions)
+        chunks = [(mesh_ray_origins[start:start + chunk_size], mesh_ray_directions[start:start + chunk_size])
+                  for start in range(0, len(ray_origins), chunk_size)]
+
+        if num_processes is None or num_processes <= 1:
+            chunk_results = [self.compute_first_rays_mesh_intersections_chunk(*chunk) for chunk in chunks]
+        else:
+            process_pool = self._get_process_pool(num_processes)
+            chunk_results_and_statistics = process_pool.map(_compute_first_rays_mesh_intersections_worker, chunks)
+            chunk_results = []
+            for chunk_result, chunk_statistics in chunk_results_and_statistics:
+                chunk_results.append(chunk_result)
+                self._add_ray_statistics(chunk_statistics)
+
+        if len(chunk_results) == 0:
+            return (np.zeros(0, dtype=bool),
+                    np.zeros((0, 3), dtype=float),
+                    np.zeros(0, dtype=float),
+                    np.zeros(0, dtype=np.int64))
+
+        hit_mask, intersection_points, distances, cell_ids = [
+            np.concatenate(chunk_values) for chunk_values in zip(*chunk_results)]
+        if self.has_model_transformation:
+            intersection_points = self.transform_points_to_world_coords(intersection_points)
+            distances = np.linalg.norm(intersection_points - ray_origins, axis=1)
+        return hit_mask, intersection_points, distances, cell_ids
+
+    def compute_first_rays_mesh_intersections_chunk(self, ray_origins, ray_directions):
+        """ Rays and results are in mesh coordinates (see compute_first_rays_mesh_intersections_batched()) """
+
+        num_rays = len(ray_origins)
+        unit_directions = ray_directions / np.linalg.norm(ray_directions, axis=1)[:, np.newaxis]
+
+        # Rays missing the bounding box are rejected before any locator query, the remaining
+        # rays are clipped to the segment inside the bounding box
+        box_hit_mask, t_enter, t_exit = self.compute_rays_bounding_box_intervals(
+            ray_origins, unit_directions, self.mesh_bounds)
+        query_indices = np.flatnonzero(box_hit_mask)
+        t_enter = t_enter[query_indices]
+        segment_lengths = t_exit[query_indices] - t_enter
+        line_first_points = ray_origins[query_indices] + t_enter[:, np.newaxis] * unit_directions[query_indices]
+        line_second_points = line_first_points + segment_lengths[:, np.newaxis] * unit_directions[query_indices]
+
+        hit_query_indices, hit_parametric_coords, hit_cell_ids = self._intersect_first_segments(
+            line_first_points, line_second_points)
+
+        hit_indices = query_indices[hit_query_indices]
+        hit_distances = t_enter[hit_query_indices] + \
+            np.asarray(hit_parametric_coords, dtype=float) * segment_lengths[hit_query_indices]
+
+        hit_mask = np.zeros(num_rays, dtype=bool)
+        hit_mask[hit_indices] = True
+        distances = np.full(num_rays, np.nan, dtype=float)
+        distances[hit_indices] = hit_distances
+        intersection_points = np.full((num_rays, 3), np.nan, dtype=float)
+        intersection_points[hit_indices] = \
+            ray_origins[hit_indices] + hit_distances[:, np.newaxis] * unit_directions[hit_indices]
+        cell_ids = np.full(num_rays, -1, dtype=np.int64)
+        cell_ids[hit_indices] = hit_cell_ids
+
+        self._add_ray_statistics({
+            'rays_total': num_rays,
+            'rays_culled': num_rays - len(query_indices),
+            'rays_queried': len(query_indices),
+            'rays_hit': len(hit_indices)})
+
+        return hit_mask, intersection_points, distances, cell_ids
+
+    def _intersect_first_segments(self, line_first_points, line_second_points):
+        """ Returns the indices, the parametric coordinates and the cell ids of the segments hitting the mesh """
+        if self.locator_type == 'bvh':
+            hit_query_mask, hit_parametric_coords, hit_cell_ids = self.locator.intersect_first_segments(
+                line_first_points, line_second_points)
+            hit_query_indices = np.flatnonzero(hit_query_mask)
+            return hit_query_indices, hit_parametric_coords[hit_query_indices], hit_cell_ids[hit_query_indices]
+        return self._intersect_first_segments_with_vtk_locator(line_first_points, line_second_points)
+
+    def _intersect_first_segments_with_vtk_locator(self, line_first_points, line_second_points):
+        """ Returns the indices, the parametric coordinates and the cell ids of the segments hitting the mesh """
+
+        # The output buffers of IntersectWithLine() are reused for all segments
+        t = reference(0.0)
+        x = [0.0, 0.0, 0.0]
+        pcoords = [0.0, 0.0, 0.0]
+        sub_id = reference(0)
+        cell_id = reference(0)
+        generic_cell = vtkGenericCell()
+        tolerance = 0.0
+
+        hit_query_indices = []
+        hit_parametric_coords = []
+        hit_cell_ids = []
+        for query_index, (line_first_point, line_second_point) in enumerate(
+                zip(line_first_points.tolist(), line_second_points.tolist())):
+            # In contrast to compute_single_line_mesh_intersection() only the first intersection is computed
+            if self.locator.IntersectWithLine(
+                    line_first_point, line_second_point, tolerance, t, x, pcoords, sub_id, cell_id, generic_cell):
+                hit_query_indices.append(query_index)
+                hit_parametric_coords.append(float(t))
+                hit_cell_ids.append(int(cell_id))
+
+        return np.asarray(hit_query_indices, dtype=np.int64), hit_parametric_coords, hit_cell_ids
+
+    def _get_process_pool(self, num_processes):
+        if self.process_pool is not None and self.process_pool_size != num_processes:
+            self.close_process_pool()
+        if self.process_pool is None:
+            # vtk objects can not be pickled, therefore the workers re-create the mesh from its string representation.
+            # Without a cache directory, the workers receive the arrays of the hierarchy instead of rebuilding it
+            bvh_arrays_and_hash = None
+            if self.locator_type == 'bvh' and self.locator_cache_dp is None:
+                bvh_arrays_and_hash = (self.locator.get_arrays(), self.locator.mesh_hash)
+            self.process_pool = multiprocessing.Pool(
+                num_processes,
+                initializer=_init_intersection_worker,
+                initargs=(
+                    DataUtility.write_poly_data_to_string(self.mesh),
+                    self.locator_type,
+                    self.locator_cache_dp,
+                    bvh_arrays_and_hash))
+            self.process_pool_size = num_processes
+        return self.process_pool
+
+    def close_process_pool(self):
+        if self.process_pool is not None:
+            self.process_pool.close()
+            self.process_pool.join()
+            self.process_pool = None
+            self.process_pool_size = None
+
+    @staticmethod
+    def create_computer_vision_camera_rays(cam_to_world_computer_vision_np_mat,
+                                           calibration_np_mat,
+                                           width,
+                                           height,
+                                           subsampling=1):
+        """
+        Uses the same conventions as CameraInterface.set_active_cam_from_computer_vision_cam_to_world_mat(),
+        i.e. the camera looks along its z axis and the y axis points downwards.
+        Returns the ray origins (N, 3) and the ray directions (N, 3) through the pixel centers of the
+        (height // subsampling, width // subsampling) image in row-major order. The directions are
+        not normalized, their z component in camera coordinates is 1 (i.e. depth = distance / norm).
+        """
+
+        sub_width = width // subsampling
+        sub_height = height // subsampling
+        # Centers of the subsampling x subsampling pixel blocks in full resolution image coordinates
+        xs = (np.arange(sub_width, dtype=float) + 0.5) * subsampling
+        ys = (np.arange(sub_height, dtype=float) + 0.5) * subsampling
+        xs, ys = np.meshgrid(xs, ys)
+        pixels_hom = np.stack((xs.ravel(), ys.ravel(), np.ones(xs.size)), axis=0)
+
+        cam_directions = np.linalg.inv(calibration_np_mat).dot(pixels_hom)
+        cam_directions /= cam_directions[2]
+
+        rotation = cam_to_world_computer_vision_np_mat[0:3, 0:3]
+        camera_center = cam_to_world_computer_vision_np_mat[0:3, 3]
+        ray_directions = rotation.dot(cam_directions).T
+        ray_origins = np.broadcast_to(camera_center, ray_directions.shape)
+        return ray_origins, ray_directions
+
+    def compute_computer_vision_depth_map(self,
+                                          cam_to_world_computer_vision_np_mat,
+                                          calibration_np_mat,
+                                          width,
+                                          height,
+                                          subsampling=1,
+                                          chunk_size=100000,
+                                          num_processes=None):
+        """
+        Render-free counterpart of ZBufferInterface.get_computer_vision_depth_buffer_as_numpy_arr(),
+        which does not require an OpenGL context. The renderer uses the image center as principal point
+        (unless CameraIntrinsicInterface.set_principal_point() is used), while the rays use the principal
+        point of the calibration matrix.
+        Returns the (H, W) depth map (pixels without intersection contain 0) and the (H, W, 3)
+        map of the intersection points (pixels without intersection contain nan)
+        num_processes=None computes the intersections in this process (see
+        compute_first_rays_mesh_intersections_batched()). A process pool created by this call is
+        closed before returning, an existing pool of the same size is reused and kept open.
+        """
 
-        # replace the existing 'mesh' with the scaled mesh
-        self.mesh = transform_filter.GetOutput()
-        # update the caster, since 'mesh' changed
-        self.obb_tree.SetDataSet(self.mesh)
-        self.obb_tree.BuildLocator()
+        ray_origins, ray_directions = self.create_computer_vision_camera_rays(
+            cam_to_world_computer_vision_np_mat,
+            calibration_np_mat,
+            width,
+            height,
+            subsampling)
+        owns_process_pool = self.process_pool is None or self.process_pool_size != num_processes
+        try:
+            hit_mask, intersection_points, distances, _ = self.compute_first_rays_mesh_intersections_batched(
+                ray_origins,
+                ray_directions,
+                chunk_size=chunk_size,
+                num_processes=num_processes)
+        finally:
+            if owns_process_pool and num_processes is not None and num_processes > 1:
+                self.close_process_pool()
 
+        depth_map = np.zeros(len(ray_directions), dtype=float)
+        depth_map[hit_mask] = distances[hit_mask] / np.linalg.norm(ray_directions[hit_mask], axis=1)
 
+        depth_map_shape = (height // subsampling, width // subsampling)
+        return depth_map.reshape(depth_map_shape), intersection_points.reshape(depth_map_shape + (3,))
 
+    def compute_computer_vision_depth_map_from_cam(self,
+                                                   computer_vision_cam,
+                                                   subsampling=1,
+                                                   chunk_size=100000,
+                                                   num_processes=None):
+        return self.compute_computer_vision_depth_map(
+            computer_vision_cam.get_4x4_cam_to_world_mat(),
+            computer_vision_cam.get_calibration_mat(),
+            computer_vision_cam.width,
+            computer_vision_cam.height,
+            subsampling=subsampling,
+            chunk_size=chunk_size,
+            num_processes=num_processes)
@@ -1,10 +1,30 @@
-import vtk
+import os
+import sys
+import time
+import numpy as np
+from vtkmodules.vtkCommonCore import vtkVersion
+from vtkmodules.vtkFiltersSources import vtkSphereSource
+from vtkmodules.vtkInteractionStyle import vtkInteractorStyleTrackballCamera
+from vtkmodules.vtkInteractionWidgets import vtkOrientationMarkerWidget
+from vtkmodules.vtkRenderingAnnotation import vtkAxesActor
+from vtkmodules.vtkRenderingCore import vtkActor, vtkCamera, vtkPolyDataMapper
+from vtkmodules.vtkRenderingCore import vtkRenderWindow, vtkRenderWindowInteractor, vtkRenderer
+# The following modules register the implementations of the (abstract) rendering classes
+# (i.e. the OpenGL render window, the text rendering of the axes actor and the default interactor style)
+import vtkmodules.vtkRenderingOpenGL2
+import vtkmodules.vtkRenderingFreeType
+import vtkmodules.vtkInteractionStyle
+
+from Utility.Logging_Extension import logger
 from VTKInterface.Interfaces.Camera_Interface import CameraInterface
 from VTKInterface.Interfaces.ZBuffer_Interface import ZBufferInterface
 from VTKInterface.Interfaces.Image_Buffer_Interface import ImageBufferInterface
 from VTKInterface.Interfaces.Coordinate_Axes_Interface import CoordinateAxesInterface
 
 from VTKInterface.Utility.Actor_Utility import ActorUtility
+from VTKInterface.Utility.Data_Utility import DataUtility
+from VTKInterface.Utility.Octree_Utility import PointCloudOctree
+from VTKInterface.Utility.Frame_Sink_Utility import FrameSink
 
 
 class RenderInterface(CameraInterface, ZBufferInterface, ImageBufferInterface, CoordinateAxesInterface):
@@ -12,16 +32,38 @@ class RenderInterface(CameraInterface, ZBufferInterface, ImageBufferInterface, C
     # https://www.kitware.com/products/books/VTKUsersGuide.pdf
     #       4.4 Controlling The Camera
 
-    def __init__(self, off_screen_rendering=True, width=None, height=None, background_color=(0, 0, 255)):
+    # Render window classes of the headless backends. These classes are only available,
+    # if VTK has been built with the corresponding option (VTK_OPENGL_HAS_EGL / VTK_OPENGL_HAS_OSMESA).
+    #   'default': platform window selected by VTK (e.g. X11 on Linux, requires an X server)
+    #   'egl':     off screen rendering on the GPU without X server
+    #   'osmesa':  off screen software rendering on the CPU
+    #   'auto':    'default' if a display is available or on screen rendering is requested,
+    #              otherwise the first available headless backend
+    RENDER_BACKENDS = {
+        'egl': 'vtkEGLRenderWindow',
+        'osmesa': 'vtkOSOpenGLRenderWindow'}
+
+    # The vtk version is printed only once per process
+    vtk_version_printed = False
 
-        print(
-            'VTK Version: ' +
-            str(vtk.vtkVersion.GetVTKMajorVersion()) + '.' +
-            str(vtk.vtkVersion.GetVTKMinorVersion()))
+    def __init__(self,
+                 off_screen_rendering=True,
+                 width=None,
+                 height=None,
+                 background_color=(0, 0, 255),
+                 render_backend='default'):
 
-        self.vtk_renderer = vtk.vtkRenderer()
+        if not RenderInterface.vtk_version_printed:
+            print(
+                'VTK Version: ' +
+                str(vtkVersion.GetVTKMajorVersion()) + '.' +
+                str(vtkVersion.GetVTKMinorVersion()))
+            RenderInterface.vtk_version_printed = True
 
-        self.vtk_render_window = vtk.vtkRenderWindow()
+        self.vtk_renderer = vtkRenderer()
+
+        self.render_backend = self.resolve_render_backend(render_backend, off_screen_rendering)
+        self.vtk_render_window = self.create_render_window(self.render_backend)
         CameraInterface.__init__(
             self, self.vtk_renderer, self.vtk_render_window)
         ZBufferInterface.__init__(
@@ -29,9 +71,14 @@ class RenderInterface(CameraInterface, ZBufferInterface, ImageBufferInterface, C
         ImageBufferInterface.__init__(
             self, self.vtk_renderer, self.vtk_render_window, width, height)
 
-        self.vtk_axes_actor = vtk.vtkAxesActor()
-        self.vtk_orientation_marker_widget = vtk.vtkOrientationMarkerWidget()
-        self.vtk_render_window_interactor = vtk.vtkRenderWindowInteractor()
+        self.vtk_axes_actor = vtkAxesActor()
+        if off_screen_rendering:
+            # Interactor and widget are only required (and may only work) with an on screen window
+            self.vtk_orientation_marker_widget = None
+            self.vtk_render_window_interactor = None
+        else:
+            self.vtk_orientation_marker_widget = vtkOrientationMarkerWidget()
+            self.vtk_render_window_interactor = vtkRenderWindowInteractor()
         CoordinateAxesInterface.__init__(
             self,
             self.vtk_renderer,
@@ -46,20 +93,147 @@ class RenderInterface(CameraInterface, ZBufferInterface, ImageBufferInterface, C
             self._init_render_window_interactor()
 
         # Configure Render Settings
+        self.background_color = background_color
         self.vtk_renderer.SetBackground(*background_color)
+        self.render_width = width
+        self.render_height = height
         if width is not None and height is not None:
-            self.render_width = width
-            self.render_height = height
-            self.vtk_render_window.SetSize(width, height)
+            self.set_render_size(width, height)
 
         self.set_active_cam_model_view_transformation_to_identity()
+        # Required to restore the camera in reset_scene()
+        self.initial_vtk_camera = vtkCamera()
+        self.initial_vtk_camera.DeepCopy(self.vtk_renderer.GetActiveCamera())
+        # (poly_ifp, texture_ifp) -> actor of meshes that remain loaded after reset_scene()
+        self.resident_actors = {}
+
+    @staticmethod
+    def get_available_render_backends():
+        available_render_backends = ['default']
+        for render_backend, render_window_class_name in RenderInterface.RENDER_BACKENDS.items():
+            if hasattr(vtkmodules.vtkRenderingOpenGL2, render_window_class_name):
+                available_render_backends.append(render_backend)
+        return available_render_backends
+
+    @staticmethod
+    def resolve_render_backend(render_backend, off_screen_rendering=True):
+        available_render_backends = RenderInterface.get_available_render_backends()
+        if render_backend == 'auto':
+            has_display = sys.platform != 'linux' or 'DISPLAY' in os.environ or 'WAYLAND_DISPLAY' in os.environ
+            if not off_screen_rendering or has_display:
+                return 'default'
+            for headless_render_backend in ['egl', 'osmesa']:
+                if headless_render_backend in available_render_backends:
+                    return headless_render_backend
+            logger.info('No headless render backend available, falling back to the default render window')
+            return 'default'
+        if render_backend != 'default' and render_backend not in RenderInterface.RENDER_BACKENDS:
+            raise ValueError('Unknown render backend: ' + str(render_backend))
+        if render_backend not in available_render_backends:
+            raise ValueError(
+                'Render backend ' + render_backend + ' is not supported by this VTK build (available: ' +
+                str(available_render_backends) + ')')
+        if render_backend != 'default' and not off_screen_rendering:
+            raise ValueError('Render backend ' + render_backend + ' supports only off screen rendering')
+        return render_backend
+
+    @staticmethod
+    def create_render_window(render_backend):
+        if render_backend == 'default':
+            return vtkRenderWindow()
+        render_window_class = getattr(
+            vtkmodules.vtkRenderingOpenGL2, RenderInterface.RENDER_BACKENDS[render_backend])
+        return render_window_class()
+
+    def get_render_backend(self):
+        """ Returns the selected backend and the class name of the actual render window """
+        return self.render_backend, self.vtk_render_window.GetClassName()
+
+    @staticmethod
+    def probe_render_capabilities(render_backend='auto',
+                                  width=1920,
+                                  height=1080,
+                                  num_frames=100,
+                                  sphere_resolution=512,
+                                  window_size_candidates=(2048, 4096, 8192, 16384)):
+        """
+        Creates an off screen render interface and reports
+            render_backend:             selected backend and class name of the render window
+            max_window_size:            largest (square) candidate size that could be rendered and read back
+            frames_per_second:          rendering of a sphere with 2 * sphere_resolution ** 2 triangles
+            frames_per_second_readback: rendering and reading back the color buffer
+        The maximum window size is determined empirically, since the limits reported by the
+        driver (e.g. GL_MAX_RENDERBUFFER_SIZE) do not consider the available memory.
+        """
+        background_color = (0.25, 0.5, 0.75)
+        render_interface = RenderInterface(
+            off_screen_rendering=True,
+            width=width,
+            height=height,
+            background_color=background_color,
+            render_backend=render_backend)
+
+        sphere_source = vtkSphereSource()
+        sphere_source.SetThetaResolution(sphere_resolution)
+        sphere_source.SetPhiResolution(sphere_resolution)
+        mapper = vtkPolyDataMapper()
+        mapper.SetInputConnection(sphere_source.GetOutputPort())
+        actor = vtkActor()
+        actor.SetMapper(mapper)
+        render_interface.add_actor(actor)
+        render_interface.vtk_renderer.ResetCamera()
+
+        vtk_camera = render_interface.vtk_renderer.GetActiveCamera()
+        render_interface.render()
+        start_time = time.time()
+        for _ in range(num_frames):
+            vtk_camera.Azimuth(360.0 / num_frames)
+            render_interface.render()
+        frames_per_second = num_frames / (time.time() - start_time)
+
+        color_buffer = None
+        start_time = time.time()
+        for _ in range(num_frames):
+            vtk_camera.Azimuth(360.0 / num_frames)
+            render_interface.render()
+            color_buffer = render_interface.get_rgba_buffer_as_uint8_numpy_arr(
+                out=color_buffer, with_alpha=False, flip=None)
+        frames_per_second_readback = num_frames / (time.time() - start_time)
+
+        # The (uncovered) corners of the window must show the background color
+        render_interface.vtk_renderer.RemoveActor(actor)
+        expected_color = np.round(np.asarray(background_color) * 255).astype(np.uint8)
+        max_window_size = None
+        for window_size in sorted(window_size_candidates):
+            try:
+                render_interface.set_render_size(window_size, window_size)
+                render_interface.render()
+                color_buffer = render_interface.get_rgba_buffer_as_uint8_numpy_arr(with_alpha=False, flip=None)
+            except (MemoryError, RuntimeError):
+                break
+            corner_colors = color_buffer[[0, 0, -1, -1], [0, -1, 0, -1]]
+            if not np.all(np.abs(corner_colors.astype(int) - expected_color) <= 1):
+                break
+            max_window_size = window_size
+
+        return {'render_backend': render_interface.get_render_backend(),
+                'max_window_size': max_window_size,
+                'frames_per_second': frames_per_second,
+                'frames_per_second_readback': frames_per_second_readback}
 
     def _init_render_window_interactor(self):
-        self.vtk_render_window_interactor = vtk.vtkRenderWindowInteractor()
+        self.vtk_render_window_interactor = vtkRenderWindowInteractor()
         self.vtk_render_window_interactor.SetRenderWindow(self.vtk_render_window)
         self.set_interaction_style()
         self.vtk_render_window_interactor.Initialize()
 
+    def set_render_size(self, width, height):
+        self.width = width
+        self.height = height
+        self.render_width = width
+        self.render_height = height
+        self.vtk_render_window.SetSize(width, height)
+
     def add_actor(self, actor):
         self.vtk_renderer.AddActor(actor)
 
@@ -67,10 +241,163 @@ class RenderInterface(CameraInterface, ZBufferInterface, ImageBufferInterface, C
         point_cloud_actor = ActorUtility.create_vtk_point_cloud_actor(coords, colors)
         self.add_actor(point_cloud_actor)
 
-    def load_vtk_mesh_or_point_cloud(self, poly_ifp, texture_ifp=None):
+    def add_point_cloud_lod(self,
+                            coords=None,
+                            colors=None,
+                            octree=None,
+                            interactive_point_budget=1000000,
+                            idle_point_budget=10000000,
+                            point_size=3,
+                            max_depth=12,
+                            cache_dp=None):
+        """
+        Level of detail version of add_point_cloud() for huge point clouds (see PointCloudOctree).
+        While the camera is moved (interactively), only the first interactive_point_budget points
+        of the progressive order are rendered, otherwise the first idle_point_budget points.
+        Only the points within the idle point budget are passed to vtk (and to the GPU), i.e. the default
+        budget (10 million points) bounds the memory of huge point clouds. Use None to render all points.
+        Either coords/colors or a precomputed octree must be provided, cache_dp stores the octree on disc.
+        Returns the created actor
+        """
+        if octree is None:
+            octree = PointCloudOctree.create_from_numpy(coords, colors, max_depth=max_depth, cache_dp=cache_dp)
+        if idle_point_budget is None:
+            idle_point_budget = octree.get_num_points()
+        interactive_point_budget = min(interactive_point_budget, idle_point_budget)
+
+        # Both poly data share the coords and colors of the octree (the arrays are not copied)
+        idle_poly_data = DataUtility.create_point_cloud_poly_data(*octree.get_points(idle_point_budget))
+        interactive_poly_data = DataUtility.create_point_cloud_poly_data(
+            *octree.get_points(interactive_point_budget))
+
+        lod_actor = ActorUtility.create_vtk_point_cloud_actor_from_poly_data(idle_poly_data, point_size=point_size)
+        lod_mapper = lod_actor.GetMapper()
+        self.add_actor(lod_actor)
+
+        if self.vtk_render_window_interactor is not None and interactive_point_budget < idle_point_budget:
+            interactor_style = self.vtk_render_window_interactor.GetInteractorStyle()
+
+            def _show_interactive_points(caller, event):
+                lod_mapper.SetInputData(interactive_poly_data)
+
+            def _show_idle_points(caller, event):
+                lod_mapper.SetInputData(idle_poly_data)
+                # Refine the view after the interaction has finished
+                self.render()
+
+            self.add_scene_observer(interactor_style, 'StartInteractionEvent', _show_interactive_points)
+            self.add_scene_observer(interactor_style, 'EndInteractionEvent', _show_idle_points)
+
+        return lod_actor
+
+    def add_point_cloud_streamed(self,
+                                 ply_ifp,
+                                 chunk_size=1000000,
+                                 voxel_size=None,
+                                 memory_budget_bytes=None,
+                                 point_size=3,
+                                 render_progressively=True):
+        """
+        Reads a binary PLY point cloud chunk by chunk (see DataUtility.iterate_ply_point_chunks())
+        and adds an actor per chunk, i.e. the file is never loaded completely.
+        If voxel_size is provided, only the first point of each voxel is kept (across all chunks).
+        If memory_budget_bytes is provided, reading stops as soon as the (estimated) memory
+        of the kept points and of the current chunk would exceed the budget.
+        If render_progressively is True, the scene is rendered after each chunk.
+        Returns the created actors and statistics
+        """
+        # Estimated bytes per kept point: coords (float32), colors (uint8), vertex cell (int64 offset and id)
+        bytes_per_point = 12 + 3 + 16
+        if voxel_size is not None:
+            # The sorted voxel keys (int64)
+            bytes_per_point += 8
+        if memory_budget_bytes is not None:
+            chunk_bytes = chunk_size * bytes_per_point
+            if memory_budget_bytes < chunk_bytes:
+                raise ValueError('The memory budget does not suffice for a single chunk of ' + str(chunk_size))
+
+        voxel_keys = np.empty(0, dtype=np.int64)
+        actors = []
+        statistics = {'num_points_read': 0, 'num_points_kept': 0, 'num_chunks': 0, 'stopped_early': False}
+        for coords, colors in DataUtility.iterate_ply_point_chunks(ply_ifp, chunk_size):
+            statistics['num_chunks'] += 1
+            statistics['num_points_read'] += len(coords)
+
+            if voxel_size is not None:
+                chunk_voxel_keys, first_indices = np.unique(
+                    DataUtility.compute_voxel_keys(coords, voxel_size), return_index=True)
+                # Remove the voxels occupied by points of previous chunks
+                insert_positions = np.searchsorted(voxel_keys, chunk_voxel_keys)
+                if len(voxel_keys) > 0:
+                    new_mask = voxel_keys[np.minimum(insert_positions, len(voxel_keys) - 1)] != chunk_voxel_keys
+                else:
+                    new_mask = np.ones(len(chunk_voxel_keys), dtype=bool)
+                keep_indices = np.sort(first_indices[new_mask])
+                voxel_keys = np.insert(voxel_keys, insert_positions[new_mask], chunk_voxel_keys[new_mask])
+                coords = coords[keep_indices]
+                if colors is not None:
+                    colors = colors[keep_indices]
+
+            if memory_budget_bytes is not None:
+                num_points_within_budget = (
+                    memory_budget_bytes - chunk_bytes) // bytes_per_point - statistics['num_points_kept']
+                if len(coords) > num_points_within_budget:
+                    num_points_within_budget = max(num_points_within_budget, 0)
+                    coords = coords[:num_points_within_budget]
+                    if colors is not None:
+                        colors = colors[:num_points_within_budget]
+                    statistics['stopped_early'] = True
+
+            if len(coords) > 0:
+                # The chunk arrays are shared with vtk (create_point_cloud_poly_data() does not copy them)
+                actor = ActorUtility.create_vtk_point_cloud_actor(coords, colors, point_size=point_size)
+                self.add_actor(actor)
+                actors.append(actor)
+                statistics['num_points_kept'] += len(coords)
+                if render_progressively:
+                    self.render()
+
+            if statistics['stopped_early']:
+                logger.info('Reached the memory budget after ' + str(statistics['num_points_read']) + ' points of ' +
+                            ply_ifp)
+                break
+        return actors, statistics
+
+    def load_vtk_mesh_or_point_cloud(self, poly_ifp, texture_ifp=None, keep_resident=False):
+        """
+        If keep_resident is True, the actor is kept after reset_scene() and reused
+        by subsequent calls with the same files (without reading the files again)
+        """
+        resident_key = (poly_ifp, texture_ifp)
+        if resident_key in self.resident_actors:
+            actor = self.resident_actors[resident_key]
+            if not self.vtk_renderer.HasViewProp(actor):
+                self.vtk_renderer.AddActor(actor)
+            return actor
+
         actor = ActorUtility.create_vtk_mesh_or_point_cloud_actor_from_file(
             poly_ifp, texture_ifp)
         self.vtk_renderer.AddActor(actor)
+        if keep_resident:
+            self.resident_actors[resident_key] = actor
+        return actor
+
+    def reset_scene(self, keep_resident_actors=True):
+        """
+        Removes all actors and restores the camera and the background color, i.e. the
+        render interface (and its OpenGL context) can be reused for an unrelated scene.
+        If keep_resident_actors is True, resident actors (see load_vtk_mesh_or_point_cloud())
+        remain in memory and are added again when they are loaded the next time.
+        """
+        self.vtk_renderer.RemoveAllViewProps()
+        # Observers of removed actors (e.g. of add_points()) would keep them alive
+        self.remove_scene_observers()
+        if not keep_resident_actors:
+            self.resident_actors = {}
+        self.vtk_renderer.SetBackground(*self.background_color)
+        self.vtk_renderer.GetActiveCamera().DeepCopy(self.initial_vtk_camera)
+        # The cached intrinsics do not correspond to the restored camera
+        self.active_cam_intrinsics_key = None
 
     def get_render_window(self):
         return self.vtk_render_window
@@ -94,15 +421,25 @@ class RenderInterface(CameraInterface, ZBufferInterface, ImageBufferInterface, C
         # interactor_style = vtk.vtkInteractorStyleUnicam()  # not so useful
         # interactor_style = vtk.vtkInteractorStyleUser()  # no interaction at all
 
-        interactor_style = vtk.vtkInteractorStyleTrackballCamera()  # THATS IT
+        interactor_style = vtkInteractorStyleTrackballCamera()  # THATS IT
         self.vtk_render_window_interactor.SetInteractorStyle(interactor_style)
 
     def render(self):
+        # The default max_clipping_range (sys.float_info.max) is kept, if the camera is set before the
+        # actors are added. Such a far plane makes the depth buffer conversion degenerate, thus
+        # a tight clipping range is computed from the bounds of the scene
+        if self.get_clipping_range()[1] > np.finfo(np.float32).max:
+            self.vtk_renderer.ResetCameraClippingRange()
         # Never call the render method of the renderer,
         # always use the renderwindow render method
         self.vtk_render_window.Render()
 
+    def create_frame_sink(self, max_queue_depth=4, num_threads=2):
+        # Pipelines rendering/readback (main thread) and encoding/writing (thread pool), see FrameSink
+        return FrameSink(self, max_queue_depth=max_queue_depth, num_threads=num_threads)
+
     def start_interactor(self):
+        assert self.vtk_render_window_interactor is not None, 'The interactor requires on screen rendering'
         self.vtk_render_window_interactor.Start()
 
     def render_and_start(self):
@@ -0,0 +1,130 @@
+import time
+import threading
+from contextlib import contextmanager
+
+from Utility.Logging_Extension import logger
+from VTKInterface.Interfaces.Render_Interface import RenderInterface
+
+
+class RenderInterfacePool(object):
+
+    """ Usage:
+        render_interface_pool = RenderInterfacePool(max_size=2, num_warm=2, render_backend='auto')
+        with render_interface_pool.acquire() as render_interface:
+            render_interface.load_vtk_mesh_or_point_cloud(poly_ifp, keep_resident=True)
+            render_interface.set_active_cam_from_computer_vision_cam(cam)
+            depth_buffer = render_interface.get_computer_vision_depth_buffer_as_numpy_arr()
+        logger.vinfo('metrics', render_interface_pool.get_metrics())
+
+        Pool of off screen render interfaces (i.e. of render windows with an initialized OpenGL context)
+        for request driven workloads. Checked in render interfaces are reset with reset_scene().
+        If all max_size render interfaces are checked out, checkout() blocks until one is checked in.
+    """
+
+    def __init__(self, max_size=4, num_warm=0, **render_interface_kwargs):
+        """ render_interface_kwargs are passed to RenderInterface() (off_screen_rendering is always True) """
+        assert num_warm <= max_size
+        self.max_size = max_size
+        render_interface_kwargs['off_screen_rendering'] = True
+        self.render_interface_kwargs = render_interface_kwargs
+
+        self.condition = threading.Condition()
+        self.idle_render_interfaces = []
+        self.num_render_interfaces = 0
+        self.metrics = {
+            'num_checkouts': 0,
+            'num_pool_hits': 0,
+            'num_created': 0,
+            'creation_time': 0.0,
+            'checkout_wait_time': 0.0,
+            'max_checked_out': 0}
+
+        for _ in range(num_warm):
+            self.idle_render_interfaces.append(self._create_render_interface())
+
+    def _create_render_interface(self):
+        start_time = time.time()
+        render_interface = RenderInterface(**self.render_interface_kwargs)
+        # The OpenGL context is created with the first render call
+        render_interface.render()
+        creation_time = time.time() - start_time
+        with self.condition:
+            self.num_render_interfaces += 1
+            self.metrics['num_created'] += 1
+            self.metrics['creation_time'] += creation_time
+        return render_interface
+
+    def checkout(self, timeout=None):
+        """ Returns an idle render interface, creates a new one (if the pool is not full) or waits """
+        start_time = time.time()
+        with self.condition:
+            while len(self.idle_render_interfaces) == 0 and self.num_render_interfaces >= self.max_size:
+                remaining_time = None if timeout is None else timeout - (time.time() - start_time)
+                if remaining_time is not None and remaining_time <= 0:
+                    raise TimeoutError('No render interface available within ' + str(timeout) + ' seconds')
+                self.condition.wait(remaining_time)
+            self.metrics['checkout_wait_time'] += time.time() - start_time
+            self.metrics['num_checkouts'] += 1
+            if len(self.idle_render_interfaces) > 0:
+                self.metrics['num_pool_hits'] += 1
+                render_interface = self.idle_render_interfaces.pop()
+            else:
+                render_interface = None
+                # Reserve the slot, the creation happens outside the lock
+                self.num_render_interfaces += 1
+
+        if render_interface is None:
+            try:
+                render_interface = self._create_render_interface()
+            finally:
+                with self.condition:
+                    # _create_render_interface() counts the render interface again (or it failed)
+                    self.num_render_interfaces -= 1
+                    self.condition.notify()
+
+        with self.condition:
+            num_checked_out = self.num_render_interfaces - len(self.idle_render_interfaces)
+            self.metrics['max_checked_out'] = max(self.metrics['max_checked_out'], num_checked_out)
+        return render_interface
+
+    def checkin(self, render_interface, keep_resident_actors=True):
+        try:
+            render_interface.reset_scene(keep_resident_actors=keep_resident_actors)
+        except Exception:
+            # Do not reuse render interfaces in an unknown state
+            logger.info('Discarding render interface, since its scene could not be reset')
+            with self.condition:
+                self.num_render_interfaces -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.idle_render_interfaces.append(render_interface)
+            self.condition.notify()
+
+    @contextmanager
+    def acquire(self, timeout=None, keep_resident_actors=True):
+        render_interface = self.checkout(timeout)
+        try:
+            yield render_interface
+        finally:
+            self.checkin(render_interface, keep_resident_actors)
+
+    def get_metrics(self):
+        with self.condition:
+            metrics = dict(self.metrics)
+            metrics['num_render_interfaces'] = self.num_render_interfaces
+            metrics['num_idle'] = len(self.idle_render_interfaces)
+        num_checkouts = metrics['num_checkouts']
+        metrics['pool_hit_rate'] = metrics['num_pool_hits'] / num_checkouts if num_checkouts > 0 else 0.0
+        num_created = metrics['num_created']
+        metrics['mean_creation_time'] = metrics['creation_time'] / num_created if num_created > 0 else 0.0
+        return metrics
+
+    def close(self):
+        """ Releases the idle render interfaces (checked out render interfaces are not affected) """
+        with self.condition:
+            idle_render_interfaces = self.idle_render_interfaces
+            self.idle_render_interfaces = []
+            self.num_render_interfaces -= len(idle_render_interfaces)
+        for render_interface in idle_render_interfaces:
+            render_interface.get_render_window().Finalize()
@@ -1,12 +1,15 @@
 import numpy as np
-from Utility.Logging_Extension import logger
-from matplotlib import pyplot as plt
 
-import vtk
-from vtk.util import numpy_support
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkCommonCore import VTK_FLOAT
+from vtkmodules.vtkIOImage import vtkJPEGWriter
+from vtkmodules.vtkImagingCore import vtkImageShiftScale
+from vtkmodules.vtkRenderingCore import vtkRenderWindow, vtkRenderer, vtkWindowToImageFilter
 
 from VTKInterface.Interfaces.Base_Interface import BaseInterface
 from VTKInterface.Utility.Data_Utility import DataUtility
+from VTKInterface.Utility.Conversion_Utility import convert_vtk_matrix_to_numpy_array
+from VTKInterface.Utility.Depth_Buffer_Utility import DepthBufferUtility
 
 class ZBufferInterface(BaseInterface):
 
@@ -19,35 +22,44 @@ class ZBufferInterface(BaseInterface):
         """
 
         self.init_instance_variable(
-            "vtk_renderer", vtk_renderer, vtk.vtkRenderer())
+            "vtk_renderer", vtk_renderer, vtkRenderer())
         self.init_instance_variable(
-            "vtk_render_window", vtk_render_window, vtk.vtkRenderWindow())
+            "vtk_render_window", vtk_render_window, vtkRenderWindow())
 
         self.width = width
         self.height = height
+        # buffer shape -> (float32 z buffer, bool background mask) reused by
+        # get_computer_vision_depth_buffer_as_numpy_arr()
+        self.z_buffer_pool = {}
 
     # def get_z_buffer_sparse(self, sparsity=100):
     #     z_buffer_data_numpy = self.get_opengl_z_buffer_as_numpy_arr()
     #     z_buffer_sparse = z_buffer_data_numpy[::sparsity]
     #     return z_buffer_sparse.flatten()
 
-    def get_opengl_z_buffer_as_numpy_arr(self):
+    def get_opengl_z_buffer_as_numpy_arr(self, out=None):
         """
         Returns the z buffer values in [0,1] in image coordinates
         The z buffer corresponds to an image starting at the lower left (0,0)
+        out: C-contiguous float32 array with shape (H, W), which is filled instead of allocating a new array
         """
         if not self.vtk_render_window.GetOffScreenRendering():
             error_str = 'THIS ONLY WORKS IN OFF SCREEN MODE ' \
                         '(use off_screen_rendering=True in render_interface constructor)'
             assert False, error_str
+        buffer_shape = (self.render_height, self.render_width)
+        if out is None:
+            out = np.empty(buffer_shape, dtype=np.float32)
+        assert out.shape == buffer_shape and out.dtype == np.float32 and out.flags.c_contiguous
+
         # http://berkgeveci.github.io/page7/
-        z_buffer_data = vtk.vtkFloatArray()
+        # Since the size of the wrapping vtk array matches the size of the requested z buffer,
+        # vtk writes the z buffer directly into the numpy buffer
+        z_buffer_data = numpy_support.numpy_to_vtk(out.reshape(-1), deep=False, array_type=VTK_FLOAT)
         # GetZbufferData (int x, int y, int x2, int y2, vtkFloatArray *z)
         self.vtk_render_window.GetZbufferData(
             0, 0, self.render_width - 1, self.render_height - 1, z_buffer_data)
-        z_buffer_data_numpy = numpy_support.vtk_to_numpy(z_buffer_data)
-        z_buffer_data_numpy = np.reshape(z_buffer_data_numpy, (-1, self.render_width))
-        return z_buffer_data_numpy
+        return out
 
     def get_computer_vision_z_buffer_as_numpy_arr(self):
         """ z_buffer contains values in [0,1]  """
@@ -55,37 +67,54 @@ class ZBufferInterface(BaseInterface):
         # flipping along the first axis (y)
         return np.flipud(opengl_z_buffer)
 
-    def get_z_buffer_as_world_coords(self, n_th_result_point=10):
+    def get_z_buffer_as_world_coords(self, stride=1, roi=None):
         """ z_buffer contains values in [0,1]  """
         z_buffer_matrix = self.get_opengl_z_buffer_as_numpy_arr()
-        return self.convert_z_buffer_mat_to_world_coords(z_buffer_matrix, n_th_result_point)
-
-    def convert_z_buffer_mat_to_world_coords(self, z_buffer_matrix, n_th_result_point=10):
-        """ z_buffer contains values in [0,1]  """
-
-        # https://vtk.org/doc/nightly/html/classvtkDepthImageToPointCloud.html
-        # https://github.com/Kitware/VTK/blob/master/Rendering/Image/vtkDepthImageToPointCloud.h
-        #   TODO
-        #   e.g. vtk.vtkDepthImageToPointCloud() is part of the python interface
-
-        world_coords = []
-        index = 0
-        num_values = z_buffer_matrix.shape[0] * z_buffer_matrix.shape[1]
-        for (y, x), z_value in np.ndenumerate(z_buffer_matrix):
-            if index % 10000 == 0:
-                logger.info('index: ' + str(index) + ' of ' + str(num_values))
-            # We assume that points lying on the clipping plane are not part of the scene
-            if z_value < 1.0:
-                if index % n_th_result_point == 0:
-                    # https://www.vtk.org/doc/nightly/html/classvtkViewport.html
-                    self.vtk_renderer.SetDisplayPoint(x, y, z_value)    # TODO REMOVE REDUNDANT?
-                    # https://www.vtk.org/doc/nightly/html/classvtkRenderer.html
+        return self.convert_z_buffer_mat_to_world_coords(z_buffer_matrix, stride, roi)
 
-                    world_coord = self._vtk_convert_display_coord_to_world_coord(x, y, z_value)
-                    world_coords.append(world_coord)
-            index += 1
+    def convert_z_buffer_mat_to_world_coords(self, z_buffer_matrix, stride=1, roi=None):
+        """
+        z_buffer contains values in [0,1]
+        The z buffer corresponds to an image starting at the lower left (0,0)
+        roi = (x_min, y_min, x_max, y_max) in z buffer coordinates (max values are exclusive)
+        Returns the world coordinates as (N, 3) array and the (H, W) pixel mask of the
+        corresponding z buffer entries (the coordinates follow the row-major order of the mask)
+        """
 
-        return world_coords
+        # Instead of calling DisplayToWorld() for each pixel (see _vtk_convert_display_coord_to_world_coord),
+        # we replicate vtkViewport::DisplayToView() and vtkRenderer::ViewToWorld() for all pixels at once
+        #   https://github.com/Kitware/VTK/blob/master/Rendering/Core/vtkViewport.cxx
+        #   https://github.com/Kitware/VTK/blob/master/Rendering/Core/vtkRenderer.cxx
+
+        height, width = z_buffer_matrix.shape
+        if roi is None:
+            x_min, y_min, x_max, y_max = 0, 0, width, height
+        else:
+            x_min, y_min, x_max, y_max = roi
+
+        pixel_mask = np.zeros((height, width), dtype=bool)
+        pixel_mask[y_min:y_max:stride, x_min:x_max:stride] = True
+        # We assume that points lying on the clipping plane are not part of the scene
+        pixel_mask &= z_buffer_matrix < 1.0
+        ys, xs = np.nonzero(pixel_mask)
+
+        window_width, window_height = self.vtk_render_window.GetSize()
+        vp_x_min, vp_y_min, vp_x_max, vp_y_max = self.vtk_renderer.GetViewport()
+
+        view_coords_hom = np.empty((4, len(xs)), dtype=float)
+        view_coords_hom[0] = 2.0 * (xs - window_width * vp_x_min) / (window_width * (vp_x_max - vp_x_min)) - 1.0
+        view_coords_hom[1] = 2.0 * (ys - window_height * vp_y_min) / (window_height * (vp_y_max - vp_y_min)) - 1.0
+        view_coords_hom[2] = z_buffer_matrix[pixel_mask]
+        view_coords_hom[3] = 1.0
+
+        # The composite projection matrix maps world coordinates to view coordinates
+        composite_projection_mat = convert_vtk_matrix_to_numpy_array(
+            self.vtk_renderer.GetActiveCamera().GetCompositeProjectionTransformMatrix(
+                self.vtk_renderer.GetTiledAspectRatio(), 0, 1))
+        world_coords_hom = np.linalg.inv(composite_projection_mat).dot(view_coords_hom)
+        world_coords = (world_coords_hom[0:3] / world_coords_hom[3]).T
+
+        return world_coords, pixel_mask
 
     def _vtk_convert_display_coord_to_world_coord(self, x, y, z):
 
@@ -97,7 +126,12 @@ class ZBufferInterface(BaseInterface):
         world_coord = world_coord_hom[0:3]
         return world_coord
 
-    def get_computer_vision_depth_buffer_as_numpy_arr(self):
+    def get_computer_vision_depth_buffer_as_numpy_arr(self, out=None):
+        """
+        Returns the depth buffer as (H, W) float32 array starting at the upper left (0 for the background)
+        out: C-contiguous float32 array with shape (H, W), which is filled instead of allocating a new array
+            (e.g. a buffer reused for consecutive frames)
+        """
 
         # https://stackoverflow.com/questions/6652253/getting-the-true-z-value-from-the-depth-buffer
 
@@ -106,19 +140,36 @@ class ZBufferInterface(BaseInterface):
         # https://stackoverflow.com/questions/17659362/get-depth-from-camera-for-each-pixel
         #   according to the comments here, the depth buffer is not linearly spaced
 
-        z_buffer_data_numpy = self.get_computer_vision_z_buffer_as_numpy_arr()
+        buffer_shape = (self.render_height, self.render_width)
+        if out is None:
+            out = np.empty(buffer_shape, dtype=np.float32)
+        assert out.shape == buffer_shape and out.dtype == np.float32
+
+        if buffer_shape not in self.z_buffer_pool:
+            self.z_buffer_pool[buffer_shape] = (
+                np.empty(buffer_shape, dtype=np.float32), np.empty(buffer_shape, dtype=bool))
+        z_buffer, background_mask = self.z_buffer_pool[buffer_shape]
+        self.get_opengl_z_buffer_as_numpy_arr(out=z_buffer)
         z_near, z_far = self.get_clipping_range()
         # logger.vinfo('z_near', z_near)
         # logger.vinfo('z_far', z_far)
 
-        # http://web.archive.org/web/20130416194336/http://olivers.posterous.com/linear-depth-in-glsl-for-real
-        #   See the 3rd code block
-        numerator = 2.0 * z_near * z_far
-        denominator = z_far + z_near - (2.0 * z_buffer_data_numpy - 1.0) * (z_far - z_near)
-        depth_buffer_data_numpy = numerator/denominator
-        depth_buffer_data_numpy[z_buffer_data_numpy == 1.0] = 0
+        # The z buffer starts at the lower left, writing into the flipped view of out flips the result
+        depth_buffer = out[::-1]
 
-        return depth_buffer_data_numpy
+        # http://web.archive.org/web/20130416194336/http://olivers.posterous.com/linear-depth-in-glsl-for-real
+        #   See the 3rd code block, i.e. depth = 2 * n * f / (f + n - (2 * z - 1) * (f - n))
+        #   which equals n * f / ((f - n) * (1 - z) + n). For z in [0.5, 1] the difference 1 - z is
+        #   exact in float32, which avoids the cancellation of f - (f - n) * z close to the far plane.
+        with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+            np.subtract(np.float32(1.0), z_buffer, out=depth_buffer)
+            np.multiply(depth_buffer, np.float32(z_far - z_near), out=depth_buffer)
+            np.add(depth_buffer, np.float32(z_near), out=depth_buffer)
+            np.divide(np.float32(z_near * z_far), depth_buffer, out=depth_buffer)
+        np.equal(z_buffer, np.float32(1.0), out=background_mask)
+        np.copyto(depth_buffer, np.float32(0.0), where=background_mask)
+
+        return out
 
     def get_clipping_range(self):
         return self.vtk_renderer.GetActiveCamera().GetClippingRange()
@@ -128,9 +179,9 @@ class ZBufferInterface(BaseInterface):
 
         # Make sure the opacity of the object is 1
 
-        window_to_image_filter = vtk.vtkWindowToImageFilter()
-        image_shift_scale = vtk.vtkImageShiftScale()
-        image_writer = vtk.vtkJPEGWriter()
+        window_to_image_filter = vtkWindowToImageFilter()
+        image_shift_scale = vtkImageShiftScale()
+        image_writer = vtkJPEGWriter()
 
         window_to_image_filter.SetInput(self.vtk_render_window)
         # window_to_image_filter.SetMagnification(1)
@@ -145,8 +196,28 @@ class ZBufferInterface(BaseInterface):
         image_writer.SetInputConnection(image_shift_scale.GetOutputPort())
         image_writer.Write()
 
+    def write_depth_buffer_to_disc(self, depth_buffer_ofp, dtype=np.float32):
+        """ Writes the depth buffer as .npy file (float32 or float16) """
+        depth_buffer = self.get_computer_vision_depth_buffer_as_numpy_arr()
+        DepthBufferUtility.write_depth_buffer_to_npy(depth_buffer, depth_buffer_ofp, dtype)
+
+    def write_depth_buffer_to_png(self, png_ofp, depth_scale=None):
+        """
+        Writes the depth buffer as quantized 16 bit PNG, i.e. depth = png_value * depth_scale
+        The scale is stored in the PNG, see DepthBufferUtility.read_depth_buffer_from_png()
+        """
+        depth_buffer = self.get_computer_vision_depth_buffer_as_numpy_arr()
+        DepthBufferUtility.write_depth_buffer_to_png(depth_buffer, png_ofp, depth_scale)
+
+    def append_depth_buffer_to_container(self, depth_buffer_container, name, dtype=np.float32, scale=None):
+        """ depth_buffer_container: DepthBufferContainer opened with mode='a' """
+        depth_buffer = self.get_computer_vision_depth_buffer_as_numpy_arr()
+        depth_buffer_container.append(name, depth_buffer, dtype, scale)
+
     def write_z_buffer_visualization_to_disc(self, z_buffer_viz_ofp):
         """ z_buffer contains values in [0,1]  """
+        # matplotlib is only imported if required, since importing it is slow
+        from matplotlib import pyplot as plt
 
         z_buffer_data_numpy = self.get_opengl_z_buffer_as_numpy_arr()
         fig = plt.figure(frameon=False)
@@ -162,6 +233,7 @@ class ZBufferInterface(BaseInterface):
         fig.savefig(z_buffer_viz_ofp)
 
     def show_z_buffer(self):
+        from matplotlib import pyplot as plt
         z_buffer_data_numpy = self.get_opengl_z_buffer_as_numpy_arr()
         plt.imshow(
             z_buffer_data_numpy,
@@ -0,0 +1,45 @@
+import os
+import numpy as np
+from vtkmodules.vtkFiltersSources import vtkSphereSource
+
+from VTKInterface.Interfaces.Batch_Render_Interface import BatchRenderInterface
+from VTKInterface.Utility.Data_Utility import DataUtility
+from VTKInterface.Utility.Depth_Buffer_Container_Utility import DepthBufferContainer
+
+
+def create_camera_tuples(num_cameras, width=32, height=24):
+    calibration_mat = np.array([[40.0, 0.0, width / 2.0], [0.0, 40.0, height / 2.0], [0.0, 0.0, 1.0]])
+    camera_tuples = []
+    for index in range(num_cameras):
+        cam_to_world_mat = np.identity(4)
+        cam_to_world_mat[0:3, 3] = [0.01 * index, 0.0, -5.0]
+        camera_tuples.append(('frame_' + str(index), cam_to_world_mat, calibration_mat, width, height))
+    return camera_tuples
+
+
+def test_container_contains_every_frame_after_rendering(tmp_path):
+    sphere = vtkSphereSource()
+    sphere.Update()
+    poly_ifp = str(tmp_path / 'sphere.ply')
+    DataUtility.write_poly_data_to_ply(sphere.GetOutput(), poly_ifp)
+    odp = str(tmp_path / 'depth_maps')
+    os.makedirs(odp)
+
+    camera_tuples = create_camera_tuples(8)
+    batch_render_interface = BatchRenderInterface(
+        poly_ifp, odp, num_processes=2, depth_format='container', max_clipping_range=100.0)
+    summary = batch_render_interface.render_camera_tuples(camera_tuples)
+    assert summary['num_rendered'] == len(camera_tuples)
+    assert summary['failed_frames'] == {}
+
+    depth_buffers = {}
+    for container_fn in os.listdir(odp):
+        assert container_fn.endswith(BatchRenderInterface.CONTAINER_EXTENSION)
+        with DepthBufferContainer(os.path.join(odp, container_fn), mode='r') as depth_buffer_container:
+            for name in depth_buffer_container.get_names():
+                depth_buffers[name] = np.array(depth_buffer_container.read(name))
+    assert sorted(depth_buffers.keys()) == sorted(camera_tuple[0] for camera_tuple in camera_tuples)
+    for depth_buffer in depth_buffers.values():
+        assert depth_buffer.shape == (24, 32)
+        # The sphere (radius 0.5) covers the image center
+        assert np.isclose(depth_buffer[12, 16], 4.5, atol=0.05)
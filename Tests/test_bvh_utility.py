@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from vtkmodules.vtkFiltersCore import vtkTriangleFilter
+from vtkmodules.vtkFiltersSources import vtkPlaneSource, vtkSphereSource
+
+from VTKInterface.Interfaces.Intersection_Interface import IntersectionInterface
+from VTKInterface.Utility.BVH_Utility import BoundingVolumeHierarchy
+
+
+def create_sphere_mesh():
+    sphere = vtkSphereSource()
+    sphere.SetThetaResolution(16)
+    sphere.SetPhiResolution(16)
+    sphere.Update()
+    return sphere.GetOutput()
+
+
+def create_plane_mesh():
+    # 2 x 2 quads in [-0.5, 0.5]^2 (z = 0), split into 8 triangles
+    plane = vtkPlaneSource()
+    plane.SetResolution(2, 2)
+    triangle_filter = vtkTriangleFilter()
+    triangle_filter.SetInputConnection(plane.GetOutputPort())
+    triangle_filter.Update()
+    return triangle_filter.GetOutput()
+
+
+def test_ray_through_sphere_vertex():
+    bvh = BoundingVolumeHierarchy.create_from_poly_data(create_sphere_mesh())
+    hit_mask, t, cell_ids = bvh.intersect_first_segments([[0.0, 0.0, -5.0]], [[0.0, 0.0, 5.0]])
+    assert hit_mask[0]
+    assert cell_ids[0] >= 0
+    # The (pole) vertex of the sphere is at (0, 0, -0.5)
+    assert np.isclose(-5.0 + 10.0 * t[0], -0.5)
+
+
+@pytest.mark.parametrize('query_point', [
+    [0.0, 0.0],     # vertex shared by 6 triangles
+    [0.25, 0.0],    # edge shared by 2 quads
+    [0.25, 0.25],   # diagonal edge inside a quad
+    [-0.5, -0.5]])  # corner of the mesh
+def test_rays_through_plane_vertices_and_edges(query_point):
+    bvh = BoundingVolumeHierarchy.create_from_poly_data(create_plane_mesh())
+    for direction in [1.0, -1.0]:
+        line_first_point = [query_point[0], query_point[1], -direction]
+        line_second_point = [query_point[0], query_point[1], direction]
+        hit_mask, t, _ = bvh.intersect_first_segments([line_first_point], [line_second_point])
+        assert hit_mask[0]
+        assert np.isclose(t[0], 0.5)
+
+
+def test_batched_intersections_match_obb_tree():
+    mesh = create_sphere_mesh()
+    bvh_interface = IntersectionInterface(mesh, 'bvh')
+    obb_interface = IntersectionInterface(mesh, 'obb_tree')
+
+    random_state = np.random.RandomState(0)
+    ray_origins = random_state.uniform(-1.0, 1.0, size=(1000, 3))
+    ray_origins[:, 2] = -5.0
+    ray_directions = np.tile([0.0, 0.0, 1.0], (1000, 1)) + random_state.uniform(-0.05, 0.05, size=(1000, 3))
+
+    bvh_hit_mask, bvh_points, bvh_distances, _ = bvh_interface.compute_first_rays_mesh_intersections_batched(
+        ray_origins, ray_directions)
+    obb_hit_mask, obb_points, obb_distances, _ = obb_interface.compute_first_rays_mesh_intersections_batched(
+        ray_origins, ray_directions)
+
+    assert 0 < bvh_hit_mask.sum() < len(ray_origins)
+    assert np.array_equal(bvh_hit_mask, obb_hit_mask)
+    assert np.allclose(bvh_points[bvh_hit_mask], obb_points[obb_hit_mask])
+    assert np.allclose(bvh_distances[bvh_hit_mask], obb_distances[obb_hit_mask])
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from VTKInterface.Utility.Data_Utility import DataUtility
+
+
+def write_binary_ply(ply_ofp, coords, colors, byte_order='<'):
+    vertex_dtype = np.dtype([('x', byte_order + 'f4'), ('y', byte_order + 'f4'), ('z', byte_order + 'f4'),
+                             ('red', 'u1'), ('green', 'u1'), ('blue', 'u1')])
+    vertices = np.empty(len(coords), dtype=vertex_dtype)
+    for index, name in enumerate(['x', 'y', 'z']):
+        vertices[name] = coords[:, index]
+    for index, name in enumerate(['red', 'green', 'blue']):
+        vertices[name] = colors[:, index]
+    ply_format = 'binary_little_endian' if byte_order == '<' else 'binary_big_endian'
+    header = ('ply\n'
+              'format ' + ply_format + ' 1.0\n'
+              'comment written by test_data_utility\n'
+              'element vertex ' + str(len(coords)) + '\n'
+              'property float x\nproperty float y\nproperty float z\n'
+              'property uchar red\nproperty uchar green\nproperty uchar blue\n'
+              'end_header\n')
+    with open(ply_ofp, 'wb') as ply_file:
+        ply_file.write(header.encode('ascii'))
+        ply_file.write(vertices.tobytes())
+
+
+@pytest.mark.parametrize('byte_order', ['<', '>'])
+def test_iterate_ply_point_chunks(tmp_path, byte_order):
+    random_state = np.random.RandomState(0)
+    coords = random_state.uniform(-1.0, 1.0, size=(10, 3)).astype(np.float32)
+    colors = random_state.randint(0, 256, size=(10, 3)).astype(np.uint8)
+    ply_fp = str(tmp_path / 'points.ply')
+    write_binary_ply(ply_fp, coords, colors, byte_order)
+
+    chunks = list(DataUtility.iterate_ply_point_chunks(ply_fp, chunk_size=4))
+    assert [len(chunk_coords) for chunk_coords, _ in chunks] == [4, 4, 2]
+    assert np.array_equal(np.concatenate([chunk_coords for chunk_coords, _ in chunks]), coords)
+    assert np.array_equal(np.concatenate([chunk_colors for _, chunk_colors in chunks]), colors)
+
+    # A single chunk, if the chunk size exceeds the number of points
+    assert len(list(DataUtility.iterate_ply_point_chunks(ply_fp, chunk_size=100))) == 1
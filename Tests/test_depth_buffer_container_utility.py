@@ -0,0 +1,45 @@
+import os
+import numpy as np
+
+from VTKInterface.Utility.Depth_Buffer_Container_Utility import DepthBufferContainer
+
+
+def create_depth_buffer(seed, shape=(24, 32)):
+    return np.random.RandomState(seed).uniform(1.0, 10.0, size=shape).astype(np.float32)
+
+
+def test_write_and_read(tmp_path):
+    container_fp = str(tmp_path / 'depth_maps.dbc')
+    with DepthBufferContainer(container_fp, mode='a') as depth_buffer_container:
+        depth_buffer_container.append('float32', create_depth_buffer(0))
+        depth_buffer_container.append('float16', create_depth_buffer(1), dtype=np.float16)
+        depth_buffer_container.append('uint16', create_depth_buffer(2), dtype=np.uint16)
+
+    with DepthBufferContainer(container_fp, mode='r') as depth_buffer_container:
+        assert sorted(depth_buffer_container.get_names()) == ['float16', 'float32', 'uint16']
+        assert np.array_equal(depth_buffer_container.read('float32'), create_depth_buffer(0))
+        assert np.allclose(depth_buffer_container.read('float16'), create_depth_buffer(1), rtol=1e-3)
+        assert np.allclose(depth_buffer_container.read('uint16'), create_depth_buffer(2), atol=1e-3)
+
+
+def test_truncated_tail_is_ignored_and_overwritten(tmp_path):
+    container_fp = str(tmp_path / 'depth_maps.dbc')
+    with DepthBufferContainer(container_fp, mode='a') as depth_buffer_container:
+        depth_buffer_container.append('frame_0', create_depth_buffer(0))
+        depth_buffer_container.append('frame_1', create_depth_buffer(1))
+
+    # Simulates a process killed while writing the last record
+    with open(container_fp, 'r+b') as container_file:
+        container_file.truncate(os.path.getsize(container_fp) - 100)
+
+    with DepthBufferContainer(container_fp, mode='r') as depth_buffer_container:
+        assert depth_buffer_container.get_names() == ['frame_0']
+        assert np.array_equal(depth_buffer_container.read('frame_0'), create_depth_buffer(0))
+
+    with DepthBufferContainer(container_fp, mode='a') as depth_buffer_container:
+        depth_buffer_container.append('frame_2', create_depth_buffer(2))
+
+    with DepthBufferContainer(container_fp, mode='r') as depth_buffer_container:
+        assert sorted(depth_buffer_container.get_names()) == ['frame_0', 'frame_2']
+        assert np.array_equal(depth_buffer_container.read('frame_0'), create_depth_buffer(0))
+        assert np.array_equal(depth_buffer_container.read('frame_2'), create_depth_buffer(2))
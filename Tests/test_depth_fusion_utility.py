@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from VTKInterface.Utility.Data_Utility import DataUtility
+from VTKInterface.Utility.Depth_Fusion_Utility import VoxelDepthFusion
+
+
+def test_voxel_keys_of_the_same_and_of_different_voxels():
+    coords = np.array([[0.1, 0.1, 0.1], [0.9, 0.9, 0.9], [-0.1, 0.1, 0.1], [0.1, 1.1, 0.1], [0.1, 0.1, 1.1]])
+    voxel_keys = DataUtility.compute_voxel_keys(coords, voxel_size=1.0)
+    assert voxel_keys[0] == voxel_keys[1]
+    assert len(np.unique(voxel_keys)) == 4
+
+
+def test_voxel_key_bounds():
+    max_voxel_index = 2 ** (DataUtility.VOXEL_KEY_BITS - 1)
+    valid_coords = np.array([[-max_voxel_index, 0.0, max_voxel_index - 0.5],
+                             [max_voxel_index - 0.5, -max_voxel_index, 0.0]])
+    assert len(np.unique(DataUtility.compute_voxel_keys(valid_coords, voxel_size=1.0))) == 2
+    assert len(DataUtility.compute_voxel_keys(np.zeros((0, 3)), voxel_size=1.0)) == 0
+
+    for invalid_coord in [max_voxel_index, -max_voxel_index - 0.5]:
+        with pytest.raises(ValueError):
+            DataUtility.compute_voxel_keys(np.array([[0.0, invalid_coord, 0.0]]), voxel_size=1.0)
+
+
+def test_fusion_of_overlapping_depth_buffers():
+    width, height = 32, 24
+    calibration_mat = np.array([[40.0, 0.0, width / 2.0], [0.0, 40.0, height / 2.0], [0.0, 0.0, 1.0]])
+    depth_buffer = np.full((height, width), 2.0, dtype=np.float32)
+    # Background pixels are ignored
+    depth_buffer[:, 0:4] = 0
+    cam_to_world_mat = np.identity(4)
+    colors = np.full((height, width, 3), 100, dtype=np.uint8)
+
+    depth_fusion = VoxelDepthFusion(voxel_size=0.1)
+    depth_fusion.add_depth_buffer(depth_buffer, cam_to_world_mat, calibration_mat, color_image=colors)
+    fused_coords, fused_colors = depth_fusion.get_points()
+    num_voxels = depth_fusion.get_num_voxels()
+    counts = depth_fusion.counts.copy()
+    assert num_voxels == len(fused_coords) < (width - 4) * height
+    assert np.allclose(fused_coords[:, 2], 2.0)
+    assert np.all(fused_colors == 100)
+
+    # The same view again does not add voxels, but observations
+    depth_fusion.add_depth_buffer(depth_buffer, cam_to_world_mat, calibration_mat, color_image=colors)
+    assert depth_fusion.get_num_voxels() == num_voxels
+    assert np.allclose(depth_fusion.get_points()[0], fused_coords)
+    assert np.array_equal(depth_fusion.counts, 2 * counts)
+    assert len(depth_fusion.get_points(min_num_observations=2 * counts.max())[0]) == np.sum(counts == counts.max())
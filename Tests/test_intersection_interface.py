@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from vtkmodules.vtkFiltersSources import vtkSphereSource
+
+from Utility.Types.Ray import Ray
+from VTKInterface.Interfaces.Intersection_Interface import IntersectionInterface
+
+
+def create_sphere_mesh():
+    sphere = vtkSphereSource()
+    sphere.SetThetaResolution(16)
+    sphere.SetPhiResolution(16)
+    sphere.Update()
+    return sphere.GetOutput()
+
+
+@pytest.mark.parametrize('locator_type', list(IntersectionInterface.LOCATOR_TYPES.keys()))
+def test_single_ray_intersections_are_equal_for_all_locators(locator_type):
+    intersection_interface = IntersectionInterface(create_sphere_mesh(), locator_type)
+    reference_interface = IntersectionInterface(create_sphere_mesh(), 'obb_tree')
+    ray = Ray(np.array([0.1, 0.05, -5.0]), np.array([0.0, 0.0, 1.0]))
+
+    intersection_points = intersection_interface.compute_single_ray_mesh_intersections_sorted(ray)
+    reference_points = reference_interface.compute_single_ray_mesh_intersections_sorted(ray)
+
+    # The ray enters and leaves the sphere
+    assert len(intersection_points) == 2
+    assert np.allclose(intersection_points, reference_points)
+    assert intersection_points[0][2] < 0 < intersection_points[1][2]
+
+
+@pytest.mark.parametrize('locator_type', list(IntersectionInterface.LOCATOR_TYPES.keys()))
+def test_single_ray_missing_the_mesh(locator_type):
+    intersection_interface = IntersectionInterface(create_sphere_mesh(), locator_type)
+    ray = Ray(np.array([2.0, 0.0, -5.0]), np.array([0.0, 0.0, 1.0]))
+    assert intersection_interface.compute_single_ray_mesh_intersections_sorted(ray) == []
+
+
+def test_depth_map_closes_its_process_pool():
+    intersection_interface = IntersectionInterface(create_sphere_mesh(), 'obb_tree')
+    cam_to_world_mat = np.identity(4)
+    cam_to_world_mat[2, 3] = -5.0
+    calibration_mat = np.array([[40.0, 0.0, 16.0], [0.0, 40.0, 12.0], [0.0, 0.0, 1.0]])
+
+    depth_map, _ = intersection_interface.compute_computer_vision_depth_map(
+        cam_to_world_mat, calibration_mat, 32, 24)
+    assert intersection_interface.process_pool is None
+    parallel_depth_map, _ = intersection_interface.compute_computer_vision_depth_map(
+        cam_to_world_mat, calibration_mat, 32, 24, chunk_size=100, num_processes=2)
+    assert intersection_interface.process_pool is None
+
+    assert 0 < np.count_nonzero(depth_map) < depth_map.size
+    assert np.array_equal(depth_map, parallel_depth_map)
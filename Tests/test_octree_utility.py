@@ -0,0 +1,45 @@
+import os
+import numpy as np
+
+from VTKInterface.Utility.Octree_Utility import PointCloudOctree
+
+
+def create_point_cloud(num_points=1000, seed=0):
+    random_state = np.random.RandomState(seed)
+    coords = random_state.uniform(-1.0, 1.0, size=(num_points, 3)).astype(np.float32)
+    colors = random_state.randint(0, 256, size=(num_points, 3)).astype(np.uint8)
+    return coords, colors
+
+
+def test_progressive_order_is_a_permutation():
+    coords, colors = create_point_cloud()
+    octree = PointCloudOctree.create_from_numpy(coords, colors, max_depth=4)
+    assert octree.get_num_points() == len(coords)
+    assert octree.level_offsets[-1] == len(coords)
+    assert np.all(np.diff(octree.level_offsets) >= 0)
+    # The root level contains a single representative
+    assert len(octree.get_points_up_to_level(0)[0]) == 1
+    assert sorted(map(tuple, octree.coords)) == sorted(map(tuple, coords))
+
+
+def test_cache_is_reused_and_replaced(tmp_path):
+    cache_dp = str(tmp_path / 'cloud.octree')
+    coords, colors = create_point_cloud()
+    octree = PointCloudOctree.create_from_numpy(coords, colors, max_depth=4, cache_dp=cache_dp)
+
+    cached_octree = PointCloudOctree.create_from_numpy(coords, colors, max_depth=4, cache_dp=cache_dp)
+    # The cached arrays are memory mapped
+    assert isinstance(cached_octree.coords, np.memmap)
+    assert np.array_equal(cached_octree.coords, octree.coords)
+    assert np.array_equal(cached_octree.colors, octree.colors)
+    assert np.array_equal(cached_octree.level_offsets, octree.level_offsets)
+
+    # A different point cloud replaces the cache instead of using the outdated octree
+    other_coords, other_colors = create_point_cloud(seed=1)
+    assert PointCloudOctree.read_from_directory(
+        cache_dp, PointCloudOctree.compute_source_hash(other_coords, other_colors, 4)) is None
+    other_octree = PointCloudOctree.create_from_numpy(other_coords, other_colors, max_depth=4, cache_dp=cache_dp)
+    assert np.array_equal(
+        PointCloudOctree.read_from_directory(cache_dp, other_octree.source_hash).coords, other_octree.coords)
+    # Only the arrays of the current point cloud are kept
+    assert len([fn for fn in os.listdir(cache_dp) if fn.endswith('.npy')]) == len(PointCloudOctree.ARRAY_NAMES)
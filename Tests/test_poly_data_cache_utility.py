@@ -0,0 +1,49 @@
+import os
+import numpy as np
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkFiltersSources import vtkSphereSource
+
+from VTKInterface.Utility.Data_Utility import DataUtility
+from VTKInterface.Utility.Poly_Data_Cache_Utility import PolyDataCache
+
+
+def test_memory_and_disc_hits(tmp_path):
+    sphere = vtkSphereSource()
+    sphere.Update()
+    poly_ifp = str(tmp_path / 'sphere.ply')
+    DataUtility.write_poly_data_to_ply(sphere.GetOutput(), poly_ifp)
+    cache_dp = str(tmp_path / 'cache')
+
+    poly_data_cache = PolyDataCache(cache_dp=cache_dp)
+    poly_data = poly_data_cache.get_poly_data(poly_ifp, DataUtility.create_poly_data_from_ply)
+    poly_data_cache.get_poly_data(poly_ifp, DataUtility.create_poly_data_from_ply)
+    statistics = poly_data_cache.get_statistics()
+    assert (statistics['num_misses'], statistics['num_memory_hits'], statistics['num_disc_hits']) == (1, 1, 0)
+    # Only the cache file is left, i.e. no temporary files
+    assert [os.path.splitext(cache_fn)[1] for cache_fn in os.listdir(cache_dp)] == ['.vtp']
+
+    # A new cache (e.g. of a later process) reads the disc cache instead of parsing the file
+    def fail_to_parse(poly_ifp):
+        raise AssertionError('The file should not be parsed')
+
+    later_poly_data_cache = PolyDataCache(cache_dp=cache_dp)
+    cached_poly_data = later_poly_data_cache.get_poly_data(poly_ifp, fail_to_parse)
+    assert later_poly_data_cache.get_statistics()['num_disc_hits'] == 1
+    assert cached_poly_data.GetNumberOfCells() == poly_data.GetNumberOfCells()
+    assert np.allclose(
+        numpy_support.vtk_to_numpy(cached_poly_data.GetPoints().GetData()),
+        numpy_support.vtk_to_numpy(poly_data.GetPoints().GetData()))
+
+
+def test_returned_poly_data_do_not_share_the_data_set_attributes(tmp_path):
+    sphere = vtkSphereSource()
+    sphere.Update()
+    poly_ifp = str(tmp_path / 'sphere.ply')
+    DataUtility.write_poly_data_to_ply(sphere.GetOutput(), poly_ifp)
+
+    poly_data_cache = PolyDataCache()
+    poly_data = poly_data_cache.get_poly_data(poly_ifp, DataUtility.create_poly_data_from_ply)
+    poly_data.GetPointData().SetScalars(
+        DataUtility.create_vtk_color_array(poly_data.GetNumberOfPoints(), (255, 0, 0)))
+    assert poly_data_cache.get_poly_data(
+        poly_ifp, DataUtility.create_poly_data_from_ply).GetPointData().GetScalars() is None
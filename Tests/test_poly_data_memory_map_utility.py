@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkFiltersSources import vtkSphereSource
+
+from VTKInterface.Utility.Poly_Data_Memory_Map_Utility import PolyDataMemoryMapUtility
+
+
+def create_sphere_mesh():
+    sphere = vtkSphereSource()
+    sphere.SetThetaResolution(16)
+    sphere.SetPhiResolution(16)
+    sphere.Update()
+    return sphere.GetOutput()
+
+
+@pytest.mark.parametrize('index_dtype', [np.int32, np.int64])
+def test_memory_map_roundtrip(tmp_path, monkeypatch, index_dtype):
+    get_poly_data_arrays = PolyDataMemoryMapUtility._get_poly_data_arrays
+
+    def get_poly_data_arrays_with_index_dtype(poly_data):
+        # Meshes with more than 2^31 indices are too large for a test, i.e. the dtype is enforced
+        np_arrays = get_poly_data_arrays(poly_data)
+        for name in np_arrays:
+            if name.endswith('_offsets') or name.endswith('_connectivity'):
+                np_arrays[name] = np_arrays[name].astype(index_dtype)
+        return np_arrays
+
+    monkeypatch.setattr(
+        PolyDataMemoryMapUtility, '_get_poly_data_arrays', staticmethod(get_poly_data_arrays_with_index_dtype))
+
+    mesh = create_sphere_mesh()
+    mm_fp = str(tmp_path / 'sphere.pdmm')
+    PolyDataMemoryMapUtility.write_poly_data_to_memory_map(mesh, mm_fp)
+    header = PolyDataMemoryMapUtility.read_memory_map_header(mm_fp)
+    assert header['arrays']['polys_connectivity']['dtype'] == np.dtype(index_dtype).str
+
+    loaded_mesh = PolyDataMemoryMapUtility.create_poly_data_from_memory_map(mm_fp)
+    assert loaded_mesh.GetNumberOfPoints() == mesh.GetNumberOfPoints()
+    assert loaded_mesh.GetNumberOfCells() == mesh.GetNumberOfCells()
+    assert np.allclose(
+        numpy_support.vtk_to_numpy(loaded_mesh.GetPoints().GetData()),
+        numpy_support.vtk_to_numpy(mesh.GetPoints().GetData()))
+    for get_array in ['GetOffsetsArray', 'GetConnectivityArray']:
+        assert np.array_equal(
+            numpy_support.vtk_to_numpy(getattr(loaded_mesh.GetPolys(), get_array)()),
+            numpy_support.vtk_to_numpy(getattr(mesh.GetPolys(), get_array)()))
+    assert np.allclose(
+        numpy_support.vtk_to_numpy(loaded_mesh.GetPointData().GetNormals()),
+        numpy_support.vtk_to_numpy(mesh.GetPointData().GetNormals()))
+
+
+def test_invalid_memory_map_file(tmp_path):
+    mm_fp = str(tmp_path / 'invalid.pdmm')
+    with open(mm_fp, 'wb') as mm_file:
+        mm_file.write(b'INVALID!')
+    with pytest.raises(ValueError):
+        PolyDataMemoryMapUtility.read_memory_map_header(mm_fp)
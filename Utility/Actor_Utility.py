@@ -1,11 +1,14 @@
-import vtk
+import numpy as np
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkFiltersSources import vtkCylinderSource, vtkLineSource, vtkSphereSource
+from vtkmodules.vtkRenderingCore import vtkActor, vtkGlyph3DMapper, vtkPolyDataMapper
 from VTKInterface.Utility.Data_Utility import DataUtility
 
 
 class ActorUtility(object):
 
     """ Usage:
-        vtk_renderer = vtk.vtkRenderer()
+        vtk_renderer = vtkRenderer()
         actor = PrimitiveInterface.create_line_actor(...)
         vtk_renderer.AddActor(actor)
     """
@@ -13,35 +16,109 @@ class ActorUtility(object):
     @staticmethod
     def create_vtk_line_actor(p1, p2, color):
 
-        line = vtk.vtkLineSource()
+        line = vtkLineSource()
         line.SetPoint1(p1)
         line.SetPoint2(p2)
 
-        mapper = vtk.vtkPolyDataMapper()
+        mapper = vtkPolyDataMapper()
         mapper.SetInputConnection(line.GetOutputPort())
 
-        actor = vtk.vtkActor()
+        actor = vtkActor()
         actor.SetMapper(mapper)
         actor.GetProperty().SetColor(color)
         return actor
 
     @staticmethod
-    def create_vtk_point_actor(p, color, radius=1.0):
-        point = vtk.vtkSphereSource()
+    def create_vtk_point_actor(p, color, radius=1.0, resolution=100):
+        # For many points use create_vtk_sphere_glyph_actor() (a single actor for all points)
+        point = vtkSphereSource()
         point.SetCenter(p)
         point.SetRadius(radius)
-        point.SetPhiResolution(100)
-        point.SetThetaResolution(100)
+        point.SetPhiResolution(resolution)
+        point.SetThetaResolution(resolution)
 
-        mapper = vtk.vtkPolyDataMapper()
+        mapper = vtkPolyDataMapper()
         mapper.SetInputConnection(point.GetOutputPort())
 
-        actor = vtk.vtkActor()
+        actor = vtkActor()
         actor.SetMapper(mapper)
         actor.GetProperty().SetColor(color)
 
         return actor
 
+    @staticmethod
+    def create_vtk_line_segments_actor(start_points, end_points, colors, line_width=1):
+        """ Single actor for all (M, 3) line segments with (M, 3) uint8 colors """
+        line_segments_poly_data = DataUtility.create_line_segments_poly_data(start_points, end_points, colors)
+
+        mapper = vtkPolyDataMapper()
+        mapper.SetInputData(line_segments_poly_data)
+        mapper.SetScalarModeToUseCellData()
+        mapper.SetScalarVisibility(1)
+
+        actor = vtkActor()
+        actor.SetMapper(mapper)
+        actor.GetProperty().SetLineWidth(line_width)
+        return actor
+
+    @staticmethod
+    def create_vtk_sphere_glyph_actor(coords, colors, radius=1.0, resolution=8, radii=None):
+        """
+        Single actor for spheres at the (N, 3) coords with (N, 3) uint8 colors.
+        In contrast to create_vtk_point_actor() the sphere geometry is shared by all points
+        (i.e. it is instanced by the glyph mapper on the GPU)
+        radii: optional (N,) array with the radius of each sphere (overrides radius)
+        """
+        sphere = vtkSphereSource()
+        sphere.SetPhiResolution(resolution)
+        sphere.SetThetaResolution(resolution)
+
+        point_poly_data = DataUtility.create_point_cloud_poly_data(coords, colors)
+
+        mapper = vtkGlyph3DMapper()
+        mapper.SetInputData(point_poly_data)
+        mapper.SetSourceConnection(sphere.GetOutputPort())
+        if radii is None:
+            sphere.SetRadius(radius)
+            mapper.ScalingOff()
+        else:
+            # The unit sphere is scaled by the radius of each point
+            sphere.SetRadius(1.0)
+            vtk_radii = numpy_support.numpy_to_vtk(
+                np.ascontiguousarray(radii, dtype=np.float32).reshape(-1), deep=False)
+            vtk_radii.SetName('Radii')
+            point_poly_data.GetPointData().AddArray(vtk_radii)
+            mapper.ScalingOn()
+            mapper.SetScaleArray('Radii')
+            mapper.SetScaleModeToScaleByMagnitude()
+        mapper.SetScalarVisibility(1)
+
+        actor = vtkActor()
+        actor.SetMapper(mapper)
+        return actor
+
+    @staticmethod
+    def set_sphere_glyph_resolution(sphere_glyph_actor, resolution):
+        """ Changes the resolution of an actor created with create_vtk_sphere_glyph_actor() """
+        sphere = sphere_glyph_actor.GetMapper().GetInputAlgorithm(1, 0)
+        if sphere.GetThetaResolution() != resolution:
+            sphere.SetPhiResolution(resolution)
+            sphere.SetThetaResolution(resolution)
+
+    @staticmethod
+    def compute_sphere_resolution(radius_in_pixels, pixels_per_segment=8, min_resolution=6, max_resolution=64):
+        """
+        Number of segments required to approximate the silhouette of a sphere with the
+        given screen space radius (the result is rounded up to a power of two or 1.5 times a power of two
+        to avoid frequent changes)
+        """
+        resolution = 2.0 * np.pi * radius_in_pixels / pixels_per_segment
+        resolution = min(max(resolution, min_resolution), max_resolution)
+        for candidate_resolution in [6, 8, 12, 16, 24, 32, 48, 64, 96, 128]:
+            if candidate_resolution >= resolution:
+                return min(candidate_resolution, max_resolution)
+        return max_resolution
+
     @staticmethod
     def create_vtk_point_cloud_actor(coords, colors=None, opacity=1.0, point_size=3, overwrite_color=None):
         point_cloud_poly_data = DataUtility.create_point_cloud_poly_data(coords, colors)
@@ -68,11 +145,11 @@ class ActorUtility(object):
             vtk_colors = DataUtility.create_vtk_color_array(num_points, overwrite_color)
             point_cloud_poly_data.GetPointData().SetScalars(vtk_colors)
 
-        mapper = vtk.vtkPolyDataMapper()
+        mapper = vtkPolyDataMapper()
         mapper.SetInputData(point_cloud_poly_data)
         mapper.SetScalarVisibility(1)
 
-        actor = vtk.vtkActor()
+        actor = vtkActor()
         actor.SetMapper(mapper)
         actor.GetProperty().SetOpacity(opacity)
         actor.GetProperty().SetPointSize(point_size)
@@ -83,10 +160,10 @@ class ActorUtility(object):
     def create_vtk_mesh_actor_from_poly_data(mesh_poly_data, mesh_texture=None, opacity=1.0):
         # PolyData representing a mesh must contain polygons
         assert mesh_poly_data.GetNumberOfPolys() > 0
-        mapper = vtk.vtkPolyDataMapper()
+        mapper = vtkPolyDataMapper()
         mapper.SetInputData(mesh_poly_data)
 
-        actor = vtk.vtkActor()
+        actor = vtkActor()
         actor.SetMapper(mapper)
         actor.GetProperty().SetOpacity(opacity)
         if mesh_texture is not None:
@@ -128,11 +205,11 @@ class ActorUtility(object):
 
     @staticmethod
     def create_vtk_example_mesh_actor(opacity=1.0):
-        cylinder = vtk.vtkCylinderSource()
+        cylinder = vtkCylinderSource()
         cylinder.SetResolution(8)
-        mapper = vtk.vtkPolyDataMapper()
+        mapper = vtkPolyDataMapper()
         mapper.SetInputConnection(cylinder.GetOutputPort())
-        actor = vtk.vtkActor()
+        actor = vtkActor()
         actor.SetMapper(mapper)
         actor.GetProperty().SetOpacity(opacity)
         return actor
@@ -0,0 +1,368 @@
+import hashlib
+import numpy as np
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkCommonDataModel import vtkPolyData
+from vtkmodules.vtkFiltersCore import vtkTriangleFilter
+
+from Utility.Logging_Extension import logger
+from VTKInterface.Utility.File_Utility import FileUtility
+
+
+class BoundingVolumeHierarchy(object):
+
+    """ Usage:
+        bvh = BoundingVolumeHierarchy.create_from_poly_data(mesh, cache_dp='mesh.ply.bvh')
+        hit_mask, t, cell_ids = bvh.intersect_first_segments(line_first_points, line_second_points)
+
+        Flattened bounding volume hierarchy over the triangles of a mesh, stored in a few NumPy arrays:
+            node_bounds_min / node_bounds_max (M, 3): axis aligned bounds of the nodes
+            node_left_child (M,): index of the left child (the right child is left + 1), -1 for leaves
+            node_first_triangle / node_num_triangles (M,): triangle range of the leaves
+            triangle_vertices (T, 3), triangle_edges_1 / triangle_edges_2 (T, 3): triangles in leaf order
+            triangle_cell_ids (T,): cell ids of the triangles in the (non-triangulated) mesh
+
+        Since the hierarchy consists only of arrays, it can be written to disc and memory mapped later
+        (see cache_dp). The cache is keyed by a hash of the mesh content and rebuilt if the mesh changes.
+        The traversal is vectorized over all rays of a batch (wavefront traversal).
+    """
+
+    VERSION = 1
+    # Tolerance of the barycentric coordinates, i.e. rays passing exactly through a shared edge
+    # or vertex hit the adjacent triangles (otherwise rounding errors could miss all of them)
+    BARYCENTRIC_EPSILON = 1e-7
+    ARRAY_NAMES = [
+        'node_bounds_min',
+        'node_bounds_max',
+        'node_left_child',
+        'node_first_triangle',
+        'node_num_triangles',
+        'triangle_vertices',
+        'triangle_edges_1',
+        'triangle_edges_2',
+        'triangle_cell_ids']
+
+    def __init__(self, np_arrays, mesh_hash=None):
+        for name in self.ARRAY_NAMES:
+            setattr(self, name, np_arrays[name])
+        self.mesh_hash = mesh_hash
+
+    @classmethod
+    def create_from_poly_data(cls, mesh, cache_dp=None, leaf_size=4):
+        """ If cache_dp is provided, a matching hierarchy is loaded from (or the built one is written to) cache_dp """
+        mesh_hash = cls.compute_mesh_hash(mesh, leaf_size)
+        if cache_dp is not None:
+            bvh = cls.read_from_directory(cache_dp, mesh_hash)
+            if bvh is not None:
+                return bvh
+
+        triangle_points, triangle_cell_ids = cls.get_triangles(mesh)
+        bvh = cls(cls.build_arrays(triangle_points, triangle_cell_ids, leaf_size), mesh_hash)
+        if cache_dp is not None:
+            bvh.write_to_directory(cache_dp)
+        return bvh
+
+    def get_arrays(self):
+        return {name: getattr(self, name) for name in self.ARRAY_NAMES}
+
+    @staticmethod
+    def compute_mesh_hash(mesh, leaf_size):
+        # The arrays are converted to fixed types, i.e. the hash does not depend on the storage
+        # of the points (float32 / float64) and of the cells (32 / 64 bit indices)
+        sha1 = hashlib.sha1()
+        sha1.update(('v' + str(BoundingVolumeHierarchy.VERSION) + 'l' + str(leaf_size)).encode('ascii'))
+        sha1.update(memoryview(np.ascontiguousarray(
+            numpy_support.vtk_to_numpy(mesh.GetPoints().GetData()), dtype=np.float64)))
+        for vtk_cells in [mesh.GetPolys(), mesh.GetStrips()]:
+            if vtk_cells is None or vtk_cells.GetNumberOfCells() == 0:
+                sha1.update(b'-')
+                continue
+            sha1.update(memoryview(np.ascontiguousarray(
+                numpy_support.vtk_to_numpy(vtk_cells.GetOffsetsArray()), dtype=np.int64)))
+            sha1.update(memoryview(np.ascontiguousarray(
+                numpy_support.vtk_to_numpy(vtk_cells.GetConnectivityArray()), dtype=np.int64)))
+        return sha1.hexdigest()
+
+    @staticmethod
+    def get_triangles(mesh):
+        """ Returns the triangle vertices (T, 3, 3) and the corresponding cell ids (T,) of the mesh """
+
+        def _is_triangle_mesh(poly_data):
+            polys = poly_data.GetPolys()
+            if polys is None or polys.GetNumberOfCells() != poly_data.GetNumberOfCells():
+                return False
+            return bool(np.all(np.diff(numpy_support.vtk_to_numpy(polys.GetOffsetsArray())) == 3))
+
+        if _is_triangle_mesh(mesh):
+            triangle_mesh = mesh
+            triangle_cell_ids = np.arange(mesh.GetNumberOfCells(), dtype=np.int64)
+        else:
+            # Keep track of the original cell ids of the (triangulated) polygons and strips. The ids are
+            # added as cell data (which is passed by the triangle filter) to a shallow copy of the mesh,
+            # since the id filter has been renamed (vtkIdFilter / vtkGenerateIds) in recent vtk versions
+            mesh_with_cell_ids = vtkPolyData()
+            mesh_with_cell_ids.ShallowCopy(mesh)
+            vtk_cell_ids = numpy_support.numpy_to_vtk(np.arange(mesh.GetNumberOfCells(), dtype=np.int64), deep=True)
+            vtk_cell_ids.SetName('OriginalCellIds')
+            mesh_with_cell_ids.GetCellData().AddArray(vtk_cell_ids)
+            triangle_filter = vtkTriangleFilter()
+            triangle_filter.SetInputData(mesh_with_cell_ids)
+            triangle_filter.PassVertsOff()
+            triangle_filter.PassLinesOff()
+            triangle_filter.Update()
+            triangle_mesh = triangle_filter.GetOutput()
+            triangle_cell_ids = numpy_support.vtk_to_numpy(
+                triangle_mesh.GetCellData().GetArray('OriginalCellIds')).astype(np.int64)
+
+        points = numpy_support.vtk_to_numpy(triangle_mesh.GetPoints().GetData()).astype(float, copy=False)
+        connectivity = numpy_support.vtk_to_numpy(triangle_mesh.GetPolys().GetConnectivityArray())
+        triangle_points = points[connectivity.reshape(-1, 3)]
+        return triangle_points, triangle_cell_ids
+
+    @staticmethod
+    def build_arrays(triangle_points, triangle_cell_ids, leaf_size=4):
+        """
+        Top-down construction (one level at a time): the triangles of each node are split at the median
+        of their centroids along the axis with the largest centroid extent
+        """
+        num_triangles = len(triangle_points)
+        centroids = triangle_points.mean(axis=1)
+        triangle_order = np.arange(num_triangles, dtype=np.int64)
+
+        node_first_triangle = [np.zeros(1, dtype=np.int64)]
+        node_num_triangles = [np.full(1, num_triangles, dtype=np.int64)]
+        node_left_child = [np.full(1, -1, dtype=np.int64)]
+        level_node_indices = [np.zeros(1, dtype=np.int64)]
+        num_nodes = 1
+
+        level_first_triangle = node_first_triangle[0]
+        level_num_triangles = node_num_triangles[0]
+        while True:
+            split_mask = level_num_triangles > leaf_size
+            if not np.any(split_mask):
+                break
+            split_first_triangle = level_first_triangle[split_mask]
+            split_num_triangles = level_num_triangles[split_mask]
+            num_split_nodes = len(split_first_triangle)
+
+            # Positions (in triangle_order) of the triangles of all split nodes, grouped by node
+            segment_offsets = np.concatenate([[0], np.cumsum(split_num_triangles)[:-1]])
+            segment_ids = np.repeat(np.arange(num_split_nodes), split_num_triangles)
+            positions = np.arange(len(segment_ids)) + np.repeat(split_first_triangle - segment_offsets,
+                                                                split_num_triangles)
+
+            split_centroids = centroids[triangle_order[positions]]
+            centroid_extents = np.maximum.reduceat(split_centroids, segment_offsets) - \
+                np.minimum.reduceat(split_centroids, segment_offsets)
+            split_axes = np.argmax(centroid_extents, axis=1)
+            sort_keys = split_centroids[np.arange(len(positions)), split_axes[segment_ids]]
+            # Sort within each node (the nodes are already grouped)
+            permutation = np.lexsort((sort_keys, segment_ids))
+            triangle_order[positions] = triangle_order[positions[permutation]]
+
+            left_num_triangles = split_num_triangles // 2
+            child_node_indices = num_nodes + 2 * np.arange(num_split_nodes)
+            node_left_child[-1][split_mask] = child_node_indices
+            num_nodes += 2 * num_split_nodes
+
+            level_first_triangle = np.stack(
+                [split_first_triangle, split_first_triangle + left_num_triangles], axis=1).reshape(-1)
+            level_num_triangles = np.stack(
+                [left_num_triangles, split_num_triangles - left_num_triangles], axis=1).reshape(-1)
+            node_first_triangle.append(level_first_triangle)
+            node_num_triangles.append(level_num_triangles)
+            node_left_child.append(np.full(len(level_first_triangle), -1, dtype=np.int64))
+            level_node_indices.append(np.arange(num_nodes - 2 * num_split_nodes, num_nodes))
+
+        node_first_triangle = np.concatenate(node_first_triangle)
+        node_num_triangles = np.concatenate(node_num_triangles)
+        node_left_child = np.concatenate(node_left_child)
+
+        ordered_triangle_points = triangle_points[triangle_order]
+        triangle_bounds_min = ordered_triangle_points.min(axis=1)
+        triangle_bounds_max = ordered_triangle_points.max(axis=1)
+
+        # The leaves partition the ordered triangles, which allows to compute their bounds with reduceat()
+        node_bounds_min = np.empty((num_nodes, 3), dtype=float)
+        node_bounds_max = np.empty((num_nodes, 3), dtype=float)
+        leaf_indices = np.flatnonzero(node_left_child < 0)
+        leaf_indices = leaf_indices[np.argsort(node_first_triangle[leaf_indices])]
+        leaf_indices = leaf_indices[node_num_triangles[leaf_indices] > 0]
+        if len(leaf_indices) > 0:
+            node_bounds_min[leaf_indices] = np.minimum.reduceat(
+                triangle_bounds_min, node_first_triangle[leaf_indices])
+            node_bounds_max[leaf_indices] = np.maximum.reduceat(
+                triangle_bounds_max, node_first_triangle[leaf_indices])
+        # Empty leaves (only for empty meshes) can not be hit
+        empty_leaf_indices = np.flatnonzero(node_num_triangles == 0)
+        node_bounds_min[empty_leaf_indices] = np.inf
+        node_bounds_max[empty_leaf_indices] = -np.inf
+
+        # Inner nodes (bottom-up, the children of a level are contained in the next level)
+        for node_indices in reversed(level_node_indices):
+            inner_node_indices = node_indices[node_left_child[node_indices] >= 0]
+            left_children = node_left_child[inner_node_indices]
+            node_bounds_min[inner_node_indices] = np.minimum(
+                node_bounds_min[left_children], node_bounds_min[left_children + 1])
+            node_bounds_max[inner_node_indices] = np.maximum(
+                node_bounds_max[left_children], node_bounds_max[left_children + 1])
+
+        return {
+            'node_bounds_min': node_bounds_min,
+            'node_bounds_max': node_bounds_max,
+            'node_left_child': node_left_child,
+            'node_first_triangle': node_first_triangle,
+            'node_num_triangles': node_num_triangles,
+            'triangle_vertices': ordered_triangle_points[:, 0],
+            'triangle_edges_1': ordered_triangle_points[:, 1] - ordered_triangle_points[:, 0],
+            'triangle_edges_2': ordered_triangle_points[:, 2] - ordered_triangle_points[:, 0],
+            'triangle_cell_ids': np.asarray(triangle_cell_ids, dtype=np.int64)[triangle_order]}
+
+    def write_to_directory(self, bvh_dp):
+        # Several processes may build the hierarchy of the same mesh at the same time (see FileUtility)
+        FileUtility.write_array_directory(
+            bvh_dp, self.get_arrays(), {'version': self.VERSION, 'mesh_hash': self.mesh_hash}, self.mesh_hash)
+
+    @classmethod
+    def read_from_directory(cls, bvh_dp, mesh_hash=None):
+        """
+        Returns None, if there is no valid hierarchy in bvh_dp or if it belongs to a different mesh.
+        The arrays are memory mapped (read-only), i.e. processes loading the same hierarchy share the pages.
+        """
+        meta_and_arrays = FileUtility.read_array_directory(bvh_dp, cls.ARRAY_NAMES, mmap_mode='r')
+        if meta_and_arrays is None:
+            return None
+        meta, np_arrays = meta_and_arrays
+        if meta.get('version') != cls.VERSION or (mesh_hash is not None and meta.get('mesh_hash') != mesh_hash):
+            logger.info('Ignoring outdated bounding volume hierarchy in ' + bvh_dp)
+            return None
+        return cls(np_arrays, meta['mesh_hash'])
+
+    def _intersect_triangles(self, origins, directions, triangle_indices):
+        """
+        Moeller-Trumbore test (two-sided), returns the ray parameters and a validity mask.
+        The barycentric bounds are relaxed by BARYCENTRIC_EPSILON (see above).
+        """
+        edges_1 = self.triangle_edges_1[triangle_indices]
+        edges_2 = self.triangle_edges_2[triangle_indices]
+        p_vecs = np.cross(directions, edges_2)
+        determinants = np.einsum('ij,ij->i', edges_1, p_vecs)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inverse_determinants = 1.0 / determinants
+            t_vecs = origins - self.triangle_vertices[triangle_indices]
+            u = np.einsum('ij,ij->i', t_vecs, p_vecs) * inverse_determinants
+            q_vecs = np.cross(t_vecs, edges_1)
+            v = np.einsum('ij,ij->i', directions, q_vecs) * inverse_determinants
+            t = np.einsum('ij,ij->i', edges_2, q_vecs) * inverse_determinants
+        epsilon = self.BARYCENTRIC_EPSILON
+        valid_mask = (determinants != 0) & (u >= -epsilon) & (v >= -epsilon) & (u + v <= 1 + epsilon)
+        return t, valid_mask
+
+    def _traverse(self, origins, directions, first_hit_only):
+        """
+        Intersects the segments origins + t * directions (t in [0, 1]).
+        Returns the ray indices, the ray parameters and the triangle indices of the intersections
+        (only the closest intersection per ray, if first_hit_only is True).
+        """
+        num_rays = len(origins)
+        with np.errstate(divide='ignore'):
+            inverse_directions = 1.0 / directions
+        best_t = np.ones(num_rays, dtype=float)
+        best_triangle_indices = np.full(num_rays, -1, dtype=np.int64)
+        hit_ray_indices = []
+        hit_t = []
+        hit_triangle_indices = []
+
+        # The wavefront contains all (ray, node) pairs that still need to be tested
+        ray_indices = np.arange(num_rays, dtype=np.int64)
+        node_indices = np.zeros(num_rays, dtype=np.int64)
+        while len(ray_indices) > 0:
+            with np.errstate(invalid='ignore'):
+                t_lower = (self.node_bounds_min[node_indices] - origins[ray_indices]) * \
+                    inverse_directions[ray_indices]
+                t_upper = (self.node_bounds_max[node_indices] - origins[ray_indices]) * \
+                    inverse_directions[ray_indices]
+                t_near = np.minimum(t_lower, t_upper)
+                t_far = np.maximum(t_lower, t_upper)
+            # 0 * inf is nan for rays parallel to a slab that start on its boundary (e.g. rays
+            # through vertices or along edges), such slabs must not reject the node
+            t_near[np.isnan(t_near)] = -np.inf
+            t_far[np.isnan(t_far)] = np.inf
+            t_enter = np.maximum(t_near.max(axis=1), 0.0)
+            t_exit = np.minimum(t_far.min(axis=1), best_t[ray_indices])
+            overlap_mask = t_enter <= t_exit
+            ray_indices = ray_indices[overlap_mask]
+            node_indices = node_indices[overlap_mask]
+
+            leaf_mask = self.node_left_child[node_indices] < 0
+            leaf_ray_indices = ray_indices[leaf_mask]
+            leaf_node_indices = node_indices[leaf_mask]
+            if len(leaf_ray_indices) > 0:
+                num_leaf_triangles = self.node_num_triangles[leaf_node_indices]
+                segment_offsets = np.cumsum(num_leaf_triangles) - num_leaf_triangles
+                triangle_indices = np.arange(num_leaf_triangles.sum()) + np.repeat(
+                    self.node_first_triangle[leaf_node_indices] - segment_offsets, num_leaf_triangles)
+                triangle_ray_indices = np.repeat(leaf_ray_indices, num_leaf_triangles)
+                t, valid_mask = self._intersect_triangles(
+                    origins[triangle_ray_indices], directions[triangle_ray_indices], triangle_indices)
+                valid_mask &= (t >= 0) & (t <= best_t[triangle_ray_indices])
+                triangle_ray_indices = triangle_ray_indices[valid_mask]
+                triangle_indices = triangle_indices[valid_mask]
+                t = t[valid_mask]
+                if first_hit_only:
+                    np.minimum.at(best_t, triangle_ray_indices, t)
+                    closest_mask = t == best_t[triangle_ray_indices]
+                    best_triangle_indices[triangle_ray_indices[closest_mask]] = triangle_indices[closest_mask]
+                else:
+                    hit_ray_indices.append(triangle_ray_indices)
+                    hit_t.append(t)
+                    hit_triangle_indices.append(triangle_indices)
+
+            inner_ray_indices = ray_indices[~leaf_mask]
+            left_children = self.node_left_child[node_indices[~leaf_mask]]
+            ray_indices = np.concatenate([inner_ray_indices, inner_ray_indices])
+            node_indices = np.concatenate([left_children, left_children + 1])
+
+        if first_hit_only:
+            hit_ray_indices = np.flatnonzero(best_triangle_indices >= 0)
+            return hit_ray_indices, best_t[hit_ray_indices], best_triangle_indices[hit_ray_indices]
+        if len(hit_ray_indices) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=float), np.zeros(0, dtype=np.int64)
+        return np.concatenate(hit_ray_indices), np.concatenate(hit_t), np.concatenate(hit_triangle_indices)
+
+    def intersect_first_segments(self, line_first_points, line_second_points):
+        """
+        Vectorized counterpart of the first-hit IntersectWithLine() of the vtk locators.
+        Returns a hit mask (N,), the parametric coordinates (N,) of the first intersections
+        along the segments and the cell ids (N,). Segments without intersection have t = nan and cell id -1
+        """
+        line_first_points = np.asarray(line_first_points, dtype=float).reshape(-1, 3)
+        directions = np.asarray(line_second_points, dtype=float).reshape(-1, 3) - line_first_points
+        hit_ray_indices, hit_t, hit_triangle_indices = self._traverse(
+            line_first_points, directions, first_hit_only=True)
+
+        num_rays = len(line_first_points)
+        hit_mask = np.zeros(num_rays, dtype=bool)
+        hit_mask[hit_ray_indices] = True
+        t = np.full(num_rays, np.nan, dtype=float)
+        t[hit_ray_indices] = hit_t
+        cell_ids = np.full(num_rays, -1, dtype=np.int64)
+        cell_ids[hit_ray_indices] = self.triangle_cell_ids[hit_triangle_indices]
+        return hit_mask, t, cell_ids
+
+    def IntersectWithLine(self, line_first_point, line_second_point, vtk_points, vtk_cell_ids):
+        """ Same semantic as vtkOBBTree.IntersectWithLine(p1, p2, points, cellIds) (sorted along the line) """
+        line_first_point = np.asarray(line_first_point, dtype=float).reshape(1, 3)
+        direction = np.asarray(line_second_point, dtype=float).reshape(1, 3) - line_first_point
+        _, hit_t, hit_triangle_indices = self._traverse(line_first_point, direction, first_hit_only=False)
+        sort_indices = np.argsort(hit_t, kind='stable')
+        hit_points = line_first_point + hit_t[sort_indices, np.newaxis] * direction
+
+        if vtk_points is not None:
+            vtk_points.Reset()
+            for hit_point in hit_points.tolist():
+                vtk_points.InsertNextPoint(hit_point)
+        if vtk_cell_ids is not None:
+            vtk_cell_ids.Reset()
+            for cell_id in self.triangle_cell_ids[hit_triangle_indices[sort_indices]].tolist():
+                vtk_cell_ids.InsertNextId(cell_id)
+        return int(len(hit_points) > 0)
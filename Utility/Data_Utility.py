@@ -1,8 +1,17 @@
 import os
-import vtk
+import numpy as np
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkCommonCore import VTK_UNSIGNED_CHAR, vtkPoints
+from vtkmodules.vtkCommonDataModel import vtkCellArray, vtkPolyData
+from vtkmodules.vtkIOGeometry import vtkOBJReader, vtkSTLReader
+from vtkmodules.vtkIOImage import vtkJPEGReader
+from vtkmodules.vtkIOPLY import vtkPLYReader, vtkPLYWriter
+from vtkmodules.vtkIOXML import vtkXMLPolyDataReader, vtkXMLPolyDataWriter
+from vtkmodules.vtkRenderingCore import vtkTexture
 
-from matplotlib import pyplot as plt
 from Utility.Logging_Extension import logger
+from VTKInterface.Utility.Poly_Data_Cache_Utility import PolyDataCache
+from VTKInterface.Utility.Poly_Data_Memory_Map_Utility import PolyDataMemoryMapUtility
 
 class DataUtility(object):
 
@@ -11,63 +20,120 @@ class DataUtility(object):
     #   GetVerts ()
     #   GetPolys ()
 
+    # Shared by all create_poly_data_from_file() calls of this process (see configure_poly_data_cache())
+    poly_data_cache = PolyDataCache()
+
     @staticmethod
     def create_vtk_color_array(size, color):
-        vtk_colors = vtk.vtkUnsignedCharArray()
-        vtk_colors.SetName('RGB')
-        vtk_colors.SetNumberOfComponents(3)
-        for k in range(size):
-            vtk_colors.InsertNextTuple3(*color)
+        # The color is broadcast into a contiguous array, which is wrapped without copying
+        np_colors = np.empty((size, 3), dtype=np.uint8)
+        np_colors[:] = color
+        return DataUtility.create_vtk_color_array_from_numpy(np_colors, name='RGB')
 
-        vtk_colors.Modified()
+    @staticmethod
+    def create_vtk_color_array_from_numpy(np_colors, name='ColorArray'):
+        # The (N, 3) or (N, 4) uint8 array is wrapped without copying
+        np_colors = np.ascontiguousarray(np_colors, dtype=np.uint8)
+        vtk_colors = numpy_support.numpy_to_vtk(
+            np_colors, deep=False, array_type=VTK_UNSIGNED_CHAR)
+        vtk_colors.SetName(name)
         return vtk_colors
 
     @staticmethod
     def create_vtk_vertex_array(size):
+        # Each vertex cell contains exactly one point, i.e.
+        #   offsets = [0, 1, ..., size] and connectivity = [0, 1, ..., size - 1]
+        # https://vtk.org/doc/nightly/html/classvtkCellArray.html
+        offsets = np.arange(size + 1, dtype=numpy_support.ID_TYPE_CODE)
+        connectivity = offsets[:-1]
+        return DataUtility.create_vtk_cell_array_from_numpy(offsets, connectivity)
 
-        vtk_vertices = vtk.vtkCellArray()
-        for k in range(size):
-            vtk_vertices.InsertNextCell(1)
-            vtk_vertices.InsertCellPoint(k)
+    @staticmethod
+    def create_vtk_cell_array_from_numpy(offsets, connectivity):
+        # The offset and connectivity arrays are wrapped without copying
+        vtk_offsets = numpy_support.numpy_to_vtkIdTypeArray(
+            np.ascontiguousarray(offsets, dtype=numpy_support.ID_TYPE_CODE), deep=False)
+        vtk_connectivity = numpy_support.numpy_to_vtkIdTypeArray(
+            np.ascontiguousarray(connectivity, dtype=numpy_support.ID_TYPE_CODE), deep=False)
+        vtk_cells = vtkCellArray()
+        vtk_cells.SetData(vtk_offsets, vtk_connectivity)
+        return vtk_cells
 
-        vtk_vertices.Modified()
-        return vtk_vertices
+    @staticmethod
+    def create_vtk_points_from_numpy(coords):
+        # (N, 3) float32 and float64 arrays are wrapped without copying
+        coords = np.asarray(coords)
+        if coords.dtype not in [np.float32, np.float64]:
+            coords = coords.astype(np.float64)
+        coords = np.ascontiguousarray(coords.reshape(-1, 3))
+        vtk_points = vtkPoints()
+        vtk_points.SetData(numpy_support.numpy_to_vtk(coords, deep=False))
+        return vtk_points
 
     @staticmethod
     def create_point_cloud_poly_data(coords, colors=None):
+        """
+        coords: (N, 3) float array
+        colors: (N, 3) uint8 array
+        The numpy arrays are shared with the poly data (i.e. they are not copied),
+        lists and arrays with other types are converted first
+        """
 
-        if colors is None:
-            colors = [[1, 1, 1] for coord in coords]
-
-        point_cloud_poly_data = vtk.vtkPolyData()
-
-        points = vtk.vtkPoints()
-        cells = vtk.vtkCellArray()
-
-        uchar_array = vtk.vtkUnsignedCharArray()
-        uchar_array.SetNumberOfComponents(3)
-        uchar_array.SetName('ColorArray')
-
-        for coord, color in zip(coords, colors):
-            pointId = points.InsertNextPoint(coord[:])
+        vtk_points = DataUtility.create_vtk_points_from_numpy(coords)
+        num_points = vtk_points.GetNumberOfPoints()
 
-            uchar_array.InsertNextTuple3(*color)
+        if colors is None:
+            vtk_colors = DataUtility.create_vtk_color_array(num_points, [1, 1, 1])
+            vtk_colors.SetName('ColorArray')
+        else:
+            vtk_colors = DataUtility.create_vtk_color_array_from_numpy(colors)
 
-            cells.InsertNextCell(1)
-            cells.InsertCellPoint(pointId)
+        point_cloud_poly_data = vtkPolyData()
+        point_cloud_poly_data.SetPoints(vtk_points)
+        point_cloud_poly_data.SetVerts(DataUtility.create_vtk_vertex_array(num_points))
+        point_cloud_poly_data.GetPointData().SetScalars(vtk_colors)
+        return point_cloud_poly_data
 
-            cells.Modified()
-            points.Modified()
-            uchar_array.Modified()
+    @staticmethod
+    def create_line_segments_poly_data(start_points, end_points, colors=None):
+        """
+        start_points, end_points: (M, 3) float arrays
+        colors: (M, 3) uint8 array (one color per line segment, stored as cell data)
+        All line segments are stored in a single poly data, i.e. they can be rendered with a single actor
+        """
+        start_points = np.asarray(start_points, dtype=float).reshape(-1, 3)
+        end_points = np.asarray(end_points, dtype=float).reshape(-1, 3)
+        num_segments = len(start_points)
+
+        # Point 2 * i and 2 * i + 1 define segment i
+        coords = np.stack([start_points, end_points], axis=1).reshape(-1, 3)
+        offsets = np.arange(0, 2 * num_segments + 1, 2, dtype=numpy_support.ID_TYPE_CODE)
+        connectivity = np.arange(2 * num_segments, dtype=numpy_support.ID_TYPE_CODE)
+
+        line_segments_poly_data = vtkPolyData()
+        line_segments_poly_data.SetPoints(DataUtility.create_vtk_points_from_numpy(coords))
+        line_segments_poly_data.SetLines(DataUtility.create_vtk_cell_array_from_numpy(offsets, connectivity))
+        if colors is not None:
+            line_segments_poly_data.GetCellData().SetScalars(
+                DataUtility.create_vtk_color_array_from_numpy(np.asarray(colors).reshape(-1, 3)))
+        return line_segments_poly_data
 
-        point_cloud_poly_data.SetPoints(points)
-        point_cloud_poly_data.SetVerts(cells)
+    @staticmethod
+    def configure_poly_data_cache(max_memory_bytes=1024 ** 3, cache_dp=None):
+        # max_memory_bytes=0 disables the in-process cache, cache_dp=None disables the disc cache
+        DataUtility.poly_data_cache = PolyDataCache(max_memory_bytes, cache_dp)
 
-        point_cloud_poly_data.GetPointData().SetScalars(uchar_array)
-        return point_cloud_poly_data
+    @staticmethod
+    def create_poly_data_from_file(poly_ifp, use_cache=True):
+        # Memory mapped files are not cached, since their pages are already shared by the OS
+        if use_cache and not DataUtility.is_memory_map_file(poly_ifp):
+            return DataUtility.poly_data_cache.get_poly_data(
+                poly_ifp, DataUtility.create_poly_data_from_file_without_cache)
+        else:
+            return DataUtility.create_poly_data_from_file_without_cache(poly_ifp)
 
     @staticmethod
-    def create_poly_data_from_file(poly_ifp):
+    def create_poly_data_from_file_without_cache(poly_ifp):
 
         # VTK supports only OBJ, PLY and STL, see:
         #   https://vtk.org/doc/nightly/html/classvtkAbstractPolyDataReader.html
@@ -78,12 +144,28 @@ class DataUtility(object):
             return DataUtility.create_poly_data_from_obj(poly_ifp)
         elif os.path.splitext(poly_ifp)[1].upper() == '.STL':
             return DataUtility.create_poly_data_from_stl(poly_ifp)
+        elif DataUtility.is_memory_map_file(poly_ifp):
+            return DataUtility.create_poly_data_from_memory_map(poly_ifp)
         else:
             assert False
 
+    @staticmethod
+    def is_memory_map_file(poly_ifp):
+        return os.path.splitext(poly_ifp)[1].upper() == '.PDMM'
+
+    @staticmethod
+    def create_poly_data_from_memory_map(mm_ifp):
+        # See PolyDataMemoryMapUtility for the file layout
+        return PolyDataMemoryMapUtility.create_poly_data_from_memory_map(mm_ifp)
+
+    @staticmethod
+    def convert_poly_data_file_to_memory_map(poly_ifp, mm_ofp):
+        # Converts PLY, OBJ and STL files into the memory map format
+        PolyDataMemoryMapUtility.convert_poly_data_file_to_memory_map(poly_ifp, mm_ofp)
+
     @staticmethod
     def create_poly_data_from_stl(stl_ifp):
-        reader_stl = vtk.vtkSTLReader()            # Returns vtkPolyData
+        reader_stl = vtkSTLReader()            # Returns vtkPolyData
         reader_stl.SetFileName(
             stl_ifp)
         reader_stl.Update()
@@ -100,7 +182,7 @@ class DataUtility(object):
         # In contrast to PLY, OBJ-files store the color information as textures, see
         #   https://public.kitware.com/pipermail/vtkusers/2012-January/072082.html
 
-        reader_obj = vtk.vtkOBJReader()          # Returns vtkPolyData
+        reader_obj = vtkOBJReader()          # Returns vtkPolyData
         reader_obj.SetFileName(obj_ifp)
         reader_obj.Update()
         poly_data = reader_obj.GetOutput()
@@ -117,7 +199,7 @@ class DataUtility(object):
         # In order to modify the colors use
         #       poly_data.GetPointData().SetScalars(vtk_colors)
 
-        reader_ply = vtk.vtkPLYReader()          # Returns vtkPolyData
+        reader_ply = vtkPLYReader()          # Returns vtkPolyData
         reader_ply.SetFileName(ply_ifp)
         reader_ply.Update()
         poly_data = reader_ply.GetOutput()
@@ -131,22 +213,163 @@ class DataUtility(object):
 
         return poly_data
 
+    # Number of bits per dimension of the (packed) voxel keys
+    VOXEL_KEY_BITS = 21
+
+    @staticmethod
+    def compute_voxel_keys(coords, voxel_size):
+        """
+        Packs the indices of the voxels containing the points into int64 keys (21 bits per dimension),
+        i.e. points in the same voxel have the same key
+        """
+        voxel_indices = np.floor(coords / voxel_size).astype(np.int64)
+        voxel_indices += 2 ** (DataUtility.VOXEL_KEY_BITS - 1)
+        if voxel_indices.size > 0 and (
+                voxel_indices.min() < 0 or voxel_indices.max() >= 2 ** DataUtility.VOXEL_KEY_BITS):
+            raise ValueError('The voxel size ' + str(voxel_size) + ' is too small for the extent of the points')
+        return (voxel_indices[:, 0] << (2 * DataUtility.VOXEL_KEY_BITS) |
+                voxel_indices[:, 1] << DataUtility.VOXEL_KEY_BITS |
+                voxel_indices[:, 2])
+
+    # PLY property types and the corresponding numpy types
+    PLY_PROPERTY_TYPES = {
+        'char': 'i1', 'int8': 'i1',
+        'uchar': 'u1', 'uint8': 'u1',
+        'short': 'i2', 'int16': 'i2',
+        'ushort': 'u2', 'uint16': 'u2',
+        'int': 'i4', 'int32': 'i4',
+        'uint': 'u4', 'uint32': 'u4',
+        'float': 'f4', 'float32': 'f4',
+        'double': 'f8', 'float64': 'f8'}
+
+    @staticmethod
+    def read_ply_header(ply_ifp):
+        """
+        Returns the format (e.g. 'binary_little_endian'), the elements as list of
+        (name, count, properties) and the size of the header in bytes. The properties are
+        (name, type) tuples, list properties are ('list', name, count type, item type) tuples.
+        """
+        ply_format = None
+        elements = []
+        with open(ply_ifp, 'rb') as ply_file:
+            if ply_file.readline().strip() != b'ply':
+                raise ValueError("Invalid PLY file '" + ply_ifp + "'")
+            while True:
+                line = ply_file.readline()
+                if len(line) == 0:
+                    raise ValueError("Incomplete PLY header in '" + ply_ifp + "'")
+                tokens = line.decode('ascii').split()
+                if len(tokens) == 0 or tokens[0] in ['comment', 'obj_info']:
+                    continue
+                if tokens[0] == 'format':
+                    ply_format = tokens[1]
+                elif tokens[0] == 'element':
+                    elements.append((tokens[1], int(tokens[2]), []))
+                elif tokens[0] == 'property' and tokens[1] == 'list':
+                    elements[-1][2].append(('list', tokens[4], tokens[2], tokens[3]))
+                elif tokens[0] == 'property':
+                    elements[-1][2].append((tokens[2], tokens[1]))
+                elif tokens[0] == 'end_header':
+                    header_size = ply_file.tell()
+                    break
+        return ply_format, elements, header_size
+
+    @staticmethod
+    def iterate_ply_point_chunks(ply_ifp, chunk_size=1000000, coords_dtype=np.float32):
+        """
+        Generator yielding the vertices of a binary PLY file in chunks of (at most) chunk_size points
+        as (coords (n, 3), colors (n, 3) uint8 or None) tuples. In contrast to create_poly_data_from_ply()
+        only a single chunk is held in memory.
+        """
+        ply_format, elements, header_size = DataUtility.read_ply_header(ply_ifp)
+        if ply_format == 'binary_little_endian':
+            byte_order = '<'
+        elif ply_format == 'binary_big_endian':
+            byte_order = '>'
+        else:
+            raise ValueError("Streaming requires a binary PLY file, '" + ply_ifp + "' is " + str(ply_format))
+
+        # Elements stored before the vertices are skipped (this requires properties of fixed size)
+        vertex_offset = header_size
+        vertex_element = None
+        for element_name, element_count, element_properties in elements:
+            if element_name == 'vertex':
+                vertex_element = (element_count, element_properties)
+                break
+            if any(element_property[0] == 'list' for element_property in element_properties):
+                raise ValueError("Unsupported list property before the vertices in '" + ply_ifp + "'")
+            vertex_offset += element_count * sum(
+                np.dtype(DataUtility.PLY_PROPERTY_TYPES[property_type]).itemsize
+                for _, property_type in element_properties)
+        if vertex_element is None:
+            raise ValueError("No vertex element in '" + ply_ifp + "'")
+        num_vertices, vertex_properties = vertex_element
+        if any(vertex_property[0] == 'list' for vertex_property in vertex_properties):
+            raise ValueError("Unsupported list property of the vertices in '" + ply_ifp + "'")
+
+        vertex_dtype = np.dtype([
+            (property_name, byte_order + DataUtility.PLY_PROPERTY_TYPES[property_type])
+            for property_name, property_type in vertex_properties])
+        property_names = vertex_dtype.names
+        color_names = None
+        for candidate_color_names in [('red', 'green', 'blue'), ('diffuse_red', 'diffuse_green', 'diffuse_blue')]:
+            if all(color_name in property_names for color_name in candidate_color_names):
+                color_names = candidate_color_names
+                break
+
+        with open(ply_ifp, 'rb') as ply_file:
+            ply_file.seek(vertex_offset)
+            num_remaining = num_vertices
+            while num_remaining > 0:
+                vertices = np.fromfile(ply_file, dtype=vertex_dtype, count=min(chunk_size, num_remaining))
+                if len(vertices) == 0:
+                    raise ValueError("Unexpected end of file in '" + ply_ifp + "'")
+                num_remaining -= len(vertices)
+                coords = np.empty((len(vertices), 3), dtype=coords_dtype)
+                for index, coord_name in enumerate(['x', 'y', 'z']):
+                    coords[:, index] = vertices[coord_name]
+                if color_names is None:
+                    colors = None
+                else:
+                    colors = np.empty((len(vertices), 3), dtype=np.uint8)
+                    for index, color_name in enumerate(color_names):
+                        colors[:, index] = vertices[color_name]
+                yield coords, colors
+
+    @staticmethod
+    def create_poly_data_from_string(poly_data_str):
+        # Counterpart of write_poly_data_to_string()
+        reader_vtp = vtkXMLPolyDataReader()
+        reader_vtp.ReadFromInputStringOn()
+        reader_vtp.SetInputString(poly_data_str)
+        reader_vtp.Update()
+        return reader_vtp.GetOutput()
+
     @staticmethod
     def create_texture_from_jpeg(jpeg_ifp):
-        reader_jpeg = vtk.vtkJPEGReader()
+        reader_jpeg = vtkJPEGReader()
         reader_jpeg.SetFileName(jpeg_ifp)
         reader_jpeg.Update()
-        texture = vtk.vtkTexture()
+        texture = vtkTexture()
         texture.SetInputData(reader_jpeg.GetOutput())
         texture.InterpolateOn()
         return texture
 
     @staticmethod
     def write_poly_data_to_ply(poly_data, ply_ofp):
-        vtk_image_writer = vtk.vtkPLYWriter()
+        vtk_image_writer = vtkPLYWriter()
         vtk_image_writer.SetFileName(ply_ofp)
         vtk_image_writer.SetArrayName("RGB")
         vtk_image_writer.SetInputData(poly_data)
         vtk_image_writer.Write()
 
-
+    @staticmethod
+    def write_poly_data_to_string(poly_data):
+        # Allows to pass poly data to other processes (vtk objects can not be pickled)
+        # The binary data mode encodes the arrays with base64, i.e. the result is a valid string
+        vtp_writer = vtkXMLPolyDataWriter()
+        vtp_writer.WriteToOutputStringOn()
+        vtp_writer.SetDataModeToBinary()
+        vtp_writer.SetInputData(poly_data)
+        vtp_writer.Write()
+        return vtp_writer.GetOutputString()
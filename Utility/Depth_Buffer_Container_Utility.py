@@ -0,0 +1,158 @@
+import os
+import struct
+import numpy as np
+
+from Utility.Logging_Extension import logger
+from VTKInterface.Utility.Depth_Buffer_Utility import DepthBufferUtility
+
+
+class DepthBufferContainer(object):
+
+    """ Usage:
+        with DepthBufferContainer(container_fp, mode='a') as depth_buffer_container:
+            depth_buffer_container.append(cam.file_name, depth_buffer)
+
+        with DepthBufferContainer(container_fp, mode='r') as depth_buffer_container:
+            for name in depth_buffer_container.get_names():
+                depth_buffer = depth_buffer_container.read(name)
+
+        Single file, append-only container for many depth buffers (avoids thousands of small files).
+        File layout:
+            FILE_MAGIC
+            record 0: RECORD_MAGIC, name length, height, width, dtype, scale, number of data bytes,
+                      name (utf-8), padding, raw data (aligned to ALIGNMENT bytes)
+            record 1: ...
+        Depth buffers stored as uint16 are quantized, i.e. depth = stored_value * scale.
+        A record that has been written only partially (e.g. because the process was killed)
+        is ignored by the reader and overwritten by the next append.
+    """
+
+    FILE_MAGIC = b'VTKIDBC1'
+    RECORD_MAGIC = b'DREC'
+    # record magic, name length, height, width, dtype (e.g. '<f4'), scale, number of data bytes
+    RECORD_HEADER_FORMAT = '<4sIII8sdQ'
+    RECORD_HEADER_SIZE = struct.calcsize(RECORD_HEADER_FORMAT)
+    ALIGNMENT = 16
+    SUPPORTED_DTYPES = [np.dtype(np.float32), np.dtype(np.float16), np.dtype(np.uint16)]
+
+    def __init__(self, container_fp, mode='r'):
+        assert mode in ['r', 'a']
+        self.container_fp = container_fp
+        self.mode = mode
+        # name -> (data offset, shape, dtype, scale)
+        self.index = {}
+
+        if mode == 'a' and not os.path.isfile(container_fp):
+            with open(container_fp, 'wb') as container_file:
+                container_file.write(self.FILE_MAGIC)
+
+        valid_size = self._build_index()
+        if mode == 'a':
+            self.container_file = open(container_fp, 'r+b')
+            # Remove a partially written record at the end of the file
+            self.container_file.truncate(valid_size)
+            self.container_file.seek(valid_size)
+        else:
+            self.container_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def _align(offset):
+        alignment = DepthBufferContainer.ALIGNMENT
+        return (offset + alignment - 1) // alignment * alignment
+
+    def _build_index(self):
+        """ Returns the size of the valid part of the file """
+        file_size = os.path.getsize(self.container_fp)
+        with open(self.container_fp, 'rb') as container_file:
+            if container_file.read(len(self.FILE_MAGIC)) != self.FILE_MAGIC:
+                raise ValueError("Invalid depth buffer container '" + self.container_fp + "'")
+            record_offset = len(self.FILE_MAGIC)
+            while record_offset + self.RECORD_HEADER_SIZE <= file_size:
+                container_file.seek(record_offset)
+                record_magic, name_length, height, width, dtype_bytes, scale, num_data_bytes = struct.unpack(
+                    self.RECORD_HEADER_FORMAT, container_file.read(self.RECORD_HEADER_SIZE))
+                if record_magic != self.RECORD_MAGIC:
+                    break
+                name_offset = record_offset + self.RECORD_HEADER_SIZE
+                data_offset = self._align(name_offset + name_length)
+                if data_offset + num_data_bytes > file_size:
+                    break
+                name = container_file.read(name_length).decode('utf-8')
+                dtype = np.dtype(dtype_bytes.rstrip(b' ').decode('ascii'))
+                # Later records replace earlier records with the same name
+                self.index[name] = (data_offset, (height, width), dtype, scale)
+                record_offset = data_offset + num_data_bytes
+
+        if record_offset != file_size:
+            logger.info('Ignoring incomplete record at the end of ' + self.container_fp)
+        return record_offset
+
+    def append(self, name, depth_buffer, dtype=np.float32, scale=None):
+        """
+        dtype: np.float32, np.float16 or np.uint16 (quantized with the given scale, by default
+               the scale maps the maximum depth value to the maximum uint16 value)
+        """
+        assert self.mode == 'a'
+        dtype = np.dtype(dtype)
+        assert dtype in self.SUPPORTED_DTYPES
+
+        if dtype == np.uint16:
+            data, scale = DepthBufferUtility.quantize_depth_buffer(depth_buffer, scale)
+        else:
+            scale = 1.0
+            data = np.ascontiguousarray(depth_buffer, dtype=dtype)
+
+        name_bytes = name.encode('utf-8')
+        height, width = data.shape
+        record_header = struct.pack(
+            self.RECORD_HEADER_FORMAT,
+            self.RECORD_MAGIC,
+            len(name_bytes),
+            height,
+            width,
+            dtype.str.encode('ascii').ljust(8),
+            scale,
+            data.nbytes)
+
+        record_offset = self.container_file.tell()
+        name_offset = record_offset + self.RECORD_HEADER_SIZE
+        data_offset = self._align(name_offset + len(name_bytes))
+        self.container_file.write(record_header)
+        self.container_file.write(name_bytes)
+        self.container_file.write(b'\0' * (data_offset - name_offset - len(name_bytes)))
+        self.container_file.write(data.tobytes())
+        self.container_file.flush()
+        self.index[name] = (data_offset, (height, width), dtype, scale)
+
+    def get_names(self):
+        return list(self.index.keys())
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def read(self, name, dequantize=True):
+        """
+        Returns a read-only memory mapped view of the depth buffer.
+        Quantized depth buffers are converted to float32 if dequantize is True.
+        """
+        data_offset, shape, dtype, scale = self.index[name]
+        if self.container_file is not None:
+            self.container_file.flush()
+        if shape[0] * shape[1] == 0:
+            depth_buffer = np.zeros(shape, dtype=dtype)
+        else:
+            depth_buffer = np.memmap(self.container_fp, dtype=dtype, mode='r', offset=data_offset, shape=shape)
+        if dequantize and dtype == np.uint16:
+            depth_buffer = depth_buffer.astype(np.float32) * np.float32(scale)
+        return depth_buffer
+
+    def close(self):
+        if self.container_file is not None:
+            self.container_file.close()
+            self.container_file = None
@@ -0,0 +1,81 @@
+import numpy as np
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkCommonCore import VTK_UNSIGNED_SHORT
+from vtkmodules.vtkCommonDataModel import vtkImageData
+from vtkmodules.vtkIOImage import vtkPNGReader, vtkPNGWriter
+
+
+class DepthBufferUtility(object):
+
+    """
+    Depth buffers are (H, W) arrays in computer vision image coordinates (i.e. starting at the upper left),
+    pixels without depth information contain 0
+    """
+
+    DEPTH_SCALE_PNG_KEY = 'depth_scale'
+
+    @staticmethod
+    def compute_depth_scale(depth_buffer):
+        # Maps the maximum depth value to the maximum uint16 value
+        max_depth = float(np.max(depth_buffer)) if depth_buffer.size > 0 else 0.0
+        if max_depth > 0:
+            return max_depth / np.iinfo(np.uint16).max
+        else:
+            return 1.0
+
+    @staticmethod
+    def quantize_depth_buffer(depth_buffer, depth_scale=None):
+        """ Returns the uint16 depth buffer and the scale, i.e. depth = quantized_value * depth_scale """
+        if depth_scale is None:
+            depth_scale = DepthBufferUtility.compute_depth_scale(depth_buffer)
+        quantized_depth_buffer = np.round(depth_buffer / depth_scale)
+        np.clip(quantized_depth_buffer, 0, np.iinfo(np.uint16).max, out=quantized_depth_buffer)
+        return quantized_depth_buffer.astype(np.uint16), depth_scale
+
+    @staticmethod
+    def write_depth_buffer_to_npy(depth_buffer, npy_ofp, dtype=np.float32):
+        np.save(npy_ofp, depth_buffer.astype(dtype, copy=False))
+
+    @staticmethod
+    def write_depth_buffer_to_png(depth_buffer, png_ofp, depth_scale=None):
+        """ Writes a quantized 16 bit PNG, the scale is stored as text chunk """
+
+        quantized_depth_buffer, depth_scale = DepthBufferUtility.quantize_depth_buffer(
+            depth_buffer, depth_scale)
+        height, width = quantized_depth_buffer.shape
+
+        # vtkImageData starts at the lower left
+        image_data = vtkImageData()
+        image_data.SetDimensions(width, height, 1)
+        image_data.GetPointData().SetScalars(
+            numpy_support.numpy_to_vtk(
+                np.ascontiguousarray(quantized_depth_buffer[::-1]).ravel(),
+                deep=False,
+                array_type=VTK_UNSIGNED_SHORT))
+
+        image_writer = vtkPNGWriter()
+        image_writer.SetFileName(png_ofp)
+        image_writer.AddText(DepthBufferUtility.DEPTH_SCALE_PNG_KEY, repr(depth_scale))
+        image_writer.SetInputData(image_data)
+        image_writer.Write()
+
+    @staticmethod
+    def read_depth_buffer_from_png(png_ifp):
+        """ Counterpart of write_depth_buffer_to_png() """
+
+        reader_png = vtkPNGReader()
+        reader_png.SetFileName(png_ifp)
+        reader_png.Update()
+
+        depth_scale = None
+        for index in range(reader_png.GetNumberOfTextChunks()):
+            if reader_png.GetTextKey(index) == DepthBufferUtility.DEPTH_SCALE_PNG_KEY:
+                depth_scale = float(reader_png.GetTextValue(index))
+        if depth_scale is None:
+            raise ValueError("No depth scale found in '" + png_ifp + "'")
+
+        image_data = reader_png.GetOutput()
+        width, height, _ = image_data.GetDimensions()
+        quantized_depth_buffer = numpy_support.vtk_to_numpy(
+            image_data.GetPointData().GetScalars()).reshape((height, width))
+        return quantized_depth_buffer[::-1].astype(np.float32) * np.float32(depth_scale)
@@ -0,0 +1,139 @@
+import numpy as np
+
+from VTKInterface.Utility.Data_Utility import DataUtility
+
+
+class VoxelDepthFusion(object):
+
+    """ Usage:
+        depth_fusion = VoxelDepthFusion(voxel_size=0.05)
+        for cam in cameras:
+            render_interface.set_active_cam_from_computer_vision_cam(cam)
+            render_interface.render()
+            depth_fusion.add_depth_buffer(
+                render_interface.get_computer_vision_depth_buffer_as_numpy_arr(),
+                cam.get_4x4_cam_to_world_mat(),
+                cam.get_calibration_mat())
+        coords, colors = depth_fusion.get_points()
+
+        Fuses the depth buffers of several views into a single point cloud with one point per
+        occupied voxel (the mean of the back-projected points falling into the voxel).
+        The voxels are stored as sorted (packed) voxel keys with the corresponding sums of the
+        coordinates and colors, i.e. the memory is proportional to the number of occupied voxels.
+    """
+
+    def __init__(self, voxel_size):
+        self.voxel_size = voxel_size
+        self.voxel_keys = np.empty(0, dtype=np.int64)
+        self.coord_sums = np.empty((0, 3), dtype=np.float64)
+        self.color_sums = None
+        self.counts = np.empty(0, dtype=np.int64)
+
+    def get_num_voxels(self):
+        return len(self.voxel_keys)
+
+    @staticmethod
+    def _sum_per_group(values, group_indices, num_groups):
+        return np.stack([np.bincount(group_indices, weights=values[:, index], minlength=num_groups)
+                         for index in range(values.shape[1])], axis=1)
+
+    def add_points(self, coords, colors=None):
+        """
+        coords: (N, 3) float array
+        colors: (N, 3) uint8 array (either all or none of the added points must have colors)
+        """
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+        if self.get_num_voxels() == 0 and self.color_sums is None and colors is not None:
+            self.color_sums = np.empty((0, 3), dtype=np.float64)
+        assert (colors is None) == (self.color_sums is None)
+        if len(coords) == 0:
+            return
+
+        # Accumulate the points of the same voxel
+        chunk_voxel_keys, group_indices = np.unique(
+            DataUtility.compute_voxel_keys(coords, self.voxel_size), return_inverse=True)
+        group_indices = group_indices.ravel()
+        num_groups = len(chunk_voxel_keys)
+        chunk_coord_sums = self._sum_per_group(coords, group_indices, num_groups)
+        chunk_counts = np.bincount(group_indices, minlength=num_groups)
+        if colors is not None:
+            chunk_color_sums = self._sum_per_group(
+                np.asarray(colors).reshape(-1, 3), group_indices, num_groups)
+
+        # Merge with the voxels of the previous views
+        insert_positions = np.searchsorted(self.voxel_keys, chunk_voxel_keys)
+        if self.get_num_voxels() > 0:
+            existing_mask = self.voxel_keys[
+                np.minimum(insert_positions, self.get_num_voxels() - 1)] == chunk_voxel_keys
+        else:
+            existing_mask = np.zeros(num_groups, dtype=bool)
+        existing_positions = insert_positions[existing_mask]
+        self.coord_sums[existing_positions] += chunk_coord_sums[existing_mask]
+        self.counts[existing_positions] += chunk_counts[existing_mask]
+        if colors is not None:
+            self.color_sums[existing_positions] += chunk_color_sums[existing_mask]
+
+        new_mask = ~existing_mask
+        new_positions = insert_positions[new_mask]
+        self.voxel_keys = np.insert(self.voxel_keys, new_positions, chunk_voxel_keys[new_mask])
+        self.coord_sums = np.insert(self.coord_sums, new_positions, chunk_coord_sums[new_mask], axis=0)
+        self.counts = np.insert(self.counts, new_positions, chunk_counts[new_mask])
+        if colors is not None:
+            self.color_sums = np.insert(self.color_sums, new_positions, chunk_color_sums[new_mask], axis=0)
+
+    @staticmethod
+    def compute_depth_buffer_coords(depth_buffer,
+                                    cam_to_world_mat,
+                                    calibration_mat,
+                                    stride=1):
+        """
+        Back-projects the pixels (centers) with depth > 0 of a computer vision depth buffer (see
+        DepthBufferUtility) to world coordinates. Returns the (N, 3) coordinates and the (H, W) pixel mask.
+        """
+        height, width = depth_buffer.shape
+        pixel_mask = np.zeros((height, width), dtype=bool)
+        pixel_mask[::stride, ::stride] = True
+        pixel_mask &= depth_buffer > 0
+        ys, xs = np.nonzero(pixel_mask)
+        depths = depth_buffer[pixel_mask].astype(np.float64)
+
+        image_coords_hom = np.empty((3, len(xs)), dtype=np.float64)
+        image_coords_hom[0] = xs + 0.5
+        image_coords_hom[1] = ys + 0.5
+        image_coords_hom[2] = 1.0
+        cam_coords = np.linalg.inv(calibration_mat).dot(image_coords_hom) * depths
+
+        cam_to_world_mat = np.asarray(cam_to_world_mat, dtype=np.float64)
+        world_coords = (cam_to_world_mat[0:3, 0:3].dot(cam_coords) + cam_to_world_mat[0:3, 3:4]).T
+        return world_coords, pixel_mask
+
+    def add_depth_buffer(self,
+                         depth_buffer,
+                         cam_to_world_mat,
+                         calibration_mat,
+                         color_image=None,
+                         stride=1):
+        """
+        depth_buffer: (H, W) computer vision depth buffer (e.g. get_computer_vision_depth_buffer_as_numpy_arr())
+        cam_to_world_mat: 4x4 computer vision camera to world matrix
+        color_image: (H, W, 3) uint8 array in computer vision image coordinates (e.g. the rendered image)
+        """
+        world_coords, pixel_mask = self.compute_depth_buffer_coords(
+            depth_buffer, cam_to_world_mat, calibration_mat, stride)
+        colors = None
+        if color_image is not None:
+            colors = np.asarray(color_image)[pixel_mask][:, 0:3]
+        self.add_points(world_coords, colors)
+
+    def get_points(self, min_num_observations=1):
+        """
+        Returns the mean coordinates (N, 3) and colors (N, 3) uint8 (or None) of the voxels
+        containing at least min_num_observations points
+        """
+        voxel_mask = self.counts >= min_num_observations
+        counts = self.counts[voxel_mask, np.newaxis]
+        coords = self.coord_sums[voxel_mask] / counts
+        colors = None
+        if self.color_sums is not None:
+            colors = np.round(self.color_sums[voxel_mask] / counts).astype(np.uint8)
+        return coords, colors
@@ -0,0 +1,103 @@
+import os
+import glob
+import json
+import tempfile
+from contextlib import contextmanager
+import numpy as np
+
+
+class FileUtility(object):
+
+    """ Usage:
+        with FileUtility.create_temporary_output_fp(cache_fp) as temporary_fp:
+            writer.SetFileName(temporary_fp)
+            writer.Write()
+
+        FileUtility.write_array_directory(cache_dp, {'coords': coords}, {'version': 1}, key=source_hash)
+        meta, np_arrays = FileUtility.read_array_directory(cache_dp, ['coords'])
+
+        Helpers for caches shared by several processes. Files are written to unique temporary files
+        in the target directory and moved into place (atomically) afterwards, i.e. concurrent writers
+        never write to the same file and readers never see partially written files.
+    """
+
+    ARRAY_DIRECTORY_META_FILE_NAME = 'meta.json'
+
+    @staticmethod
+    @contextmanager
+    def create_temporary_output_fp(ofp):
+        """
+        Yields the path of a new (unique) temporary file next to ofp, which replaces ofp
+        if the block succeeds and which is removed otherwise. The extension of ofp is kept.
+        """
+        odp, ofn = os.path.split(os.path.abspath(ofp))
+        ofn_stem, ofn_ext = os.path.splitext(ofn)
+        temporary_file_descriptor, temporary_fp = tempfile.mkstemp(
+            dir=odp, prefix=ofn_stem + '.', suffix='.tmp' + ofn_ext)
+        os.close(temporary_file_descriptor)
+        try:
+            yield temporary_fp
+            os.replace(temporary_fp, ofp)
+        except BaseException:
+            if os.path.isfile(temporary_fp):
+                os.remove(temporary_fp)
+            raise
+
+    @staticmethod
+    def _get_array_fp(array_dp, name, key):
+        return os.path.join(array_dp, name + '.' + key + '.npy')
+
+    @staticmethod
+    def write_array_directory(array_dp, np_arrays, meta, key):
+        """
+        Writes the arrays as <name>.<key>.npy files and the meta file (JSON) as last file.
+        The key (e.g. a content hash) separates the arrays of different contents, i.e. the published
+        meta file always refers to complete arrays, even if several processes write the same directory.
+        Arrays of previous contents are removed after the meta file has been replaced.
+        """
+        if not os.path.isdir(array_dp):
+            os.makedirs(array_dp, exist_ok=True)
+        for name, np_array in np_arrays.items():
+            with FileUtility.create_temporary_output_fp(
+                    FileUtility._get_array_fp(array_dp, name, key)) as temporary_fp:
+                np.save(temporary_fp, np.ascontiguousarray(np_array))
+
+        meta = dict(meta)
+        meta['array_key'] = key
+        meta_fp = os.path.join(array_dp, FileUtility.ARRAY_DIRECTORY_META_FILE_NAME)
+        with FileUtility.create_temporary_output_fp(meta_fp) as temporary_fp:
+            with open(temporary_fp, 'w') as meta_file:
+                json.dump(meta, meta_file)
+
+        current_array_fps = set(FileUtility._get_array_fp(array_dp, name, key) for name in np_arrays)
+        for array_fp in glob.glob(os.path.join(array_dp, '*.npy')):
+            # Temporary files belong to concurrent writers
+            if array_fp not in current_array_fps and not array_fp.endswith('.tmp.npy'):
+                try:
+                    os.remove(array_fp)
+                except OSError:
+                    # Already removed by another writer
+                    pass
+
+    @staticmethod
+    def read_array_directory(array_dp, array_names, mmap_mode='r'):
+        """
+        Returns the meta data and the (memory mapped) arrays written by write_array_directory()
+        or None, if the directory contains no complete arrays
+        """
+        meta_fp = os.path.join(array_dp, FileUtility.ARRAY_DIRECTORY_META_FILE_NAME)
+        if not os.path.isfile(meta_fp):
+            return None
+        with open(meta_fp) as meta_file:
+            meta = json.load(meta_file)
+        if 'array_key' not in meta:
+            return None
+        np_arrays = {}
+        try:
+            for name in array_names:
+                np_arrays[name] = np.load(
+                    FileUtility._get_array_fp(array_dp, name, meta['array_key']), mmap_mode=mmap_mode)
+        except (OSError, ValueError):
+            # The arrays have been replaced by a concurrent writer of a different content
+            return None
+        return meta, np_arrays
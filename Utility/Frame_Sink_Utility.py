@@ -0,0 +1,196 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkCommonCore import VTK_UNSIGNED_CHAR
+from vtkmodules.vtkCommonDataModel import vtkImageData
+from vtkmodules.vtkIOImage import vtkJPEGWriter, vtkPNGWriter
+
+
+class FrameSink(object):
+
+    """ Usage:
+        with render_interface.create_frame_sink(max_queue_depth=4, num_threads=2) as frame_sink:
+            for cam in cameras:
+                render_interface.set_active_cam_from_computer_vision_cam(cam)
+                frame_sink.submit_color_frame(cam.file_name + '.png')
+                frame_sink.submit_depth_frame(cam.file_name + '.npy', render=False)
+        logger.vinfo('timings', frame_sink.get_timings())
+
+        The main thread renders and reads back the frames, while a thread pool encodes and
+        writes them. The color frames are read back into a ring of preallocated buffers.
+        At most max_queue_depth frames are pending, further submissions block until a frame
+        has been written (backpressure).
+    """
+
+    def __init__(self, render_interface, max_queue_depth=4, num_threads=2):
+        self.render_interface = render_interface
+        self.max_queue_depth = max_queue_depth
+        self.executor = ThreadPoolExecutor(max_workers=num_threads)
+        self.pending_semaphore = threading.BoundedSemaphore(max_queue_depth)
+        self.pending_futures = []
+
+        # buffer shape -> queue of free buffers. Each pending frame holds one buffer,
+        # i.e. the semaphore limits the number of buffers per shape to max_queue_depth
+        self.free_color_buffers = {}
+        self.free_depth_buffers = {}
+
+        self.timing_lock = threading.Lock()
+        self.timings = {'render': 0.0, 'readback': 0.0, 'backpressure_wait': 0.0, 'encode_and_write': 0.0}
+        self.num_frames = 0
+        self.start_time = time.time()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _add_timing(self, stage, start_time):
+        with self.timing_lock:
+            self.timings[stage] += time.time() - start_time
+
+    def _render_and_acquire_slot(self, render):
+        if render:
+            start_time = time.time()
+            self.render_interface.render()
+            self._add_timing('render', start_time)
+
+        start_time = time.time()
+        self.pending_semaphore.acquire()
+        self._add_timing('backpressure_wait', start_time)
+
+    @staticmethod
+    def _get_free_buffer(free_buffers, buffer_shape, dtype):
+        if buffer_shape not in free_buffers:
+            free_buffers[buffer_shape] = queue.Queue()
+        try:
+            return free_buffers[buffer_shape].get_nowait()
+        except queue.Empty:
+            return np.empty(buffer_shape, dtype=dtype)
+
+    def submit_color_frame(self, ofp, with_alpha=True, render=True):
+        """ Supported formats: .png, .jpg (requires with_alpha=False) and .npy """
+
+        self._render_and_acquire_slot(render)
+
+        color_buffer = None
+        try:
+            start_time = time.time()
+            num_components = 4 if with_alpha else 3
+            buffer_shape = (
+                self.render_interface.render_height, self.render_interface.render_width, num_components)
+            color_buffer = self._get_free_buffer(self.free_color_buffers, buffer_shape, np.uint8)
+            # The buffer remains in OpenGL order (lower left first), which is also the order of vtkImageData
+            self.render_interface.get_rgba_buffer_as_uint8_numpy_arr(
+                out=color_buffer, with_alpha=with_alpha, flip=None)
+            self._add_timing('readback', start_time)
+
+            self._submit(self._write_color_buffer, color_buffer, ofp)
+        except BaseException:
+            self._release_slot(self.free_color_buffers, color_buffer)
+            raise
+
+    def submit_depth_frame(self, ofp, render=True):
+        """ The depth buffer is stored as float32 .npy file """
+
+        self._render_and_acquire_slot(render)
+
+        depth_buffer = None
+        try:
+            start_time = time.time()
+            buffer_shape = (self.render_interface.render_height, self.render_interface.render_width)
+            depth_buffer = self._get_free_buffer(self.free_depth_buffers, buffer_shape, np.float32)
+            self.render_interface.get_computer_vision_depth_buffer_as_numpy_arr(out=depth_buffer)
+            self._add_timing('readback', start_time)
+
+            self._submit(self._write_depth_buffer, depth_buffer, ofp)
+        except BaseException:
+            self._release_slot(self.free_depth_buffers, depth_buffer)
+            raise
+
+    def _release_slot(self, free_buffers, buffer):
+        # Counterpart of _render_and_acquire_slot() for frames that could not be submitted,
+        # otherwise failed frames would block further submissions
+        if buffer is not None:
+            free_buffers[buffer.shape].put(buffer)
+        self.pending_semaphore.release()
+
+    def _submit(self, write_func, buffer, ofp):
+        # Drop the references to finished frames (the exceptions of failed frames are kept)
+        self.pending_futures = [
+            pending_future for pending_future in self.pending_futures
+            if not pending_future.done() or pending_future.exception() is not None]
+        # Once the frame has been submitted, the slot is released by write_func
+        future = self.executor.submit(write_func, buffer, ofp)
+        self.pending_futures.append(future)
+        self.num_frames += 1
+
+    def _write_color_buffer(self, color_buffer, ofp):
+        start_time = time.time()
+        try:
+            extension = os.path.splitext(ofp)[1].lower()
+            if extension == '.npy':
+                # Image coordinates start at the upper left
+                np.save(ofp, color_buffer[::-1])
+            else:
+                self._write_image_with_vtk(color_buffer, ofp, extension)
+        finally:
+            self.free_color_buffers[color_buffer.shape].put(color_buffer)
+            self.pending_semaphore.release()
+            self._add_timing('encode_and_write', start_time)
+
+    def _write_depth_buffer(self, depth_buffer, ofp):
+        start_time = time.time()
+        try:
+            np.save(ofp, depth_buffer)
+        finally:
+            self.free_depth_buffers[depth_buffer.shape].put(depth_buffer)
+            self.pending_semaphore.release()
+            self._add_timing('encode_and_write', start_time)
+
+    @staticmethod
+    def _write_image_with_vtk(color_buffer, ofp, extension):
+        height, width, num_components = color_buffer.shape
+        image_data = vtkImageData()
+        image_data.SetDimensions(width, height, 1)
+        image_data.GetPointData().SetScalars(
+            numpy_support.numpy_to_vtk(
+                color_buffer.reshape((-1, num_components)), deep=False, array_type=VTK_UNSIGNED_CHAR))
+
+        if extension == '.png':
+            image_writer = vtkPNGWriter()
+        elif extension in ['.jpg', '.jpeg']:
+            # JPEG does not support an alpha channel
+            assert num_components == 3
+            image_writer = vtkJPEGWriter()
+        else:
+            assert False, 'Unsupported image format: ' + extension
+        image_writer.SetFileName(ofp)
+        image_writer.SetInputData(image_data)
+        image_writer.Write()
+
+    def flush(self):
+        """ Blocks until all pending frames are written, raises the exception of the first failed frame """
+        pending_futures = self.pending_futures
+        self.pending_futures = []
+        for future in pending_futures:
+            future.result()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.executor.shutdown(wait=True)
+
+    def get_timings(self):
+        """ Accumulated seconds per stage (encode_and_write is summed over all threads) """
+        with self.timing_lock:
+            timings = dict(self.timings)
+        elapsed_time = time.time() - self.start_time
+        timings['num_frames'] = self.num_frames
+        timings['frames_per_second'] = self.num_frames / elapsed_time if elapsed_time > 0 else 0.0
+        return timings
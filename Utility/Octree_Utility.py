@@ -0,0 +1,162 @@
+import hashlib
+import numpy as np
+
+from Utility.Logging_Extension import logger
+from VTKInterface.Utility.File_Utility import FileUtility
+
+
+class PointCloudOctree(object):
+
+    """ Usage:
+        octree = PointCloudOctree.create_from_numpy(coords, colors, cache_dp='cloud.ply.octree')
+        coarse_coords, coarse_colors = octree.get_points(point_budget=1000000)
+
+        Implicit octree of a point cloud, represented by a progressive ordering of the points:
+        the points are sorted by the (coarsest) octree level in which they are the first point of
+        their cell, and within each level by their Morton code. Thus, each prefix of the
+        ordered points is a spatially uniform subsample of the point cloud (level of detail),
+        i.e. a point budget corresponds to a prefix.
+            coords (N, 3) float32 and colors (N, 3) uint8 in progressive order
+            level_offsets (max_depth + 3,): the points of level l are in [level_offsets[l], level_offsets[l + 1]),
+                                            the last level contains the points sharing a finest cell with another point
+        The octree is built in a single vectorized pass and can be stored on disc (see cache_dp).
+    """
+
+    VERSION = 1
+    ARRAY_NAMES = ['coords', 'colors', 'level_offsets']
+    # The Morton code of a 3D point with 21 bits per dimension fits into an uint64
+    MAX_DEPTH = 21
+
+    def __init__(self, coords, colors, level_offsets, max_depth, source_hash=None):
+        self.coords = coords
+        self.colors = colors
+        self.level_offsets = level_offsets
+        self.max_depth = max_depth
+        self.source_hash = source_hash
+
+    @staticmethod
+    def _spread_bits(values):
+        # Inserts two zero bits between the (21 lowest) bits of each value
+        values = values.astype(np.uint64) & np.uint64(0x1fffff)
+        values = (values | values << np.uint64(32)) & np.uint64(0x1f00000000ffff)
+        values = (values | values << np.uint64(16)) & np.uint64(0x1f0000ff0000ff)
+        values = (values | values << np.uint64(8)) & np.uint64(0x100f00f00f00f00f)
+        values = (values | values << np.uint64(4)) & np.uint64(0x10c30c30c30c30c3)
+        values = (values | values << np.uint64(2)) & np.uint64(0x1249249249249249)
+        return values
+
+    @staticmethod
+    def compute_morton_codes(coords, max_depth):
+        """ Morton codes of the cells (of the finest level) containing the points """
+        bounds_min = coords.min(axis=0)
+        extent = float(np.max(coords.max(axis=0) - bounds_min))
+        num_cells_per_dim = 2 ** max_depth
+        if extent == 0:
+            cell_indices = np.zeros(coords.shape, dtype=np.int64)
+        else:
+            cell_indices = np.floor((coords - bounds_min) / extent * num_cells_per_dim).astype(np.int64)
+            np.clip(cell_indices, 0, num_cells_per_dim - 1, out=cell_indices)
+        return (PointCloudOctree._spread_bits(cell_indices[:, 0]) |
+                PointCloudOctree._spread_bits(cell_indices[:, 1]) << np.uint64(1) |
+                PointCloudOctree._spread_bits(cell_indices[:, 2]) << np.uint64(2))
+
+    @staticmethod
+    def compute_source_hash(coords, colors, max_depth):
+        sha1 = hashlib.sha1()
+        sha1.update(('v' + str(PointCloudOctree.VERSION) + 'd' + str(max_depth)).encode('ascii'))
+        # Hashing the buffers (instead of tobytes()) avoids copies of (contiguous) point clouds
+        sha1.update(memoryview(np.ascontiguousarray(coords)))
+        if colors is not None:
+            sha1.update(memoryview(np.ascontiguousarray(colors)))
+        return sha1.hexdigest()
+
+    @classmethod
+    def create_from_numpy(cls, coords, colors=None, max_depth=12, cache_dp=None):
+        """
+        coords: (N, 3) array, colors: (N, 3) uint8 array (white if None)
+        If cache_dp is provided, a matching octree is loaded from (or the built one is written to) cache_dp
+        """
+        assert max_depth <= cls.MAX_DEPTH
+        coords = np.asarray(coords).reshape(-1, 3)
+        source_hash = None
+        if cache_dp is not None:
+            source_hash = cls.compute_source_hash(coords, colors, max_depth)
+            octree = cls.read_from_directory(cache_dp, source_hash)
+            if octree is not None:
+                return octree
+
+        if colors is None:
+            colors = np.full((len(coords), 3), 255, dtype=np.uint8)
+        colors = np.asarray(colors, dtype=np.uint8).reshape(-1, 3)
+
+        morton_codes = cls.compute_morton_codes(coords, max_depth)
+        morton_order = np.argsort(morton_codes, kind='stable')
+        sorted_morton_codes = morton_codes[morton_order]
+
+        # The first point of each (occupied) cell of a level represents the cell. Since the
+        # representatives of a coarse level are also representatives of the finer levels,
+        # iterating from fine to coarse assigns the coarsest level to each point
+        point_levels = np.full(len(coords), max_depth + 1, dtype=np.int8)
+        for level in range(max_depth, -1, -1):
+            cell_codes = sorted_morton_codes >> np.uint64(3 * (max_depth - level))
+            first_in_cell_mask = np.ones(len(cell_codes), dtype=bool)
+            first_in_cell_mask[1:] = cell_codes[1:] != cell_codes[:-1]
+            point_levels[first_in_cell_mask] = level
+
+        # Stable sort, i.e. the points of each level remain in Morton order (spatially coherent)
+        level_order = np.argsort(point_levels, kind='stable')
+        progressive_order = morton_order[level_order]
+        level_counts = np.bincount(point_levels, minlength=max_depth + 2)
+        level_offsets = np.concatenate([[0], np.cumsum(level_counts)]).astype(np.int64)
+
+        octree = cls(
+            np.ascontiguousarray(coords[progressive_order], dtype=np.float32),
+            np.ascontiguousarray(colors[progressive_order]),
+            level_offsets,
+            max_depth,
+            source_hash)
+        if cache_dp is not None:
+            octree.write_to_directory(cache_dp)
+        return octree
+
+    def get_num_points(self):
+        return len(self.coords)
+
+    def get_points(self, point_budget=None):
+        """ Returns views of the first point_budget points (i.e. a uniform subsample of the point cloud) """
+        if point_budget is None:
+            point_budget = len(self.coords)
+        return self.coords[:point_budget], self.colors[:point_budget]
+
+    def get_points_up_to_level(self, level):
+        point_budget = int(self.level_offsets[min(level + 1, len(self.level_offsets) - 1)])
+        return self.get_points(point_budget)
+
+    def write_to_directory(self, octree_dp):
+        # Several processes may build the octree of the same point cloud at the same time (see FileUtility)
+        array_key = self.source_hash
+        if array_key is None:
+            array_key = self.compute_source_hash(self.coords, self.colors, self.max_depth)
+        FileUtility.write_array_directory(
+            octree_dp,
+            {name: getattr(self, name) for name in self.ARRAY_NAMES},
+            {'version': self.VERSION, 'max_depth': self.max_depth, 'source_hash': self.source_hash},
+            array_key)
+
+    @classmethod
+    def read_from_directory(cls, octree_dp, source_hash=None):
+        """
+        Returns None, if there is no valid octree in octree_dp or if it belongs to a different point cloud.
+        The arrays are memory mapped, i.e. only the points within the point budget are loaded.
+        """
+        # Copy on write, since vtk requires writable arrays
+        meta_and_arrays = FileUtility.read_array_directory(octree_dp, cls.ARRAY_NAMES, mmap_mode='c')
+        if meta_and_arrays is None:
+            return None
+        meta, np_arrays = meta_and_arrays
+        if meta.get('version') != cls.VERSION or (
+                source_hash is not None and meta.get('source_hash') != source_hash):
+            logger.info('Ignoring outdated octree in ' + octree_dp)
+            return None
+        return cls(
+            np_arrays['coords'], np_arrays['colors'], np_arrays['level_offsets'], meta['max_depth'], meta['source_hash'])
@@ -0,0 +1,129 @@
+import os
+import hashlib
+from collections import OrderedDict
+from vtkmodules.vtkCommonDataModel import vtkPolyData
+from vtkmodules.vtkIOXML import vtkXMLPolyDataReader, vtkXMLPolyDataWriter
+
+from Utility.Logging_Extension import logger
+from VTKInterface.Utility.File_Utility import FileUtility
+
+
+class PolyDataCache(object):
+
+    """ Usage:
+        poly_data_cache = PolyDataCache(max_memory_bytes=2 * 1024 ** 3, cache_dp='/tmp/poly_data_cache')
+        poly_data = poly_data_cache.get_poly_data(poly_ifp, DataUtility.create_poly_data_from_ply)
+
+        The in-process cache is a LRU cache keyed by the path, the modification time and the
+        size of the file. The optional disc cache stores the parsed poly data as raw appended
+        .vtp files, which allows later processes to skip the parsing of text files.
+
+        The returned poly data are shallow copies, i.e. they share the point and cell arrays with
+        the cached entry. Callers may replace arrays (e.g. with SetScalars()), but must not modify
+        the values of the shared arrays, since this would alter the result of later cache hits.
+    """
+
+    def __init__(self, max_memory_bytes=1024 ** 3, cache_dp=None):
+        self.max_memory_bytes = max_memory_bytes
+        self.cache_dp = cache_dp
+
+        # key -> (poly_data, memory_bytes), the most recently used entry is the last one
+        self._entries = OrderedDict()
+        self._memory_bytes = 0
+
+        self.num_memory_hits = 0
+        self.num_disc_hits = 0
+        self.num_misses = 0
+
+    @staticmethod
+    def get_key(poly_ifp):
+        stat_result = os.stat(poly_ifp)
+        return os.path.realpath(poly_ifp), stat_result.st_mtime_ns, stat_result.st_size
+
+    @staticmethod
+    def _create_shallow_copy(poly_data):
+        # The callers may replace the arrays of the poly data (e.g. SetVerts() or SetScalars()),
+        # the shallow copy shares the arrays (whose values must not be modified) but not the data set attributes
+        poly_data_copy = vtkPolyData()
+        poly_data_copy.ShallowCopy(poly_data)
+        return poly_data_copy
+
+    def get_poly_data(self, poly_ifp, create_poly_data_func):
+        key = self.get_key(poly_ifp)
+
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.num_memory_hits += 1
+            return self._create_shallow_copy(self._entries[key][0])
+
+        poly_data = self._read_poly_data_from_disc_cache(key)
+        if poly_data is not None:
+            self.num_disc_hits += 1
+        else:
+            self.num_misses += 1
+            poly_data = create_poly_data_func(poly_ifp)
+            self._write_poly_data_to_disc_cache(key, poly_data)
+
+        self._insert(key, poly_data)
+        return self._create_shallow_copy(poly_data)
+
+    def _insert(self, key, poly_data):
+        # GetActualMemorySize() returns kibibytes
+        memory_bytes = poly_data.GetActualMemorySize() * 1024
+        if memory_bytes > self.max_memory_bytes:
+            return
+        self._entries[key] = (poly_data, memory_bytes)
+        self._memory_bytes += memory_bytes
+        while self._memory_bytes > self.max_memory_bytes:
+            evicted_key, (evicted_poly_data, evicted_memory_bytes) = self._entries.popitem(last=False)
+            self._memory_bytes -= evicted_memory_bytes
+
+    def _get_disc_cache_fp(self, key):
+        key_hash = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dp, key_hash + '.vtp')
+
+    def _read_poly_data_from_disc_cache(self, key):
+        if self.cache_dp is None:
+            return None
+        cache_fp = self._get_disc_cache_fp(key)
+        if not os.path.isfile(cache_fp):
+            return None
+        reader_vtp = vtkXMLPolyDataReader()
+        reader_vtp.SetFileName(cache_fp)
+        reader_vtp.Update()
+        poly_data = reader_vtp.GetOutput()
+        if poly_data.GetNumberOfPoints() == 0:
+            logger.info('Ignoring invalid cache file ' + cache_fp)
+            return None
+        return poly_data
+
+    def _write_poly_data_to_disc_cache(self, key, poly_data):
+        if self.cache_dp is None:
+            return
+        if not os.path.isdir(self.cache_dp):
+            os.makedirs(self.cache_dp, exist_ok=True)
+        cache_fp = self._get_disc_cache_fp(key)
+
+        # Concurrent processes must never read a partially written file, and processes
+        # missing the same key at the same time must not write to the same file
+        with FileUtility.create_temporary_output_fp(cache_fp) as temporary_fp:
+            # Raw appended data without compression is the fastest format to read
+            vtp_writer = vtkXMLPolyDataWriter()
+            vtp_writer.SetFileName(temporary_fp)
+            vtp_writer.SetDataModeToAppended()
+            vtp_writer.EncodeAppendedDataOff()
+            vtp_writer.SetCompressorTypeToNone()
+            vtp_writer.SetInputData(poly_data)
+            if vtp_writer.Write() != 1:
+                raise IOError("Could not write the poly data cache file '" + temporary_fp + "'")
+
+    def clear(self):
+        self._entries.clear()
+        self._memory_bytes = 0
+
+    def get_statistics(self):
+        return {'num_memory_hits': self.num_memory_hits,
+                'num_disc_hits': self.num_disc_hits,
+                'num_misses': self.num_misses,
+                'num_entries': len(self._entries),
+                'memory_bytes': self._memory_bytes}
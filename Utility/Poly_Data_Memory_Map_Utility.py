@@ -0,0 +1,211 @@
+import json
+import struct
+import numpy as np
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkCommonCore import VTK_ID_TYPE, VTK_INT, VTK_UNSIGNED_CHAR, vtkPoints
+from vtkmodules.vtkCommonDataModel import vtkCellArray, vtkPolyData
+
+from Utility.Logging_Extension import logger
+from VTKInterface.Utility.File_Utility import FileUtility
+
+
+class PolyDataMemoryMapUtility(object):
+
+    """ Usage:
+        PolyDataMemoryMapUtility.convert_poly_data_file_to_memory_map('mesh.ply', 'mesh.pdmm')
+        poly_data = PolyDataMemoryMapUtility.create_poly_data_from_memory_map('mesh.pdmm')
+
+        File layout (all sections are aligned to ALIGNMENT bytes):
+            MAGIC (8 bytes)
+            header length (uint64, little endian)
+            header (JSON, contains dtype, shape and offset of each array)
+            raw arrays (points as float32, colors as uint8, normals/texture coordinates as float32,
+                        offsets/connectivity of verts, lines, polys and strips as int32 or int64)
+
+        The arrays of the resulting poly data are views of np.memmap arrays, i.e. the pages
+        are loaded lazily and are shared across processes by the page cache of the OS.
+    """
+
+    MAGIC = b'VTKIPDMM'
+    VERSION = 1
+    ALIGNMENT = 64
+    CELL_TYPES = ['verts', 'lines', 'polys', 'strips']
+    # numpy dtype of vtkIdType (int64 or int32, depending on the vtk build)
+    ID_DTYPE = np.dtype(numpy_support.get_vtk_to_numpy_typemap()[VTK_ID_TYPE])
+
+    @staticmethod
+    def _align(offset):
+        alignment = PolyDataMemoryMapUtility.ALIGNMENT
+        return (offset + alignment - 1) // alignment * alignment
+
+    @staticmethod
+    def _get_cell_array(poly_data, cell_type):
+        return {'verts': poly_data.GetVerts,
+                'lines': poly_data.GetLines,
+                'polys': poly_data.GetPolys,
+                'strips': poly_data.GetStrips}[cell_type]()
+
+    @staticmethod
+    def _set_cell_array(poly_data, cell_type, vtk_cells):
+        {'verts': poly_data.SetVerts,
+         'lines': poly_data.SetLines,
+         'polys': poly_data.SetPolys,
+         'strips': poly_data.SetStrips}[cell_type](vtk_cells)
+
+    @staticmethod
+    def _get_poly_data_arrays(poly_data):
+
+        np_arrays = {}
+        np_arrays['points'] = numpy_support.vtk_to_numpy(
+            poly_data.GetPoints().GetData()).astype(np.float32, copy=False)
+
+        point_data = poly_data.GetPointData()
+        scalars = point_data.GetScalars()
+        if scalars is not None and scalars.GetDataType() == VTK_UNSIGNED_CHAR:
+            np_arrays['colors'] = numpy_support.vtk_to_numpy(scalars)
+        if point_data.GetNormals() is not None:
+            np_arrays['normals'] = numpy_support.vtk_to_numpy(
+                point_data.GetNormals()).astype(np.float32, copy=False)
+        if point_data.GetTCoords() is not None:
+            np_arrays['tcoords'] = numpy_support.vtk_to_numpy(
+                point_data.GetTCoords()).astype(np.float32, copy=False)
+
+        for cell_type in PolyDataMemoryMapUtility.CELL_TYPES:
+            vtk_cells = PolyDataMemoryMapUtility._get_cell_array(poly_data, cell_type)
+            if vtk_cells is None or vtk_cells.GetNumberOfCells() == 0:
+                continue
+            offsets = numpy_support.vtk_to_numpy(vtk_cells.GetOffsetsArray())
+            connectivity = numpy_support.vtk_to_numpy(vtk_cells.GetConnectivityArray())
+            # 32 bit indices are sufficient for most meshes and halve the file size
+            if offsets[-1] < np.iinfo(np.int32).max:
+                index_dtype = np.int32
+            else:
+                index_dtype = np.int64
+            np_arrays[cell_type + '_offsets'] = offsets.astype(index_dtype, copy=False)
+            np_arrays[cell_type + '_connectivity'] = connectivity.astype(index_dtype, copy=False)
+
+        return np_arrays
+
+    @staticmethod
+    def write_poly_data_to_memory_map(poly_data, mm_ofp):
+
+        np_arrays = PolyDataMemoryMapUtility._get_poly_data_arrays(poly_data)
+
+        # The header size is required to compute the offsets, so the offsets are
+        # computed relative to the (aligned) end of the header first
+        array_entries = {}
+        relative_offset = 0
+        for name, np_array in np_arrays.items():
+            array_entries[name] = {
+                'dtype': np_array.dtype.str,
+                'shape': list(np_array.shape),
+                'offset': relative_offset}
+            relative_offset = PolyDataMemoryMapUtility._align(relative_offset + np_array.nbytes)
+
+        header = {'version': PolyDataMemoryMapUtility.VERSION, 'arrays': array_entries}
+        # Reserve enough space for the absolute offsets (which are longer than the relative ones)
+        header_bytes_estimate = len(json.dumps(header).encode('utf-8')) + 32 * len(array_entries)
+        data_offset = PolyDataMemoryMapUtility._align(
+            len(PolyDataMemoryMapUtility.MAGIC) + 8 + header_bytes_estimate)
+        for array_entry in array_entries.values():
+            array_entry['offset'] += data_offset
+        header_bytes = json.dumps(header).encode('utf-8')
+        header_bytes += b' ' * (data_offset - len(PolyDataMemoryMapUtility.MAGIC) - 8 - len(header_bytes))
+
+        # Concurrent writers of the same file use different temporary files (see FileUtility)
+        with FileUtility.create_temporary_output_fp(mm_ofp) as temporary_fp:
+            with open(temporary_fp, 'wb') as mm_file:
+                mm_file.write(PolyDataMemoryMapUtility.MAGIC)
+                mm_file.write(struct.pack('<Q', len(header_bytes)))
+                mm_file.write(header_bytes)
+                for name, np_array in np_arrays.items():
+                    mm_file.seek(array_entries[name]['offset'])
+                    # Writes the buffer of the array (tobytes() would double the peak memory)
+                    mm_file.write(memoryview(np.ascontiguousarray(np_array)).cast('B'))
+
+    @staticmethod
+    def read_memory_map_header(mm_ifp):
+        with open(mm_ifp, 'rb') as mm_file:
+            magic = mm_file.read(len(PolyDataMemoryMapUtility.MAGIC))
+            if magic != PolyDataMemoryMapUtility.MAGIC:
+                raise ValueError("Invalid memory map file '" + mm_ifp + "'")
+            header_length = struct.unpack('<Q', mm_file.read(8))[0]
+            header = json.loads(mm_file.read(header_length).decode('utf-8'))
+        if header['version'] != PolyDataMemoryMapUtility.VERSION:
+            raise ValueError("Unsupported memory map version in '" + mm_ifp + "'")
+        return header
+
+    @staticmethod
+    def create_numpy_arrays_from_memory_map(mm_ifp):
+        # The copy-on-write mode ('c') provides writable arrays (as required by VTK),
+        # while the pages remain shared as long as they are not modified
+        header = PolyDataMemoryMapUtility.read_memory_map_header(mm_ifp)
+        np_arrays = {}
+        for name, array_entry in header['arrays'].items():
+            shape = tuple(array_entry['shape'])
+            if np.prod(shape) == 0:
+                np_arrays[name] = np.zeros(shape, dtype=np.dtype(array_entry['dtype']))
+            else:
+                np_arrays[name] = np.memmap(
+                    mm_ifp,
+                    dtype=np.dtype(array_entry['dtype']),
+                    mode='c',
+                    offset=array_entry['offset'],
+                    shape=shape)
+        return np_arrays
+
+    @staticmethod
+    def _create_vtk_index_array(np_indices):
+        if np_indices.dtype == PolyDataMemoryMapUtility.ID_DTYPE:
+            return numpy_support.numpy_to_vtkIdTypeArray(np_indices, deep=False)
+        elif np_indices.dtype == np.int32:
+            return numpy_support.numpy_to_vtk(np_indices, deep=False, array_type=VTK_INT)
+        else:
+            logger.info('Converting cell indices of type ' + str(np_indices.dtype) + ' (requires a copy)')
+            return numpy_support.numpy_to_vtkIdTypeArray(
+                np_indices.astype(PolyDataMemoryMapUtility.ID_DTYPE), deep=False)
+
+    @staticmethod
+    def create_poly_data_from_memory_map(mm_ifp):
+
+        np_arrays = PolyDataMemoryMapUtility.create_numpy_arrays_from_memory_map(mm_ifp)
+
+        poly_data = vtkPolyData()
+        vtk_points = vtkPoints()
+        vtk_points.SetData(numpy_support.numpy_to_vtk(np_arrays['points'], deep=False))
+        poly_data.SetPoints(vtk_points)
+
+        point_data = poly_data.GetPointData()
+        if 'colors' in np_arrays:
+            vtk_colors = numpy_support.numpy_to_vtk(
+                np_arrays['colors'], deep=False, array_type=VTK_UNSIGNED_CHAR)
+            vtk_colors.SetName('RGB')
+            point_data.SetScalars(vtk_colors)
+        if 'normals' in np_arrays:
+            vtk_normals = numpy_support.numpy_to_vtk(np_arrays['normals'], deep=False)
+            vtk_normals.SetName('Normals')
+            point_data.SetNormals(vtk_normals)
+        if 'tcoords' in np_arrays:
+            vtk_tcoords = numpy_support.numpy_to_vtk(np_arrays['tcoords'], deep=False)
+            vtk_tcoords.SetName('TCoords')
+            point_data.SetTCoords(vtk_tcoords)
+
+        for cell_type in PolyDataMemoryMapUtility.CELL_TYPES:
+            if cell_type + '_offsets' not in np_arrays:
+                continue
+            vtk_cells = vtkCellArray()
+            vtk_cells.SetData(
+                PolyDataMemoryMapUtility._create_vtk_index_array(np_arrays[cell_type + '_offsets']),
+                PolyDataMemoryMapUtility._create_vtk_index_array(np_arrays[cell_type + '_connectivity']))
+            PolyDataMemoryMapUtility._set_cell_array(poly_data, cell_type, vtk_cells)
+
+        if poly_data.GetNumberOfPoints() == 0:
+            raise ValueError("No point data could be loaded from '" + mm_ifp + "'")
+        return poly_data
+
+    @staticmethod
+    def convert_poly_data_file_to_memory_map(poly_ifp, mm_ofp):
+        # Avoid an import cycle (DataUtility uses this class to read memory map files)
+        from VTKInterface.Utility.Data_Utility import DataUtility
+        poly_data = DataUtility.create_poly_data_from_file(poly_ifp, use_cache=False)
+        PolyDataMemoryMapUtility.write_poly_data_to_memory_map(poly_data, mm_ofp)